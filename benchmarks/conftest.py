@@ -0,0 +1,51 @@
+import random
+from datetime import datetime
+
+import pytest
+from synthetic_headlines import build_vocabulary, generate_headlines
+
+from common.metrics import reset_spans
+from newswatch.transform import calculate_word_frequencies_by_site, count_words_in_text, group_headlines_by_site
+
+# A busy hour of a live deployment: about 20 sites with 100 headlines each
+SITE_COUNT = 20
+HEADLINES_PER_HOUR = 2000
+VOCABULARY_SIZE = 5000
+SEED = 42
+
+
+@pytest.fixture(scope="session")
+def benchmark_timestamp():
+    return datetime(2024, 1, 1, 12, 0)
+
+
+@pytest.fixture(scope="session")
+def headlines(benchmark_timestamp):
+    vocabulary = build_vocabulary(VOCABULARY_SIZE)
+    generated_headlines = generate_headlines(
+        site_count=SITE_COUNT,
+        headlines_per_hour=HEADLINES_PER_HOUR,
+        timestamp=benchmark_timestamp,
+        vocabulary=vocabulary,
+        rng=random.Random(SEED),
+    )
+    # Loading the WordNet corpus happens on the first lemmatisation, which should not be measured
+    count_words_in_text(generated_headlines[0].headline)
+    return generated_headlines
+
+
+@pytest.fixture(scope="session")
+def headlines_grouped_by_site(headlines):
+    return group_headlines_by_site(headlines)
+
+
+@pytest.fixture(scope="session")
+def site_word_frequencies(headlines_grouped_by_site, benchmark_timestamp):
+    return calculate_word_frequencies_by_site(headlines_grouped_by_site, benchmark_timestamp)
+
+
+@pytest.fixture(autouse=True)
+def no_spans():
+    # The handlers record metrics spans via the top-level common package, which accumulate until a stage flushes them
+    yield
+    reset_spans()
@@ -0,0 +1,24 @@
+import pytest
+
+from newswatch.common.lemmatisers import LookupLemmatiser, SuffixLemmatiser, TextBlobLemmatiser, build_lemma_table
+from newswatch.transform import split_text_into_words
+
+
+@pytest.fixture(scope="session")
+def lemmatisers():
+    return {
+        "textblob": TextBlobLemmatiser(),
+        "lookup": LookupLemmatiser(build_lemma_table()),
+        "suffix": SuffixLemmatiser(),
+    }
+
+
+@pytest.mark.parametrize("lemmatiser_name", ["textblob", "lookup", "suffix"])
+def test_bench_lemmatise(benchmark, headlines_grouped_by_site, lemmatisers, lemmatiser_name):
+    words = [
+        word for headline in headlines_grouped_by_site["site0"] for word in split_text_into_words(headline.headline)
+    ]
+    lemmatiser = lemmatisers[lemmatiser_name]
+
+    lemmas = benchmark(lambda: [lemmatiser.lemmatise(word) for word in words])
+    assert len(lemmas) == len(words)
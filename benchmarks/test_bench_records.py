@@ -0,0 +1,15 @@
+import pytest
+
+from newswatch.common.models import WordFrequency
+from newswatch.common.records import WordFrequencyRecord
+
+
+@pytest.mark.parametrize("cls", [WordFrequency, WordFrequencyRecord], ids=["model", "record"])
+def test_bench_construct_word_frequencies(benchmark, cls, benchmark_timestamp):
+    words = [f"word{i}" for i in range(10_000)]
+
+    def _construct():
+        return [cls(word=word, frequency=i, timestamp=benchmark_timestamp) for i, word in enumerate(words)]
+
+    word_frequencies = benchmark(_construct)
+    assert len(word_frequencies) == len(words)
@@ -0,0 +1,61 @@
+import pytest
+
+from newswatch.common.token_cache import TokenCountCache
+from newswatch.common.word_filters import filter_word_frequencies, load_excluded_words
+from newswatch.transform import (
+    calculate_word_frequencies,
+    calculate_word_frequencies_by_site,
+    count_words_in_text,
+    merge_site_word_frequencies,
+    sum_frequencies,
+)
+
+
+def test_bench_count_words_in_text(benchmark, headlines_grouped_by_site):
+    site_text = " ".join(headline.headline for headline in headlines_grouped_by_site["site0"])
+    word_counts = benchmark(count_words_in_text, site_text)
+    assert word_counts
+
+
+def test_bench_calculate_word_frequencies(benchmark, headlines_grouped_by_site):
+    site_text = " ".join(headline.headline for headline in headlines_grouped_by_site["site0"])
+    word_frequencies = benchmark(calculate_word_frequencies, site_text)
+    assert word_frequencies
+
+
+@pytest.mark.parametrize("warm_cache", [False, True], ids=["cold", "warm"])
+def test_bench_calculate_word_frequencies_by_site(
+    benchmark,
+    headlines_grouped_by_site,
+    benchmark_timestamp,
+    warm_cache,
+):
+    token_count_cache = TokenCountCache()
+    if warm_cache:
+        calculate_word_frequencies_by_site(headlines_grouped_by_site, benchmark_timestamp, None, token_count_cache)
+
+    def _calculate():
+        cache = token_count_cache if warm_cache else TokenCountCache()
+        return calculate_word_frequencies_by_site(headlines_grouped_by_site, benchmark_timestamp, None, cache)
+
+    word_frequencies_by_site = benchmark(_calculate)
+    assert len(word_frequencies_by_site) == len(headlines_grouped_by_site)
+
+
+def test_bench_merge_site_word_frequencies(benchmark, site_word_frequencies):
+    merged = benchmark(merge_site_word_frequencies, site_word_frequencies, 100)
+    assert merged
+
+
+def test_bench_sum_frequencies(benchmark, site_word_frequencies):
+    total = benchmark(sum_frequencies, site_word_frequencies)
+    assert total
+
+
+def test_bench_filter_word_frequencies(benchmark, site_word_frequencies, monkeypatch):
+    monkeypatch.delenv("MIN_WORD_LENGTH", raising=False)
+    monkeypatch.delenv("MIN_FREQUENCY", raising=False)
+    word_frequencies = merge_site_word_frequencies(site_word_frequencies)
+    excluded_words = load_excluded_words("src/newswatch/resources/excluded-words.txt")
+    filtered = benchmark(filter_word_frequencies, word_frequencies, excluded_words)
+    assert len(filtered) < len(word_frequencies)
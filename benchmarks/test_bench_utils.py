@@ -0,0 +1,27 @@
+from newswatch.common.models import Headline, WordFrequency
+from newswatch.common.utils import convert_objects_to_parquet_bytes, convert_parquet_bytes_to_objects
+from newswatch.transform import merge_site_word_frequencies
+
+
+def test_bench_convert_headlines_to_parquet_bytes(benchmark, headlines):
+    parquet_bytes = benchmark(convert_objects_to_parquet_bytes, headlines)
+    assert parquet_bytes
+
+
+def test_bench_convert_parquet_bytes_to_headlines(benchmark, headlines):
+    parquet_bytes = convert_objects_to_parquet_bytes(headlines)
+    converted_headlines = benchmark(convert_parquet_bytes_to_objects, parquet_bytes, Headline)
+    assert len(converted_headlines) == len(headlines)
+
+
+def test_bench_convert_word_frequencies_to_parquet_bytes(benchmark, site_word_frequencies):
+    word_frequencies = merge_site_word_frequencies(site_word_frequencies)
+    parquet_bytes = benchmark(convert_objects_to_parquet_bytes, word_frequencies)
+    assert parquet_bytes
+
+
+def test_bench_convert_parquet_bytes_to_word_frequencies(benchmark, site_word_frequencies):
+    word_frequencies = merge_site_word_frequencies(site_word_frequencies)
+    parquet_bytes = convert_objects_to_parquet_bytes(word_frequencies)
+    converted_word_frequencies = benchmark(convert_parquet_bytes_to_objects, parquet_bytes, WordFrequency)
+    assert len(converted_word_frequencies) == len(word_frequencies)
@@ -0,0 +1,87 @@
+import random
+import tracemalloc
+from datetime import datetime
+
+import pytest
+
+from newswatch.common.records import WordFrequencyRecord
+from newswatch.common.sketches import HeavyHitters
+from newswatch.common.utils import put_to_s3
+from newswatch.common.word_sketches import build_word_sketch, build_word_sketch_s3_key, rebuild_word_sketch
+
+# The load function has 128 MB, most of which is taken by the runtime and the BigQuery client
+MAX_MONTH_REBUILD_PEAK_MB = 32
+
+
+@pytest.fixture(scope="session")
+def hourly_word_frequencies() -> list[WordFrequencyRecord]:
+    rng = random.Random(0)
+    timestamp = datetime(2024, 1, 1)
+    return [
+        WordFrequencyRecord(word=f"word{i}", frequency=rng.randint(20, 2000), timestamp=timestamp) for i in range(1500)
+    ]
+
+
+@pytest.fixture(scope="session")
+def month_sketch_bytes(hourly_word_frequencies) -> bytes:
+    month_sketch = build_word_sketch(hourly_word_frequencies)
+    month_sketch.merge(*[build_word_sketch(hourly_word_frequencies[i::2]) for i in range(2)])
+    return month_sketch.to_bytes()
+
+
+def test_bench_build_word_sketch(benchmark, hourly_word_frequencies):
+    word_sketch = benchmark(build_word_sketch, hourly_word_frequencies)
+    assert len(word_sketch) == len(hourly_word_frequencies)
+
+
+def test_bench_merge_year_of_month_sketches(benchmark, month_sketch_bytes):
+    def merge_year() -> HeavyHitters:
+        month_sketches = [HeavyHitters.from_bytes(month_sketch_bytes) for _ in range(12)]
+        month_sketches[0].merge(*month_sketches[1:])
+        return month_sketches[0]
+
+    assert len(benchmark(merge_year).most_common(100)) == 100
+
+
+@pytest.fixture(scope="session")
+def day_sketches_bytes() -> list[bytes]:
+    """The sketches of the 31 days of a month, each at capacity, with partly overlapping words."""
+
+    rng = random.Random(0)
+    timestamp = datetime(2024, 1, 1)
+    return [
+        build_word_sketch(
+            [
+                WordFrequencyRecord(word=f"word{day * 500 + i}", frequency=rng.randint(20, 2000), timestamp=timestamp)
+                for i in range(10_000)
+            ]
+        ).to_bytes()
+        for day in range(31)
+    ]
+
+
+@pytest.fixture
+def stored_day_sketch_keys(monkeypatch, day_sketches_bytes) -> list[str]:
+    monkeypatch.setenv("STORAGE_BACKEND", "memory")
+    day_keys = []
+    for day, day_sketch_bytes in enumerate(day_sketches_bytes, start=1):
+        day_key = build_word_sketch_s3_key("word-sketches", datetime(2024, 1, day), "day")
+        put_to_s3(bucket_name="bench-bucket", key=day_key, data=day_sketch_bytes)
+        day_keys.append(day_key)
+    return day_keys
+
+
+def test_bench_rebuild_month_word_sketch(benchmark, stored_day_sketch_keys):
+    def rebuild_month() -> None:
+        rebuild_word_sketch("bench-bucket", "word-sketches/year=2024/month=01.sketch", stored_day_sketch_keys)
+
+    # Rebuilt when an hour of the month is loaded again, so its memory must stay well within the load function
+    tracemalloc.start()
+    try:
+        rebuild_month()
+        peak_mb = tracemalloc.get_traced_memory()[1] / 2**20
+    finally:
+        tracemalloc.stop()
+    assert peak_mb < MAX_MONTH_REBUILD_PEAK_MB
+
+    benchmark(rebuild_month)
@@ -0,0 +1,106 @@
+"""
+Replay archived transform outputs (word frequency Parquet files) through the burst detection hour by hour,
+to tune its settings before changing them in a deployment. The detection starts from an empty state.
+
+The files are read from S3 (or the local storage with STORAGE_BACKEND=local) under a prefix, or from local paths,
+e.g. downloaded with `aws s3 sync s3://<bucket>/word-frequencies word-frequencies`. The load filters are applied
+as in the transform stage. The bursts are printed per hour, and written to a CSV file if --output is given.
+
+Usage: uv run ./scripts/backtest_bursts.py --bucket <bucket> --prefix word-frequencies/year=2024 --z-threshold 5
+       uv run ./scripts/backtest_bursts.py word-frequencies/year=2024/month=*/day=*/hour=*.parquet
+"""
+
+import argparse
+import csv
+import os
+import sys
+import time
+from dataclasses import fields
+
+SRC_PATH = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "newswatch"))
+sys.path.insert(0, SRC_PATH)
+
+import pyarrow.parquet as pq  # noqa: E402
+
+from common.bursts import BurstDetector, BurstSettings, get_burst_settings  # noqa: E402
+from common.models import Burst  # noqa: E402
+from common.records import WordFrequencyRecord  # noqa: E402
+from common.s3_io import get_objects_from_s3  # noqa: E402
+from common.utils import convert_table_to_objects, get_datetime_from_s3_key, list_s3_keys  # noqa: E402
+from common.word_filters import filter_word_frequencies, load_excluded_words  # noqa: E402
+
+
+def read_word_frequencies(path_or_key: str, bucket: str | None) -> list[WordFrequencyRecord]:
+    if bucket:
+        return get_objects_from_s3(bucket=bucket, key=path_or_key, cls=WordFrequencyRecord)
+    return convert_table_to_objects(pq.read_table(path_or_key), WordFrequencyRecord)
+
+
+def run_backtest(
+    paths_or_keys: list[str],
+    settings: BurstSettings,
+    excluded_words: set[str],
+    bucket: str | None = None,
+) -> list[Burst]:
+    """Detect the bursts of the hours in chronological order and return all of them."""
+
+    detector = BurstDetector(settings=settings)
+    all_bursts = []
+    for path_or_key in sorted(paths_or_keys, key=get_datetime_from_s3_key):
+        timestamp = get_datetime_from_s3_key(path_or_key)
+        word_frequencies = filter_word_frequencies(read_word_frequencies(path_or_key, bucket), excluded_words)
+        bursts = detector.update(timestamp, word_frequencies)
+        if bursts:
+            print(f"{timestamp:%Y-%m-%d %H:00}  " + ", ".join(f"{b.word} ({b.z_score:.1f})" for b in bursts))
+        all_bursts.extend(bursts)
+        if detector.hours_processed % 24 == 0:
+            detector.prune()
+    return all_bursts
+
+
+if __name__ == "__main__":
+    defaults = get_burst_settings()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="*")
+    parser.add_argument("--bucket")
+    parser.add_argument("--prefix", default=os.environ.get("TRANSFORM_S3_PREFIX", "word-frequencies"))
+    parser.add_argument("--excluded-words-txt-path", default=os.path.join(SRC_PATH, "resources", "excluded-words.txt"))
+    parser.add_argument("--output", help="CSV file to write the bursts to")
+    for setting in fields(BurstSettings):
+        parser.add_argument(f"--{setting.name.replace('_', '-')}", type=type(getattr(defaults, setting.name)))
+    args = parser.parse_args()
+
+    settings = BurstSettings(
+        **{
+            setting.name: (
+                getattr(args, setting.name)
+                if getattr(args, setting.name) is not None
+                else getattr(defaults, setting.name)
+            )
+            for setting in fields(BurstSettings)
+        }
+    )
+    if args.bucket:
+        paths_or_keys = [
+            key for key in list_s3_keys(bucket=args.bucket, prefix=args.prefix) if key.endswith(".parquet")
+        ]
+    else:
+        paths_or_keys = args.paths
+    if not paths_or_keys:
+        sys.exit("No word frequency files to backtest")
+
+    started = time.perf_counter()
+    bursts = run_backtest(
+        paths_or_keys, settings, load_excluded_words(args.excluded_words_txt_path), bucket=args.bucket
+    )
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    print(
+        f"{len(paths_or_keys)} hours, {len(bursts)} bursts ({len(bursts) / len(paths_or_keys):.2f} per hour), "
+        f"{elapsed_ms / len(paths_or_keys):.1f} ms per hour with {settings}"
+    )
+    if args.output:
+        with open(args.output, "w", newline="") as output_file:
+            writer = csv.DictWriter(output_file, fieldnames=list(Burst.model_fields))
+            writer.writeheader()
+            writer.writerows(burst.model_dump() for burst in bursts)
@@ -0,0 +1,27 @@
+"""
+Precompute the lemmas of the reference (textblob) lemmatiser from the NLTK WordNet corpus into a table
+that the lookup lemmatiser loads without NLTK or the corpus.
+
+Usage: uv run ./scripts/build_lemma_table.py [output_path]
+"""
+
+import os
+import sys
+
+SRC_PATH = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "newswatch"))
+sys.path.insert(0, SRC_PATH)
+
+from common.lemmatisers import build_lemma_table, write_lemma_table  # noqa: E402
+
+DEFAULT_OUTPUT_PATH = os.path.join(SRC_PATH, "resources", "wordnet-noun-lemmas.json.gz")
+
+
+if __name__ == "__main__":
+    import nltk
+    from nltk.corpus import wordnet
+
+    nltk.download("wordnet", quiet=True)
+    output_path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_OUTPUT_PATH
+    lemmas = build_lemma_table()
+    write_lemma_table(output_path, lemmas, wordnet_version=wordnet.get_version())
+    print(f"Wrote {len(lemmas)} lemmas of WordNet {wordnet.get_version()} to {output_path}")
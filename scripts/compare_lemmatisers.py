@@ -0,0 +1,60 @@
+"""
+Measure how much a lemmatiser diverges from the reference (textblob) on historical headlines,
+before switching LEMMATISER in a deployment.
+
+The headlines are read from extract Parquet files (e.g. downloaded from S3) or text files with one headline per line.
+
+Usage: uv run ./scripts/compare_lemmatisers.py --candidate lookup headlines/*.parquet
+"""
+
+import argparse
+import os
+import sys
+import time
+
+SRC_PATH = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "newswatch"))
+sys.path.insert(0, SRC_PATH)
+
+from common.lemmatisers import LEMMATISERS, Lemmatiser, create_lemmatiser, measure_divergence  # noqa: E402
+from transform import split_text_into_words  # noqa: E402
+
+
+def read_headline_texts(path: str) -> list[str]:
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        return pq.read_table(path, columns=["headline"]).column("headline").to_pylist()
+    with open(path, "r") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def time_lemmatiser(lemmatiser: Lemmatiser, words: list[str]) -> float:
+    """Return the time in milliseconds to lemmatise the words."""
+
+    started = time.perf_counter()
+    for word in words:
+        lemmatiser.lemmatise(word)
+    return (time.perf_counter() - started) * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--candidate", choices=[name for name in LEMMATISERS if name != "textblob"], default="lookup")
+    parser.add_argument(
+        "--lemma-table-path", default=os.path.join(SRC_PATH, "resources", "wordnet-noun-lemmas.json.gz")
+    )
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    words = [word for path in args.paths for text in read_headline_texts(path) for word in split_text_into_words(text)]
+    reference = create_lemmatiser("textblob")
+    candidate = create_lemmatiser(args.candidate, lemma_table_path=args.lemma_table_path)
+    divergence, differences = measure_divergence(words, reference=reference, candidate=candidate)
+
+    print(f"{len(words)} words, {divergence:.3%} lemmatised differently by {candidate.name}")
+    print(
+        f"textblob: {time_lemmatiser(reference, words):.0f} ms, {candidate.name}: {time_lemmatiser(candidate, words):.0f} ms"
+    )
+    for (word, reference_lemma, candidate_lemma), count in sorted(differences.items(), key=lambda d: -d[1])[: args.top]:
+        print(f"{count:>8} {word:<24} textblob: {reference_lemma:<24} {candidate.name}: {candidate_lemma}")
@@ -0,0 +1,21 @@
+"""
+Precompile site configuration YAML files into JSON that the extract stage loads without validating again.
+
+Usage: uv run ./scripts/compile_sites.py [yaml_path ...]
+"""
+
+import glob
+import os
+import sys
+
+SRC_PATH = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "newswatch"))
+sys.path.insert(0, SRC_PATH)
+
+from common.sites import compile_sites  # noqa: E402
+
+DEFAULT_YAML_PATHS = sorted(glob.glob(os.path.join(SRC_PATH, "resources", "sites-with-filters-*.yaml")))
+
+
+if __name__ == "__main__":
+    for yaml_path in sys.argv[1:] or DEFAULT_YAML_PATHS:
+        print(f"Compiled {yaml_path} to {compile_sites(yaml_path)}")
@@ -0,0 +1,84 @@
+"""
+Report how long importing each Lambda handler takes, based on `python -X importtime`.
+
+Usage: uv run ./scripts/import_time_report.py [handler ...]
+"""
+
+import os
+import subprocess
+import sys
+from dataclasses import dataclass
+
+HANDLERS = ["extract", "transform", "load", "pipeline"]
+HANDLER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "newswatch")
+
+
+@dataclass
+class ImportTime:
+    """Import time of a single module in microseconds."""
+
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def parse_importtime_output(stderr: str) -> list[ImportTime]:
+    """Parse the `-X importtime` lines written to stderr."""
+
+    import_times: list[ImportTime] = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line.removeprefix("import time:").split("|")
+        module = name.strip()
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        import_times.append(ImportTime(module, int(self_us), int(cumulative_us), depth))
+    return import_times
+
+
+def measure_handler_import(handler: str) -> list[ImportTime]:
+    """Import a handler module in a fresh interpreter and return its import times."""
+
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {handler}"],
+        cwd=HANDLER_PATH,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return parse_importtime_output(result.stderr)
+
+
+def get_handler_imports(import_times: list[ImportTime], handler: str) -> list[ImportTime]:
+    """
+    Return the handler and every module imported by it, excluding interpreter startup imports.
+    Nested imports are listed before the module importing them.
+    """
+
+    end = next(i for i, it in enumerate(import_times) if it.module == handler and it.depth == 0)
+    start = end
+    while start > 0 and import_times[start - 1].depth > 0:
+        start -= 1
+    return import_times[start : end + 1]  # noqa
+
+
+def format_report(handler: str, import_times: list[ImportTime], top_n: int = 10) -> str:
+    """Format the total import time and the slowest direct imports of a handler."""
+
+    handler_imports = get_handler_imports(import_times, handler)
+    total_ms = handler_imports[-1].cumulative_us / 1000
+    lines = [f"{handler}: {total_ms:.1f} ms"]
+    direct_imports = sorted(
+        (it for it in handler_imports if it.depth == 1),
+        key=lambda it: it.cumulative_us,
+        reverse=True,
+    )
+    for it in direct_imports[:top_n]:
+        lines.append(f"  {it.module:<40} {it.cumulative_us / 1000:>8.1f} ms")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    for handler in sys.argv[1:] or HANDLERS:
+        print(format_report(handler, measure_handler_import(handler)))
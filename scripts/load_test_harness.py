@@ -0,0 +1,205 @@
+"""
+Load test the extract, transform and load stages with synthetic headlines.
+
+S3 is replaced by moto (or any S3-compatible endpoint set in AWS_ENDPOINT_URL, e.g. MinIO, with --s3 endpoint,
+or the in-memory storage backend with --s3 memory) and BigQuery by an in-memory sink. Scraping is replaced by the synthetic headline generator, so the extract
+stage measures serialisation and upload only. Reports use a fixed seed to be comparable across commits.
+
+Usage:
+    uv run ./scripts/load_test_harness.py --sites 100 --headlines-per-hour 10000 --hours 24 --output report.json
+    uv run ./scripts/load_test_harness.py --sites 100 --headlines-per-hour 10000 --hours 24 --compare report.json
+"""
+
+import argparse
+import json
+import os
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from contextlib import ExitStack
+from datetime import datetime
+from functools import partial
+from typing import Any
+from unittest.mock import patch
+
+HANDLER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "newswatch")
+sys.path.insert(0, HANDLER_PATH)
+
+STAGES = ["extract", "transform", "load"]
+DEFAULT_START = datetime(2024, 1, 1, 0, 0)
+
+
+class FakeBigQueryClient:
+    """Keeps inserted rows in memory instead of sending them to BigQuery."""
+
+    def __init__(self) -> None:
+        self.inserted_row_count = 0
+
+    def insert_rows_json(self, table_id: str, data: list[dict]) -> list:
+        self.inserted_row_count += len(data)
+        return []
+
+    def query(self, query: str) -> Any:
+        return self
+
+    def result(self) -> None:
+        return None
+
+
+def percentiles(latencies_ms: list[float]) -> dict[str, float]:
+    """Return the p50, p90, p99 and max of the latencies."""
+
+    if len(latencies_ms) == 1:
+        return {"p50": latencies_ms[0], "p90": latencies_ms[0], "p99": latencies_ms[0], "max": latencies_ms[0]}
+    quantiles = statistics.quantiles(latencies_ms, n=100, method="inclusive")
+    return {"p50": quantiles[49], "p90": quantiles[89], "p99": quantiles[98], "max": max(latencies_ms)}
+
+
+def get_peak_rss_mb() -> float:
+    """Return the peak resident set size of this process (ru_maxrss is in KB on Linux)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def get_git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return "unknown"
+
+
+def run_load_test(
+    site_count: int,
+    headlines_per_hour: int,
+    hours: int,
+    vocabulary_size: int = 5000,
+    seed: int = 0,
+    bucket: str = "newswatch-load-test",
+    s3: str = "moto",
+) -> dict[str, Any]:
+    """Run the stages for each synthetic hour and return a report of their latencies and throughput."""
+
+    # The stage modules read AWS_EXECUTION_ENV when imported, so they are imported after it is set
+    import boto3
+    import moto
+
+    from extract import put_headlines_to_s3
+    from load import load
+    from synthetic_headlines import build_vocabulary, generate_headlines, generate_hourly_timestamps
+    from transform import transform
+
+    from common.utils import build_s3_key
+
+    extract_s3_prefix, transform_s3_prefix = "headlines", "word-frequencies"
+    rng = random.Random(seed)
+    vocabulary = build_vocabulary(vocabulary_size)
+    bigquery_client = FakeBigQueryClient()
+    latencies_ms: dict[str, list[float]] = {stage: [] for stage in STAGES}
+
+    with ExitStack() as stack:
+        if s3 == "moto":
+            stack.enter_context(moto.mock_aws())
+        storage_backend = "memory" if s3 == "memory" else "s3"
+        stack.enter_context(
+            patch.dict(os.environ, {"TRANSFORM_S3_PREFIX": transform_s3_prefix, "STORAGE_BACKEND": storage_backend})
+        )
+        # The WordNet corpus is expected to be available locally instead of being cached in S3
+        stack.enter_context(patch("transform.get_wordnet_corpus"))
+        stack.enter_context(patch("common.bigquery._get_bq_client", return_value=bigquery_client))
+        stack.enter_context(
+            patch("load.excluded_words_txt_path", os.path.join(HANDLER_PATH, "resources", "excluded-words.txt"))
+        )
+
+        if s3 == "moto":
+            boto3.client("s3").create_bucket(Bucket=bucket)
+
+        started = time.perf_counter()
+        for timestamp in generate_hourly_timestamps(DEFAULT_START, hours):
+            headlines = generate_headlines(site_count, headlines_per_hour, timestamp, vocabulary, rng)
+            extract_key = build_s3_key(prefix=extract_s3_prefix, timestamp=timestamp, extension="parquet")
+            transform_key = build_s3_key(prefix=transform_s3_prefix, timestamp=timestamp, extension="parquet")
+
+            for stage, run_stage in [
+                ("extract", partial(put_headlines_to_s3, bucket=bucket, key=extract_key, headlines=headlines)),
+                ("transform", partial(transform, bucket, extract_key)),
+                ("load", partial(load, bucket, transform_key)),
+            ]:
+                stage_started = time.perf_counter()
+                run_stage()
+                latencies_ms[stage].append((time.perf_counter() - stage_started) * 1000)
+        elapsed_sec = time.perf_counter() - started
+
+    return {
+        "commit": get_git_commit(),
+        "parameters": {
+            "sites": site_count,
+            "headlines_per_hour": headlines_per_hour,
+            "hours": hours,
+            "vocabulary_size": vocabulary_size,
+            "seed": seed,
+            "s3": s3,
+        },
+        "elapsed_sec": round(elapsed_sec, 3),
+        "headlines_per_sec": round(headlines_per_hour * hours / elapsed_sec, 1),
+        "loaded_rows": bigquery_client.inserted_row_count,
+        "peak_rss_mb": round(get_peak_rss_mb(), 1),
+        "latency_ms": {
+            stage: {k: round(v, 1) for k, v in percentiles(latencies_ms[stage]).items()} for stage in STAGES
+        },
+    }
+
+
+def format_comparison(report: dict[str, Any], baseline: dict[str, Any]) -> str:
+    """Format the relative change of each metric compared to a baseline report."""
+
+    def _change(current: float, previous: float) -> str:
+        return f"{current:>10} ({(current - previous) / previous:+.1%})" if previous else f"{current:>10}"
+
+    lines = [f"{report['commit']} compared to {baseline['commit']}"]
+    for metric in ["elapsed_sec", "headlines_per_sec", "peak_rss_mb"]:
+        lines.append(f"{metric:<24} {_change(report[metric], baseline[metric])}")
+    for stage in STAGES:
+        for percentile, value in report["latency_ms"][stage].items():
+            lines.append(
+                f"{stage + ' ' + percentile + ' ms':<24} {_change(value, baseline['latency_ms'][stage][percentile])}"
+            )
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sites", type=int, default=20)
+    parser.add_argument("--headlines-per-hour", type=int, default=2000)
+    parser.add_argument("--hours", type=int, default=24)
+    parser.add_argument("--vocabulary-size", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--s3", choices=["moto", "endpoint", "memory"], default="moto")
+    parser.add_argument("--bucket", default="newswatch-load-test")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--compare", help="Compare with a JSON report of a previous run")
+    args = parser.parse_args()
+
+    # Run the stages as they run in AWS Lambda, but without emitting metrics for every hour
+    os.environ.setdefault("AWS_EXECUTION_ENV", "load-test")
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+    os.environ.setdefault("METRICS_FORMAT", "off")
+    os.environ.setdefault("BIGQUERY_TABLE_ID", "load-test.load-test.load-test")
+
+    load_test_report = run_load_test(
+        site_count=args.sites,
+        headlines_per_hour=args.headlines_per_hour,
+        hours=args.hours,
+        vocabulary_size=args.vocabulary_size,
+        seed=args.seed,
+        bucket=args.bucket,
+        s3=args.s3,
+    )
+    print(json.dumps(load_test_report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(load_test_report, f, indent=2)
+    if args.compare:
+        with open(args.compare, "r") as f:
+            print(format_comparison(load_test_report, json.load(f)))
@@ -0,0 +1,56 @@
+"""
+Query the word sketches written by the load stage for the top words and the frequencies of words
+over a time range, without reading the hourly word frequencies.
+
+The sketches are read from S3, or from the local storage with STORAGE_BACKEND=local.
+Dates are inclusive and given as YYYY-MM-DD, or YYYY-MM-DDTHH for hours.
+
+Usage: uv run ./scripts/query_word_sketches.py --bucket <bucket> --start 2024-01-01 --end 2024-12-31 --top 100
+       uv run ./scripts/query_word_sketches.py --bucket <bucket> --start 2024-01-01 --end 2024-01-31 --word election
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+SRC_PATH = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "newswatch"))
+sys.path.insert(0, SRC_PATH)
+
+from common.word_sketches import DEFAULT_WORD_SKETCHES_S3_PREFIX, query_word_sketches  # noqa: E402
+
+
+def parse_time_range(start: str, end: str) -> tuple[datetime, datetime]:
+    """Return the first hour of start and the hour after the last hour of end."""
+
+    end_time = datetime.fromisoformat(end)
+    return datetime.fromisoformat(start), end_time + (timedelta(hours=1) if "T" in end else timedelta(days=1))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bucket", default=os.environ.get("S3_BUCKET_NAME", ""))
+    parser.add_argument("--prefix", default=os.environ.get("WORD_SKETCHES_S3_PREFIX", DEFAULT_WORD_SKETCHES_S3_PREFIX))
+    parser.add_argument("--start", required=True)
+    parser.add_argument("--end", required=True)
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--word", action="append", default=[], help="Estimate the frequency of a word (repeatable)")
+    args = parser.parse_args()
+
+    start, end = parse_time_range(args.start, args.end)
+    started = time.perf_counter()
+    word_sketch, missing_keys = query_word_sketches(bucket=args.bucket, start=start, end=end, prefix=args.prefix)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    if word_sketch is None:
+        sys.exit(f"No word sketches from {start} to {end} under {args.bucket}/{args.prefix}")
+    print(
+        f"Merged the sketches from {start} to {end} in {elapsed_ms:.0f} ms ({len(missing_keys)} periods without data), "
+        f"estimates exceed the true sums by at most {word_sketch.sketch.error_bound:,.0f} with 98% probability"
+    )
+    for word in args.word:
+        print(f"{word_sketch.estimate(word):>14,} {word}")
+    if not args.word:
+        for rank, (word, frequency) in enumerate(word_sketch.most_common(args.top), start=1):
+            print(f"{rank:>4} {frequency:>14,} {word}")
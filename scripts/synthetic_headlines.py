@@ -0,0 +1,86 @@
+"""
+Generate synthetic headline corpora with a Zipfian word distribution for load tests and benchmarks.
+"""
+
+import csv
+import os
+import random
+from datetime import datetime, timedelta
+
+from common.models import Headline
+
+TREEMAP_CSV_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "..",
+    "assets",
+    "data",
+    "treemap_all_words_20230601_20241012.csv",
+)
+
+# The most frequent words in headlines are filtered out before loading, so they are not in the treemap data
+FUNCTION_WORDS = [
+    "the", "to", "of", "in", "and", "a", "for", "on", "is", "with", "as", "at", "after", "by", "from",
+    "be", "it", "over", "his", "her", "says", "new", "how", "why", "what", "was", "are", "has", "will",
+]  # fmt: skip
+
+DEFAULT_ZIPF_EXPONENT = 1.07
+
+
+def build_vocabulary(size: int) -> list[str]:
+    """
+    Return a vocabulary ordered by rank: function words, real headline words from the treemap data,
+    their plural forms (to exercise the lemmatiser) and synthetic rare words.
+    """
+
+    with open(TREEMAP_CSV_PATH, "r") as f:
+        headline_words = list(dict.fromkeys(row["word"] for row in csv.DictReader(f)))
+
+    vocabulary = list(dict.fromkeys(FUNCTION_WORDS + headline_words + [f"{word}s" for word in headline_words]))
+    vocabulary += [f"word{i}" for i in range(max(size - len(vocabulary), 0))]
+    return vocabulary[:size]
+
+
+def zipf_weights(size: int, exponent: float = DEFAULT_ZIPF_EXPONENT) -> list[float]:
+    """Return unnormalised Zipfian weights for ranks 1..size."""
+    return [1 / rank**exponent for rank in range(1, size + 1)]
+
+
+def generate_headline_texts(
+    count: int,
+    vocabulary: list[str],
+    weights: list[float],
+    rng: random.Random,
+    words_per_headline: tuple[int, int] = (6, 14),
+) -> list[str]:
+    """Generate headline texts by sampling words from the vocabulary."""
+
+    lengths = [rng.randint(*words_per_headline) for _ in range(count)]
+    words = rng.choices(vocabulary, weights=weights, k=sum(lengths))
+    texts, start = [], 0
+    for length in lengths:
+        texts.append(" ".join(words[start : start + length]).capitalize())  # noqa
+        start += length
+    return texts
+
+
+def generate_headlines(
+    site_count: int,
+    headlines_per_hour: int,
+    timestamp: datetime,
+    vocabulary: list[str],
+    rng: random.Random,
+) -> list[Headline]:
+    """Generate one hour of headlines spread evenly across the sites."""
+
+    weights = zipf_weights(len(vocabulary))
+    headlines: list[Headline] = []
+    for site_index in range(site_count):
+        site_headline_count = headlines_per_hour // site_count + (site_index < headlines_per_hour % site_count)
+        texts = generate_headline_texts(site_headline_count, vocabulary, weights, rng)
+        headlines.extend(Headline(site_name=f"site{site_index}", timestamp=timestamp, headline=t) for t in texts)
+    return headlines
+
+
+def generate_hourly_timestamps(start: datetime, hours: int) -> list[datetime]:
+    """Return consecutive hourly timestamps starting from start."""
+    return [start + timedelta(hours=hour) for hour in range(hours)]
@@ -10,6 +10,8 @@
 #              Execution error for Lambda-<insert Lambda function name>.
 #              The JSON message body of the SNS notification contains the full event details.
 # Author: Sudhanshu Malhotra
+# Modified: errors are parsed, deduplicated and published as one digest per time window
+#           instead of one message per CloudWatch Logs subscription batch.
 from __future__ import annotations
 
 import base64
@@ -17,6 +19,9 @@ import gzip
 import json
 import logging
 import os
+import re
+import time
+from datetime import datetime, timezone
 
 import boto3
 from botocore.exceptions import ClientError
@@ -34,47 +39,162 @@ def logpayload(event):
     return log_payload
 
 
-def error_details(payload):
-    error_msg = ""
-    log_events = payload["logEvents"]
-    logger.debug(payload)
-    loggroup = payload["logGroup"]
-    logstream = payload["logStream"]
-    lambda_func_name = loggroup.split("/")
-    logger.debug(f"LogGroup: {loggroup}")
-    logger.debug(f"Logstream: {logstream}")
-    logger.debug(f"Function name: {lambda_func_name[3]}")
-    logger.debug(log_events)
-    for log_event in log_events:
-        error_msg += log_event["message"]
-    logger.debug("Message: %s" % error_msg.split("\n"))
-    return loggroup, logstream, error_msg, lambda_func_name
-
-
-def publish_message(loggroup, logstream, error_msg, lambda_func_name):
+# Messages logged by call_and_catch_error_with_logging, e.g. "Error in scrape_url: ReadTimeout: ..."
+CAUGHT_ERROR_PATTERN = re.compile(r"Error in (?P<function>\w+): (?P<exception_type>[\w.]+): ")
+# Uncaught exceptions logged by the Lambda runtime, e.g. "[ERROR] ValueError: ..."
+UNCAUGHT_ERROR_PATTERN = re.compile(r"\[ERROR\]\s+(?P<exception_type>[\w.]+): ")
+SITE_PATTERNS = [re.compile(r"host='(?P<site>[^']+)'"), re.compile(r"https?://(?P<site>[^/\s:'\"]+)")]
+
+DEFAULT_WINDOW_SEC = 3600
+DEFAULT_STATE_KEY = "monitoring/error-digest-state.json"
+MAX_SUBJECT_LENGTH = 100  # SNS limit
+MAX_SAMPLE_LENGTH = 300
+
+_in_memory_state = {}
+
+
+def parse_error(lambda_func_name, log_event):
+    """Parse a log event into a structured error with the fields used for deduplication."""
+    message = log_event["message"]
+    caught_error = CAUGHT_ERROR_PATTERN.search(message)
+    uncaught_error = UNCAUGHT_ERROR_PATTERN.search(message)
+    if caught_error:
+        function, exception_type = caught_error.group("function"), caught_error.group("exception_type")
+    elif uncaught_error:
+        function, exception_type = "lambda_handler", uncaught_error.group("exception_type")
+    else:
+        function, exception_type = "unknown", "unknown"
+    site = next((match.group("site") for pattern in SITE_PATTERNS if (match := pattern.search(message))), "-")
+    return {
+        "lambda_function": lambda_func_name,
+        "function": function,
+        "site": site,
+        "exception_type": exception_type,
+        "timestamp": log_event.get("timestamp", int(time.time() * 1000)),
+        "message": message.strip()[:MAX_SAMPLE_LENGTH],
+    }
+
+
+def error_signature(error):
+    return "|".join([error["lambda_function"], error["function"], error["site"], error["exception_type"]])
+
+
+def parse_errors(payload):
+    lambda_func_name = payload["logGroup"].split("/")[3]
+    logger.debug(f"LogGroup: {payload['logGroup']}, Logstream: {payload['logStream']}")
+    return [parse_error(lambda_func_name, log_event) for log_event in payload["logEvents"]]
+
+
+def aggregate_errors(state, errors, now):
+    """Count errors by signature in the current window, which starts with its first error."""
+    if errors and not state.get("errors"):
+        state = {"window_start": now, "errors": {}}
+    for error in errors:
+        aggregated = state["errors"].setdefault(
+            error_signature(error),
+            {
+                "lambda_function": error["lambda_function"],
+                "function": error["function"],
+                "site": error["site"],
+                "exception_type": error["exception_type"],
+                "count": 0,
+                "first_seen": error["timestamp"],
+                "sample": error["message"],
+            },
+        )
+        aggregated["count"] += 1
+        aggregated["first_seen"] = min(aggregated["first_seen"], error["timestamp"])
+        aggregated["last_seen"] = max(aggregated.get("last_seen", error["timestamp"]), error["timestamp"])
+    return state
+
+
+def is_window_closed(state, now, window_sec):
+    return bool(state.get("errors")) and now - state["window_start"] >= window_sec
+
+
+def format_digest(state, now):
+    """Return the subject and message of a digest of the aggregated errors."""
+    errors = sorted(state["errors"].values(), key=lambda error: error["count"], reverse=True)
+    total = sum(error["count"] for error in errors)
+    lambda_func_names = sorted({error["lambda_function"] for error in errors})
+
+    def _format_time(epoch_sec):
+        return datetime.fromtimestamp(epoch_sec, tz=timezone.utc).strftime("%Y-%m-%d %H:%M:%S UTC")
+
+    message = ""
+    message += "\nLambda error digest" + "\n\n"
+    message += "##########################################################\n"
+    message += f"# Window:- {_format_time(state['window_start'])} - {_format_time(now)}\n"
+    message += f"# Errors:- {total} in total, {len(errors)} distinct\n"
+    for error in errors:
+        message += "#\n"
+        message += (
+            f"# {error['count']} x {error['lambda_function']} / {error['function']} / "
+            f"{error['site']} / {error['exception_type']}\n"
+        )
+        message += "# \t\t" + error["sample"].split("\n")[0] + "\n"
+    message += "##########################################################\n"
+
+    subject = f"{total} execution errors for Lambda - {', '.join(lambda_func_names)}"
+    return subject[:MAX_SUBJECT_LENGTH], message
+
+
+def load_state():
+    """Load the digest state from S3 if STATE_S3_BUCKET is set, otherwise from memory of the container."""
+    bucket = os.environ.get("STATE_S3_BUCKET")
+    if not bucket:
+        return dict(_in_memory_state)
+    s3client = boto3.client("s3")
+    try:
+        response = s3client.get_object(Bucket=bucket, Key=os.environ.get("STATE_S3_KEY", DEFAULT_STATE_KEY))
+    except s3client.exceptions.NoSuchKey:
+        return {}
+    return json.loads(response["Body"].read())
+
+
+def save_state(state):
+    bucket = os.environ.get("STATE_S3_BUCKET")
+    if not bucket:
+        _in_memory_state.clear()
+        _in_memory_state.update(state)
+        return
+    s3client = boto3.client("s3")
+    s3client.put_object(
+        Bucket=bucket,
+        Key=os.environ.get("STATE_S3_KEY", DEFAULT_STATE_KEY),
+        Body=json.dumps(state).encode("utf-8"),
+    )
+
+
+def publish_digest(subject, message):
+    """Publish the digest to the SNS topic and return whether it was published."""
     sns_arn = os.environ["snsARN"]  # Getting the SNS Topic ARN passed in by the environment variables.
     snsclient = boto3.client("sns")
     try:
-        message = ""
-        message += "\nLambda error  summary" + "\n\n"
-        message += "##########################################################\n"
-        message += "# LogGroup Name:- " + str(loggroup) + "\n"
-        message += "# LogStream:- " + str(logstream) + "\n"
-        message += "# Log Message:- " + "\n"
-        message += "# \t\t" + str(error_msg.split("\n")) + "\n"
-        message += "##########################################################\n"
-
         # Sending the notification...
         snsclient.publish(
             TargetArn=sns_arn,
-            Subject=f"Execution error for Lambda - {lambda_func_name[3]}",
+            Subject=subject,
             Message=message,
         )
     except ClientError as e:
         logger.error("An error occured: %s" % e)
+        return False
+    return True
 
 
 def lambda_handler(event, context):
-    pload = logpayload(event)
-    lgroup, lstream, errmessage, lambdaname = error_details(pload)
-    publish_message(lgroup, lstream, errmessage, lambdaname)
+    """
+    Handle CloudWatch Logs subscription batches and scheduled events.
+    Errors are aggregated in the state, and a digest is published once the window is over.
+    Scheduled events make sure the last window of an outage is published too.
+    If publishing fails, the errors are kept in the state and published with the next event.
+    """
+    now = time.time()
+    window_sec = int(os.environ.get("DIGEST_WINDOW_SEC", DEFAULT_WINDOW_SEC))
+    state = load_state()
+    if "awslogs" in event:
+        state = aggregate_errors(state, parse_errors(logpayload(event)), now)
+    if is_window_closed(state, now, window_sec) and publish_digest(*format_digest(state, now)):
+        state = {}
+    save_state(state)
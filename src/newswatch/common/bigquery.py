@@ -0,0 +1,58 @@
+"""
+BigQuery helper functions used by the load stage.
+"""
+
+import functools
+import json
+from datetime import datetime
+from typing import Sequence
+
+import boto3
+from google.api_core.exceptions import BadRequest as GcpBadRequest
+from google.cloud import bigquery
+from google.oauth2 import service_account
+
+from common.metrics import span
+
+
+class DeleteFailedError(Exception):
+    """Raised when a BigQuery delete operation fails."""
+
+    def __init__(self, errors: str):
+        self.errors = errors
+
+
+@functools.cache
+def _get_bq_client() -> bigquery.Client:
+    """
+    Return a BigQuery client using credentials stored in AWS SSM Paramter Store.
+    The client is created once per container and shared by the invocations of all tenants.
+    Note: SSM is used instead of Secrets Manager to reduce the number of AWS services involved.
+    """
+
+    ssm = boto3.client("ssm")
+    response = ssm.get_parameter(Name="NewsWatchBigQueryCredentials", WithDecryption=True)
+    credentials_info = json.loads(response["Parameter"]["Value"], strict=False)
+    credentials = service_account.Credentials.from_service_account_info(credentials_info)
+    return bigquery.Client(credentials=credentials)
+
+
+def delete_timestamp_from_bigquery(table_id: str, timestamp: datetime) -> bigquery.table.RowIterator:
+    """Delete records from a BigQuery table with a given timestamp"""
+
+    client = _get_bq_client()
+    query_delete = f"DELETE FROM `{table_id}` WHERE timestamp = '{timestamp}'"
+    try:
+        with span("bigquery_delete"):
+            return client.query(query_delete).result()
+    except GcpBadRequest as e:
+        raise DeleteFailedError(errors=e.errors)
+
+
+def insert_data_into_bigquery_table(table_id: str, data: list[dict]) -> Sequence[dict]:
+    """Insert multiple records into a BigQuery table."""
+
+    client = _get_bq_client()
+    with span("bigquery_insert") as insert_span:
+        insert_span.add(rows=len(data))
+        return client.insert_rows_json(table_id, data)
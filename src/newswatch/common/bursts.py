@@ -0,0 +1,231 @@
+"""
+Streaming detection of words whose frequency bursts above their recent history.
+
+Each word has an exponentially weighted moving average (EWMA) and variance of its hourly frequency,
+with a half-life of BURST_HALF_LIFE_HOURS processed hours. A word is bursting in an hour if its frequency
+is BURST_Z_THRESHOLD standard deviations above its average, counting at least BURST_MIN_STD as the standard
+deviation, so that new and rare words need a substantial frequency to burst. No bursts are reported for
+the first BURST_WARMUP_HOURS processed hours, and the words seen in them start from their first frequency.
+
+Only the words of the hour are updated: the hours in which a word was missing count as zero frequency,
+and are applied in closed form when it appears again, so an update takes O(words in the hour).
+Hours are counted as processed, so hours that were not extracted don't count as zeros.
+Words not seen for BURST_STATE_TTL_HOURS processed hours are forgotten to keep the state compact.
+
+Hours must be processed in order: an hour processed again is skipped, as its bursts were written before the
+state was saved, while an hour before the last processed one raises OutOfOrderHourError.
+The state is saved with a conditional put, so that concurrent invocations don't overwrite each other's hours.
+"""
+
+import gzip
+import json
+import math
+import os
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from common.models import Burst
+from common.records import WordFrequencyLike
+from common.storage import NoSuchKeyError
+from common.utils import get_from_s3, get_logger, update_s3_object
+
+logger = get_logger()
+
+BURST_STATE_FORMAT_VERSION = 1
+DEFAULT_HALF_LIFE_HOURS = 72.0
+DEFAULT_Z_THRESHOLD = 4.0
+DEFAULT_MIN_STD = 50.0
+DEFAULT_WARMUP_HOURS = 24
+DEFAULT_TOP_N = 20
+DEFAULT_STATE_TTL_HOURS = 24 * 30
+
+
+class OutOfOrderHourError(ValueError):
+    """Raised when an hour is before the last processed hour, as it can't be added to the moving averages."""
+
+
+@dataclass
+class BurstSettings:
+    half_life_hours: float = DEFAULT_HALF_LIFE_HOURS
+    z_threshold: float = DEFAULT_Z_THRESHOLD
+    min_std: float = DEFAULT_MIN_STD
+    # No bursts are reported until this many hours were processed
+    warmup_hours: int = DEFAULT_WARMUP_HOURS
+    top_n: int = DEFAULT_TOP_N
+    state_ttl_hours: int = DEFAULT_STATE_TTL_HOURS
+
+    @property
+    def alpha(self) -> float:
+        """The weight of the latest hour in the moving averages."""
+        return 1 - 0.5 ** (1 / self.half_life_hours)
+
+
+def get_burst_settings() -> BurstSettings:
+    """Return the settings of the burst detection from the BURST_* environment variables."""
+
+    return BurstSettings(
+        half_life_hours=float(os.environ.get("BURST_HALF_LIFE_HOURS", DEFAULT_HALF_LIFE_HOURS)),
+        z_threshold=float(os.environ.get("BURST_Z_THRESHOLD", DEFAULT_Z_THRESHOLD)),
+        min_std=float(os.environ.get("BURST_MIN_STD", DEFAULT_MIN_STD)),
+        warmup_hours=int(os.environ.get("BURST_WARMUP_HOURS", DEFAULT_WARMUP_HOURS)),
+        top_n=int(os.environ.get("BURST_TOP_N", DEFAULT_TOP_N)),
+        state_ttl_hours=int(os.environ.get("BURST_STATE_TTL_HOURS", DEFAULT_STATE_TTL_HOURS)),
+    )
+
+
+def decay_ewma(mean: float, variance: float, alpha: float, zero_hours: int) -> tuple[float, float]:
+    """Return the EWMA mean and variance after zero_hours hours with zero frequency."""
+
+    decay = (1 - alpha) ** zero_hours
+    return mean * decay, decay * (variance + mean * mean * (1 - decay))
+
+
+def update_ewma(mean: float, variance: float, alpha: float, value: float) -> tuple[float, float]:
+    """Return the EWMA mean and variance after an hour with the value."""
+
+    difference = value - mean
+    increment = alpha * difference
+    return mean + increment, (1 - alpha) * (variance + difference * increment)
+
+
+def get_hour_index(timestamp: datetime) -> int:
+    return (timestamp.replace(tzinfo=None) - datetime(1970, 1, 1)) // timedelta(hours=1)
+
+
+class BurstDetector:
+    """The moving averages of the words and the hours they were last updated in."""
+
+    def __init__(self, settings: BurstSettings | None = None):
+        self.settings = settings or BurstSettings()
+        # Word: [EWMA mean, EWMA variance, processed hour it was last updated in]
+        self.words: dict[str, list[float]] = {}
+        self.hours_processed = 0
+        self.last_hour: int | None = None
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def update(self, timestamp: datetime, word_frequencies: Sequence[WordFrequencyLike]) -> list[Burst]:
+        """
+        Update the averages with the word frequencies of the hour and return its bursts, ranked by z-score.
+        The last processed hour is skipped, e.g. when transformed again, and earlier hours raise OutOfOrderHourError.
+        """
+
+        hour = get_hour_index(timestamp)
+        if self.last_hour is not None and hour == self.last_hour:
+            logger.info(f"Skipping burst detection for {timestamp}, the hour was already processed")
+            return []
+        if self.last_hour is not None and hour < self.last_hour:
+            raise OutOfOrderHourError(
+                f"Can't detect the bursts of {timestamp}, a later hour was already processed, "
+                "so the hours after it must be transformed again in order"
+            )
+
+        alpha = self.settings.alpha
+        is_warmed_up = self.hours_processed >= self.settings.warmup_hours
+        bursts = []
+        for wf in word_frequencies:
+            # Words seen during the warm-up start from their frequency, as their history is unknown,
+            # while words seen for the first time later start from zero, so that new words can burst
+            initial_mean = 0.0 if is_warmed_up else float(wf.frequency)
+            mean, variance, last_updated = self.words.get(wf.word, (initial_mean, 0.0, self.hours_processed - 1))
+            zero_hours = self.hours_processed - 1 - int(last_updated)
+            if zero_hours > 0:
+                mean, variance = decay_ewma(mean, variance, alpha, zero_hours)
+            z_score = (wf.frequency - mean) / max(math.sqrt(variance), self.settings.min_std)
+            if is_warmed_up and z_score >= self.settings.z_threshold:
+                bursts.append((z_score, wf.word, wf.frequency, mean))
+            mean, variance = update_ewma(mean, variance, alpha, wf.frequency)
+            self.words[wf.word] = [mean, variance, self.hours_processed]
+
+        self.hours_processed += 1
+        self.last_hour = hour
+        bursts.sort(reverse=True)
+        return [
+            Burst(
+                word=word,
+                timestamp=timestamp,
+                rank=rank,
+                frequency=frequency,
+                expected_frequency=round(mean, 2),
+                z_score=round(z_score, 2),
+            )
+            for rank, (z_score, word, frequency, mean) in enumerate(bursts[: self.settings.top_n], start=1)
+        ]
+
+    def prune(self) -> int:
+        """Forget the words not seen for state_ttl_hours processed hours and return how many were removed."""
+
+        oldest_hour = self.hours_processed - self.settings.state_ttl_hours
+        stale_words = [word for word, (_, _, last_updated) in self.words.items() if last_updated < oldest_hour]
+        for word in stale_words:
+            del self.words[word]
+        return len(stale_words)
+
+    def to_bytes(self) -> bytes:
+        """Serialise the state as gzipped JSON. The settings are not saved, so they can be changed."""
+
+        data = {
+            "format_version": BURST_STATE_FORMAT_VERSION,
+            "hours_processed": self.hours_processed,
+            "last_hour": self.last_hour,
+            "words": {
+                word: [round(mean, 3), round(variance, 3), int(hour)]
+                for word, (mean, variance, hour) in self.words.items()
+            },
+        }
+        return gzip.compress(json.dumps(data, separators=(",", ":")).encode("utf-8"))
+
+    @classmethod
+    def from_bytes(cls, state_bytes: bytes, settings: BurstSettings | None = None) -> "BurstDetector":
+        """Deserialise a state, starting empty if the format is not supported."""
+
+        detector = cls(settings=settings)
+        data = json.loads(gzip.decompress(state_bytes))
+        if data.get("format_version") == BURST_STATE_FORMAT_VERSION:
+            detector.words = data["words"]
+            detector.hours_processed = data["hours_processed"]
+            detector.last_hour = data["last_hour"]
+        else:
+            logger.warning("Ignoring a burst detection state with an unsupported format version")
+        return detector
+
+
+def get_burst_detector(bucket: str, key: str, settings: BurstSettings | None = None) -> BurstDetector:
+    """Load the state of the burst detection from S3, or start with an empty one if it doesn't exist."""
+
+    try:
+        return BurstDetector.from_bytes(get_from_s3(bucket_name=bucket, key=key), settings=settings)
+    except NoSuchKeyError:
+        logger.info(f"No burst detection state found at {bucket}/{key}")
+        return BurstDetector(settings=settings)
+
+
+def update_burst_detector(
+    bucket: str,
+    key: str,
+    update: Callable[[BurstDetector], None],
+    settings: BurstSettings | None = None,
+) -> BurstDetector:
+    """
+    Apply the update to the state of the burst detection in S3, forget the stale words and save it if it wasn't
+    changed concurrently. Otherwise the update is applied again to the state saved by the other invocation.
+    """
+
+    detectors = []
+
+    def update_state(state_bytes: bytes | None) -> bytes:
+        if state_bytes is None:
+            logger.info(f"No burst detection state found at {bucket}/{key}")
+            detector = BurstDetector(settings=settings)
+        else:
+            detector = BurstDetector.from_bytes(state_bytes, settings=settings)
+        update(detector)
+        detector.prune()
+        detectors.append(detector)
+        return detector.to_bytes()
+
+    update_s3_object(bucket_name=bucket, key=key, update=update_state)
+    logger.info(f"Saved the burst detection state of {len(detectors[-1])} words")
+    return detectors[-1]
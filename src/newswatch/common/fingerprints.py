@@ -0,0 +1,13 @@
+"""
+Headline fingerprints, short and stable hashes of the headline text.
+
+Most headlines on a front page stay the same from hour to hour, so the work done for a headline
+can be cached by its fingerprint, e.g. its lemmatised words in the token count cache.
+"""
+
+import hashlib
+
+
+def fingerprint_headline(headline: str) -> str:
+    """Return a short, stable hash of the headline text."""
+    return hashlib.blake2b(headline.encode("utf-8"), digest_size=8).hexdigest()
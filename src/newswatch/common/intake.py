@@ -0,0 +1,124 @@
+"""
+Intake of S3 "Object Created" events by the transform and load functions.
+
+In the staged mode the EventBridge rules send the events to an SQS queue, from which Lambda invokes
+the function with batches collected for up to a time window or until a batch size is reached.
+The objects of a batch are processed one by one in the same invocation, and an object created
+several times in the batch (e.g. when re-extracting an hour) is processed only once.
+
+The functions also accept a single EventBridge event, as when they were invoked by the rules directly.
+"""
+
+import json
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterable
+
+from common.utils import extract_s3_bucket_and_key_from_event, get_logger
+
+logger = get_logger()
+
+# The defaults of the SQS event source mapping in template.yaml
+DEFAULT_BATCH_SIZE = 10
+DEFAULT_BATCH_WINDOW_SEC = 60.0
+
+
+@dataclass
+class S3ObjectEvent:
+    """An S3 object and the IDs of the SQS messages that notified about it, if any."""
+
+    bucket: str
+    key: str
+    message_ids: list[str] = field(default_factory=list)
+
+
+def is_sqs_event(event: dict) -> bool:
+    return bool(event) and "Records" in event
+
+
+def coalesce_s3_object_events(event: dict) -> list[S3ObjectEvent]:
+    """
+    Return the S3 objects of an SQS batch of EventBridge events, or of a single EventBridge event.
+    Objects notified about more than once are returned once, in the order they were first notified.
+    """
+
+    if not is_sqs_event(event):
+        bucket, key = extract_s3_bucket_and_key_from_event(event)
+        return [S3ObjectEvent(bucket=bucket, key=key)]
+
+    s3_objects: dict[tuple[str, str], S3ObjectEvent] = {}
+    for record in event["Records"]:
+        bucket, key = extract_s3_bucket_and_key_from_event(json.loads(record["body"]))
+        s3_object = s3_objects.setdefault((bucket, key), S3ObjectEvent(bucket=bucket, key=key))
+        s3_object.message_ids.append(record["messageId"])
+    if len(s3_objects) < len(event["Records"]):
+        logger.info(f"Coalesced {len(event['Records'])} events into {len(s3_objects)} objects")
+    return list(s3_objects.values())
+
+
+def process_s3_object_events(event: dict, process: Callable[[str, str], None]) -> dict[str, Any] | None:
+    """
+    Call process with the bucket and key of each object of the event.
+    For an SQS batch, the objects that failed are logged and their messages are reported as failed,
+    so that only they are retried. For a single event, the exception is raised.
+    """
+
+    s3_objects = coalesce_s3_object_events(event)
+    if not is_sqs_event(event):
+        process(s3_objects[0].bucket, s3_objects[0].key)
+        return None
+
+    batch_item_failures: list[dict[str, str]] = []
+    for s3_object in s3_objects:
+        try:
+            process(s3_object.bucket, s3_object.key)
+        except Exception as e:
+            logger.error(f"Failed to process {s3_object.bucket}/{s3_object.key}: {type(e).__name__}: {e}")
+            batch_item_failures.extend({"itemIdentifier": message_id} for message_id in s3_object.message_ids)
+    return {"batchItemFailures": batch_item_failures}
+
+
+# Simulated event stream for local testing
+
+
+def build_object_created_event(bucket: str, key: str) -> dict:
+    """Build an EventBridge "Object Created" event of S3 with the fields used by the functions."""
+    return {
+        "source": "aws.s3",
+        "detail-type": "Object Created",
+        "detail": {"bucket": {"name": bucket}, "object": {"key": key}},
+    }
+
+
+def build_sqs_event(events: Iterable[dict]) -> dict:
+    """Build an SQS batch as Lambda receives it from the queue the EventBridge events were sent to."""
+    return {
+        "Records": [
+            {"messageId": str(uuid.uuid4()), "body": json.dumps(event), "eventSource": "aws:sqs"} for event in events
+        ]
+    }
+
+
+def batch_event_stream(
+    timed_events: Iterable[tuple[float, dict]],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    batch_window_sec: float = DEFAULT_BATCH_WINDOW_SEC,
+) -> list[dict]:
+    """
+    Group a stream of (time in seconds, EventBridge event) into SQS batches the way the event source
+    mapping does: a batch is sent when it is full or batch_window_sec after its first event.
+    """
+
+    batches: list[list[dict]] = []
+    batch: list[dict] = []
+    batch_started_at = 0.0
+    for event_time, event in sorted(timed_events, key=lambda timed_event: timed_event[0]):
+        if batch and (len(batch) >= batch_size or event_time - batch_started_at >= batch_window_sec):
+            batches.append(batch)
+            batch = []
+        if not batch:
+            batch_started_at = event_time
+        batch.append(event)
+    if batch:
+        batches.append(batch)
+    return [build_sqs_event(batch) for batch in batches]
@@ -0,0 +1,193 @@
+"""
+Lemmatisers of the words of the headlines, selected by LEMMATISER.
+
+- textblob (default): TextBlob's noun lemmatisation over the NLTK WordNet corpus, the reference
+  that the word frequencies in BigQuery were counted with.
+- lookup: the same lemmas from a table precomputed from WordNet (scripts/build_lemma_table.py),
+  without importing NLTK or downloading the corpus.
+- suffix: WordNet's common plural suffix rules without checking the results against the dictionary.
+  It needs no data, but its lemmas diverge from the reference (e.g. "news" becomes "new").
+
+Switching changes the lemmas of some words, which would show up as a break in their time series,
+so the divergence from the reference should be measured first (scripts/compare_lemmatisers.py).
+"""
+
+import gzip
+import json
+import os
+from typing import Callable, Protocol
+
+from common.utils import get_logger
+
+logger = get_logger()
+
+LEMMATISERS = ("textblob", "lookup", "suffix")
+DEFAULT_LEMMATISER = "textblob"
+DEFAULT_LEMMA_TABLE_PATH = "./resources/wordnet-noun-lemmas.json.gz"
+LEMMA_TABLE_FORMAT_VERSION = 1
+
+
+class Lemmatiser(Protocol):
+    name: str
+    requires_wordnet_corpus: bool
+
+    def lemmatise(self, word: str) -> str: ...
+
+
+class TextBlobLemmatiser:
+    """The reference lemmatiser. TextBlob and NLTK are imported when it is created."""
+
+    name = "textblob"
+    requires_wordnet_corpus = True
+
+    def __init__(self) -> None:
+        from textblob import Word  # type: ignore[import-untyped]
+
+        self.word_class = Word
+
+    def lemmatise(self, word: str) -> str:
+        return self.word_class(word).lemmatize()
+
+
+class LookupLemmatiser:
+    """Lemmas looked up in a table of the words that WordNet lemmatises to a different word."""
+
+    name = "lookup"
+    requires_wordnet_corpus = False
+
+    def __init__(self, lemmas: dict[str, str]):
+        self.lemmas = lemmas
+
+    def lemmatise(self, word: str) -> str:
+        return self.lemmas.get(word, word)
+
+
+class SuffixLemmatiser:
+    """
+    Strips the plural suffixes of WordNet's rules, choosing between the rules by the ending of the word
+    instead of by the words in the dictionary.
+    """
+
+    name = "suffix"
+    requires_wordnet_corpus = False
+
+    def lemmatise(self, word: str) -> str:
+        if len(word) <= 3 or word.endswith(("ss", "us", "is")):
+            return word
+        if word.endswith("ies") and len(word) > 4:
+            return word[:-3] + "y"
+        if word.endswith(("sses", "xes", "zes", "ches", "shes")):
+            return word[:-2]
+        if word.endswith("men") and len(word) > 4:
+            return word[:-3] + "man"
+        if word.endswith("s"):
+            return word[:-1]
+        return word
+
+
+def get_noun_lemma_candidates(noun_lemmas: list[str], suffix_rules: list[tuple[str, str]]) -> set[str]:
+    """Return the words that the (suffix, replacement) rules turn into one of the lemmas, and the lemmas themselves."""
+
+    candidates = set(noun_lemmas)
+    for lemma in noun_lemmas:
+        for suffix, replacement in suffix_rules:
+            if lemma.endswith(replacement):
+                candidates.add(lemma[: len(lemma) - len(replacement)] + suffix)
+    return candidates
+
+
+def build_lemma_table(lemmatise: Callable[[str], str] | None = None) -> dict[str, str]:
+    """
+    Build the lookup table of the reference lemmatiser. A word can only be lemmatised to a different word
+    if it is an exception in WordNet or a suffix rule turns it into a noun, so those are all the words
+    that need to be looked up. Multi-word lemmas are skipped, as headlines are split into single words.
+    """
+
+    from nltk.corpus import wordnet  # type: ignore[import-untyped]
+
+    lemmatise = lemmatise or TextBlobLemmatiser().lemmatise
+    noun_lemmas = [lemma for lemma in wordnet.all_lemma_names(pos=wordnet.NOUN) if "_" not in lemma]
+    candidates = get_noun_lemma_candidates(noun_lemmas, wordnet.MORPHOLOGICAL_SUBSTITUTIONS[wordnet.NOUN])
+    candidates.update(word for word in wordnet._exception_map[wordnet.NOUN] if "_" not in word)
+    lemmas = {word: lemmatise(word) for word in sorted(candidates)}
+    return {word: lemma for word, lemma in lemmas.items() if lemma != word}
+
+
+def write_lemma_table(path: str, lemmas: dict[str, str], wordnet_version: str) -> None:
+    data = {"format_version": LEMMA_TABLE_FORMAT_VERSION, "wordnet_version": wordnet_version, "lemmas": lemmas}
+    with gzip.open(path, "wt", encoding="utf-8") as file:
+        json.dump(data, file, separators=(",", ":"), sort_keys=True)
+
+
+def load_lemma_table(path: str) -> dict[str, str] | None:
+    """Load a lookup table, or return None if it doesn't exist or has an unsupported format."""
+
+    if not os.path.exists(path):
+        return None
+    with gzip.open(path, "rt", encoding="utf-8") as file:
+        data = json.load(file)
+    if data.get("format_version") != LEMMA_TABLE_FORMAT_VERSION:
+        logger.warning(f"Ignoring {path} with an unsupported format version")
+        return None
+    return data["lemmas"]
+
+
+def create_lemmatiser(name: str, lemma_table_path: str = DEFAULT_LEMMA_TABLE_PATH) -> Lemmatiser:
+    """
+    Create a lemmatiser by name. Raises FileNotFoundError if the table of the lookup lemmatiser is missing,
+    rather than lemmatising with another lemmatiser than the one configured.
+    """
+
+    if name == "textblob":
+        return TextBlobLemmatiser()
+    if name == "lookup":
+        lemmas = load_lemma_table(lemma_table_path)
+        if lemmas is None:
+            raise FileNotFoundError(
+                f"No lemma table found at {lemma_table_path} for the lookup lemmatiser, run make build-lemma-table"
+            )
+        return LookupLemmatiser(lemmas)
+    if name == "suffix":
+        return SuffixLemmatiser()
+    raise ValueError(f"Invalid LEMMATISER: {name}, expected one of {LEMMATISERS}")
+
+
+# Created on first use and kept for the container
+_lemmatiser: Lemmatiser | None = None
+_lemmatiser_config: tuple[str, str] | None = None
+
+
+def get_lemmatiser() -> Lemmatiser:
+    """Return the lemmatiser configured by LEMMATISER and LEMMA_TABLE_PATH."""
+
+    global _lemmatiser, _lemmatiser_config
+    lemmatiser_config = (
+        os.environ.get("LEMMATISER", DEFAULT_LEMMATISER),
+        os.environ.get("LEMMA_TABLE_PATH", DEFAULT_LEMMA_TABLE_PATH),
+    )
+    if _lemmatiser is None or lemmatiser_config != _lemmatiser_config:
+        _lemmatiser = create_lemmatiser(*lemmatiser_config)
+        _lemmatiser_config = lemmatiser_config
+    return _lemmatiser
+
+
+def measure_divergence(
+    words: list[str], reference: Lemmatiser, candidate: Lemmatiser
+) -> tuple[float, dict[tuple[str, str, str], int]]:
+    """
+    Return the share of the words (counted with repetitions) that the candidate lemmatises differently
+    from the reference, and the count of each (word, reference lemma, candidate lemma) that differs.
+    """
+
+    differences: dict[tuple[str, str, str], int] = {}
+    diverging_word_count = 0
+    lemmas: dict[str, tuple[str, str]] = {}
+    for word in words:
+        if word not in lemmas:
+            lemmas[word] = (reference.lemmatise(word), candidate.lemmatise(word))
+        reference_lemma, candidate_lemma = lemmas[word]
+        if reference_lemma != candidate_lemma:
+            diverging_word_count += 1
+            difference = (word, reference_lemma, candidate_lemma)
+            differences[difference] = differences.get(difference, 0) + 1
+    return (diverging_word_count / len(words) if words else 0.0), differences
@@ -0,0 +1,169 @@
+"""
+Lightweight timing, row count and byte count metrics for the pipeline stages.
+
+Spans are collected in memory during an invocation and emitted once at the end, either as
+CloudWatch Embedded Metric Format (EMF) JSON lines in AWS Lambda or as a summary table locally.
+"""
+
+import functools
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterator
+
+# common.utils depends on this module, so the root logger configured by get_logger is used directly
+logger = logging.getLogger()
+
+METRICS_NAMESPACE = "Newswatch"
+METRIC_UNITS = {
+    "duration_ms": "Milliseconds",
+    "rows": "Count",
+    "bytes": "Bytes",
+    "cache_hits": "Count",
+    "failures": "Count",
+}
+
+
+@dataclass
+class Span:
+    """A timed section of a stage with optional dimensions (e.g. site) and counts (rows, bytes)."""
+
+    name: str
+    dimensions: dict[str, str] = field(default_factory=dict)
+    counts: dict[str, int] = field(default_factory=dict)
+    duration_ms: float = 0.0
+
+    def add(self, **counts: int) -> None:
+        """Add to the counts of the span, e.g. span.add(rows=10, bytes=2048)."""
+        for name, value in counts.items():
+            self.counts[name] = self.counts.get(name, 0) + value
+
+
+_spans: list[Span] = []
+
+
+@contextmanager
+def span(name: str, **dimensions: str) -> Iterator[Span]:
+    """Time the enclosed block and record it, even if it raises."""
+
+    current_span = Span(name=name, dimensions=dimensions)
+    start = time.perf_counter()
+    try:
+        yield current_span
+    finally:
+        current_span.duration_ms = (time.perf_counter() - start) * 1000
+        _spans.append(current_span)
+
+
+def timed(name: str) -> Callable:
+    """Decorator that records each call of the function as a span."""
+
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with span(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def get_spans() -> list[Span]:
+    """Return the spans recorded since the last reset."""
+    return list(_spans)
+
+
+def reset_spans() -> None:
+    """Discard the recorded spans, e.g. between invocations of a warm Lambda container."""
+    _spans.clear()
+
+
+def format_emf(stage: str, spans: list[Span], timestamp_ms: int) -> list[dict[str, Any]]:
+    """Convert spans into CloudWatch Embedded Metric Format documents, one per span."""
+
+    documents = []
+    for recorded_span in spans:
+        values: dict[str, float | int] = {"duration_ms": round(recorded_span.duration_ms, 3), **recorded_span.counts}
+        dimension_names = ["stage", "span", *sorted(recorded_span.dimensions)]
+        documents.append(
+            {
+                "_aws": {
+                    "Timestamp": timestamp_ms,
+                    "CloudWatchMetrics": [
+                        {
+                            "Namespace": METRICS_NAMESPACE,
+                            "Dimensions": [dimension_names],
+                            "Metrics": [
+                                {"Name": name, "Unit": METRIC_UNITS.get(name, "None")} for name in values.keys()
+                            ],
+                        },
+                    ],
+                },
+                "stage": stage,
+                "span": recorded_span.name,
+                **recorded_span.dimensions,
+                **values,
+            },
+        )
+    return documents
+
+
+def format_summary_table(spans: list[Span]) -> str:
+    """Aggregate spans by name and dimensions into a human-readable table."""
+
+    aggregated: dict[tuple[str, str], dict[str, float]] = {}
+    for recorded_span in spans:
+        dimensions = ",".join(f"{k}={v}" for k, v in sorted(recorded_span.dimensions.items()))
+        row = aggregated.setdefault((recorded_span.name, dimensions), {"calls": 0, "ms": 0.0, "rows": 0, "bytes": 0})
+        row["calls"] += 1
+        row["ms"] += recorded_span.duration_ms
+        row["rows"] += recorded_span.counts.get("rows", 0)
+        row["bytes"] += recorded_span.counts.get("bytes", 0)
+
+    lines = [f"{'span':<24} {'dimensions':<32} {'calls':>6} {'total ms':>10} {'rows':>8} {'bytes':>10}"]
+    for (name, dimensions), row in aggregated.items():
+        lines.append(
+            f"{name:<24} {dimensions:<32} {row['calls']:>6} {row['ms']:>10.1f} {row['rows']:>8} {row['bytes']:>10}",
+        )
+    return "\n".join(lines)
+
+
+def flush_metrics(stage: str) -> None:
+    """
+    Emit the recorded spans and reset them.
+    METRICS_FORMAT can be emf (default in AWS Lambda), table (default locally) or off.
+    """
+
+    default_format = "table" if os.environ.get("AWS_EXECUTION_ENV") is None else "emf"
+    metrics_format = os.environ.get("METRICS_FORMAT", default_format).lower()
+    spans = get_spans()
+    reset_spans()
+
+    if metrics_format == "emf":
+        # EMF documents must be written as standalone JSON lines, without the logger's prefix
+        for document in format_emf(stage=stage, spans=spans, timestamp_ms=int(time.time() * 1000)):
+            print(json.dumps(document), flush=True)
+    elif metrics_format == "table":
+        logger.info(f"Metrics of {stage}:\n{format_summary_table(spans)}")
+
+
+def emit_metrics(stage: str) -> Callable:
+    """Decorator for stage entry points: start with no spans and flush them when the stage ends."""
+
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            reset_spans()
+            try:
+                with span(stage):
+                    return func(*args, **kwargs)
+            finally:
+                flush_metrics(stage)
+
+        return wrapper
+
+    return decorator
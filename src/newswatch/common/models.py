@@ -36,3 +36,31 @@ class WordFrequency(BaseModel):
     word: StrictStr
     frequency: int
     timestamp: datetime
+
+
+class Burst(BaseModel):
+    """A word whose frequency in an hour is anomalously high compared to its recent history."""
+
+    word: StrictStr
+    timestamp: datetime
+    rank: int
+    frequency: int
+    # The moving average of the frequency before the hour, and how many standard deviations above it the frequency is
+    expected_frequency: float
+    z_score: float
+
+
+class Tenant(BaseModel):
+    """A country configuration processed by shared transform and load functions."""
+
+    name: StrictStr
+    # The bucket of the tenant's objects, None if the prefixes are unique across buckets
+    bucket: StrictStr | None = None
+    extract_s3_prefix: StrictStr
+    transform_s3_prefix: StrictStr
+    filtered_transform_s3_prefix: StrictStr | None = None
+    phrase_transform_s3_prefix: StrictStr | None = None
+    word_sketches_s3_prefix: StrictStr | None = None
+    bursts_s3_prefix: StrictStr | None = None
+    burst_state_s3_key: StrictStr | None = None
+    bigquery_table_id: StrictStr
@@ -0,0 +1,42 @@
+"""
+Phrases of consecutive lemmatised words of a headline, e.g. "prime minister" or "interest rate".
+
+TRANSFORM_NGRAMS sets the phrase lengths to count, e.g. "2,3" for bigrams and trigrams; empty (default)
+disables phrase counting. Phrases never span two headlines, and phrases that start or end with an
+excluded word (e.g. "minister of" or "the bank") are skipped, while "bank of england" is kept.
+"""
+
+import os
+from collections.abc import Collection, Iterator, Sequence
+
+MIN_NGRAM_SIZE = 2
+MAX_NGRAM_SIZE = 5
+
+
+def get_ngram_sizes() -> list[int]:
+    """Return the phrase lengths set by TRANSFORM_NGRAMS in increasing order, empty if disabled."""
+
+    ngrams = os.environ.get("TRANSFORM_NGRAMS", "")
+    try:
+        sizes = sorted({int(size) for size in ngrams.split(",") if size.strip()})
+    except ValueError:
+        raise ValueError(f"Invalid TRANSFORM_NGRAMS: {ngrams}, expected comma-separated phrase lengths") from None
+    if any(size < MIN_NGRAM_SIZE or size > MAX_NGRAM_SIZE for size in sizes):
+        raise ValueError(
+            f"Invalid TRANSFORM_NGRAMS: {ngrams}, expected lengths from {MIN_NGRAM_SIZE} to {MAX_NGRAM_SIZE}"
+        )
+    return sizes
+
+
+def iterate_ngrams(
+    words: Sequence[str],
+    sizes: Collection[int],
+    excluded_words: Collection[str] = frozenset(),
+) -> Iterator[str]:
+    """Yield the phrases of the given lengths in the words, joined by spaces."""
+
+    for size in sizes:
+        for start in range(len(words) - size + 1):
+            if words[start] in excluded_words or words[start + size - 1] in excluded_words:
+                continue
+            yield " ".join(words[start : start + size])
@@ -0,0 +1,177 @@
+"""
+Politeness scheduler limiting the rate and concurrency of requests to each host.
+
+Each host has a token bucket and a limit of requests in flight, so that sites can be scraped in
+parallel without bursts of requests to the same host. A host that responds with 429 or 503 is
+not requested again until its Retry-After has passed, and the Crawl-delay in its robots.txt can
+optionally be used as the minimum interval between requests.
+"""
+
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+
+import requests
+
+from common.utils import get_logger
+
+logger = get_logger()
+
+DEFAULT_RATE_PER_SEC = 1.0
+DEFAULT_BURST = 1
+DEFAULT_MAX_IN_FLIGHT = 1
+DEFAULT_MAX_WAIT_SEC = 30.0
+ROBOTS_TXT_TIMEOUT_SEC = 5
+
+
+def get_host(url: str) -> str:
+    return urlparse(url).netloc.lower()
+
+
+def parse_retry_after(value: str | None, now: datetime | None = None) -> float | None:
+    """Return the seconds to wait from a Retry-After header in seconds or as an HTTP date, or None if invalid."""
+
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - (now or datetime.now(timezone.utc))).total_seconds())
+
+
+def fetch_crawl_delay(url: str, user_agent: str) -> float | None:
+    """Return the Crawl-delay of the host of the URL for the user agent, or None if not set or unavailable."""
+
+    parsed_url = urlparse(url)
+    robots_url = f"{parsed_url.scheme}://{parsed_url.netloc}/robots.txt"
+    try:
+        response = requests.get(url=robots_url, headers={"User-Agent": user_agent}, timeout=ROBOTS_TXT_TIMEOUT_SEC)
+    except requests.RequestException as e:
+        logger.info(f"Failed to fetch {robots_url}: {type(e).__name__}")
+        return None
+    if response.status_code != 200:
+        return None
+    robot_file_parser = RobotFileParser()
+    robot_file_parser.parse(response.text.splitlines())
+    crawl_delay = robot_file_parser.crawl_delay(user_agent)
+    return float(crawl_delay) if crawl_delay is not None else None
+
+
+@dataclass
+class TokenBucket:
+    """Allows rate_per_sec requests per second on average and bursts of up to capacity requests."""
+
+    rate_per_sec: float
+    capacity: float
+    tokens: float = field(init=False)
+    updated_at: float = float("-inf")
+
+    def __post_init__(self) -> None:
+        self.tokens = self.capacity
+
+    def _refill(self, now: float) -> float:
+        return min(self.capacity, self.tokens + (now - self.updated_at) * self.rate_per_sec)
+
+    def get_wait_sec(self, now: float) -> float:
+        """Return how long to wait until a token is available."""
+        return max(0.0, (1 - self._refill(now)) / self.rate_per_sec)
+
+    def take(self, now: float) -> None:
+        """Take a token available at the given time."""
+        self.tokens = self._refill(now) - 1
+        self.updated_at = now
+
+
+@dataclass
+class HostState:
+    bucket: TokenBucket
+    in_flight: threading.Semaphore
+    blocked_until: float = float("-inf")
+
+
+class HostScheduler:
+    """Thread-safe scheduler of the requests to each host."""
+
+    def __init__(
+        self,
+        rate_per_sec: float = DEFAULT_RATE_PER_SEC,
+        burst: int = DEFAULT_BURST,
+        max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+        max_wait_sec: float = DEFAULT_MAX_WAIT_SEC,
+        crawl_delay_fetcher: Callable[[str], float | None] | None = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.rate_per_sec = rate_per_sec
+        self.burst = burst
+        self.max_in_flight = max_in_flight
+        self.max_wait_sec = max_wait_sec
+        self.crawl_delay_fetcher = crawl_delay_fetcher
+        self.clock = clock
+        self.sleep = sleep
+        self.hosts: dict[str, HostState] = {}
+        self.lock = threading.Lock()
+
+    def get_host_state(self, url: str) -> HostState:
+        """Return the state of the host of the URL, fetching its crawl delay the first time if enabled."""
+
+        host = get_host(url)
+        if host in self.hosts:
+            return self.hosts[host]
+
+        rate_per_sec = self.rate_per_sec
+        if self.crawl_delay_fetcher is not None and (crawl_delay := self.crawl_delay_fetcher(url)):
+            rate_per_sec = min(rate_per_sec, 1 / crawl_delay)
+        host_state = HostState(
+            bucket=TokenBucket(rate_per_sec=rate_per_sec, capacity=self.burst),
+            in_flight=threading.Semaphore(self.max_in_flight),
+        )
+        with self.lock:
+            return self.hosts.setdefault(host, host_state)
+
+    @contextmanager
+    def request_slot(self, url: str) -> Iterator[bool]:
+        """
+        Wait until a request to the host of the URL is allowed and hold it in flight.
+        Yields False without waiting if it would take longer than max_wait_sec.
+        """
+
+        host_state = self.get_host_state(url)
+        if not host_state.in_flight.acquire(timeout=self.max_wait_sec):
+            yield False
+            return
+        try:
+            with self.lock:
+                now = self.clock()
+                blocked_sec = max(0.0, host_state.blocked_until - now)
+                wait_sec = blocked_sec + host_state.bucket.get_wait_sec(now + blocked_sec)
+                if wait_sec <= self.max_wait_sec:
+                    host_state.bucket.take(now + wait_sec)
+            if wait_sec > self.max_wait_sec:
+                yield False
+                return
+            if wait_sec > 0:
+                self.sleep(wait_sec)
+            yield True
+        finally:
+            host_state.in_flight.release()
+
+    def defer(self, url: str, delay_sec: float) -> None:
+        """Don't allow requests to the host of the URL for delay_sec, e.g. after a 429 response."""
+
+        host_state = self.get_host_state(url)
+        with self.lock:
+            host_state.blocked_until = max(host_state.blocked_until, self.clock() + delay_sec)
@@ -0,0 +1,145 @@
+"""
+Optional CPU and memory profiling of the stage entry points, enabled per deployment or per invocation.
+
+PROFILE (or the "profile" field of the Lambda event) can be "cpu", "memory" or "cpu,memory".
+The stage is run under cProfile and/or tracemalloc, and the reports are written to S3 under
+PROFILES_S3_PREFIX with the key of the data the stage read or wrote, e.g.
+profiles/headlines/year=2024/month=01/day=01/hour=12.transform.prof for a transform of that hour.
+When profiling is not requested, the only overhead is reading the setting.
+"""
+
+import cProfile
+import functools
+import inspect
+import io
+import marshal
+import os
+import pstats
+import tracemalloc
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Any, Callable
+
+from common.utils import get_logger, put_to_s3
+
+logger = get_logger()
+
+PROFILE_MODES = ("cpu", "memory")
+DEFAULT_PROFILES_S3_PREFIX = "profiles"
+DEFAULT_PROFILE_TOP_N = 30
+
+# Set by the Lambda handlers for the duration of an invocation with a "profile" field
+_requested_profile: str | None = None
+
+
+def get_profile_modes() -> set[str]:
+    """Return the requested profiling modes, from the Lambda event if set, otherwise from PROFILE."""
+
+    profile = _requested_profile if _requested_profile is not None else os.environ.get("PROFILE", "")
+    if not profile:
+        return set()
+    modes = {mode.strip().lower() for mode in profile.split(",") if mode.strip()}
+    if invalid_modes := modes - set(PROFILE_MODES):
+        logger.warning(f"Ignoring invalid profiling modes: {sorted(invalid_modes)}, expected {PROFILE_MODES}")
+    return modes & set(PROFILE_MODES)
+
+
+@contextmanager
+def profile_requested_by(event: Any) -> Iterator[None]:
+    """Use the "profile" field of the Lambda event, if any, instead of PROFILE within the block."""
+
+    global _requested_profile
+    previous_profile = _requested_profile
+    if isinstance(event, dict) and "profile" in event:
+        _requested_profile = str(event["profile"] or "")
+    try:
+        yield
+    finally:
+        _requested_profile = previous_profile
+
+
+def build_profile_s3_key(prefix: str, data_key: str, stage: str, extension: str) -> str:
+    """
+    Generate the S3 key of a profile of a stage that processed the data key.
+    For example: profiles/headlines/year=1999/month=01/day=05/hour=22.transform.prof
+    """
+    return f"{prefix}/{os.path.splitext(data_key)[0]}.{stage}.{extension}"
+
+
+def format_cpu_report(profiler: cProfile.Profile, top_n: int) -> str:
+    """Format the top_n functions by cumulative time."""
+
+    stream = io.StringIO()
+    pstats.Stats(profiler, stream=stream).sort_stats(pstats.SortKey.CUMULATIVE).print_stats(top_n)
+    return stream.getvalue()
+
+
+def format_allocation_report(snapshot: tracemalloc.Snapshot, peak_bytes: int, top_n: int) -> str:
+    """Format the peak traced memory and the top_n lines by the size of the memory they allocated."""
+
+    top_stats = snapshot.statistics("lineno")
+    lines = [f"Peak traced memory: {peak_bytes / 1024 / 1024:.1f} MiB", f"Top {top_n} allocations by line:"]
+    lines.extend(str(statistic) for statistic in top_stats[:top_n])
+    return "\n".join(lines)
+
+
+def put_profile_reports(bucket: str, data_key: str, stage: str, reports: dict[str, bytes]) -> None:
+    """Write the reports by their file extension to S3. Failures are logged, so that they don't fail the stage."""
+
+    prefix = os.environ.get("PROFILES_S3_PREFIX", DEFAULT_PROFILES_S3_PREFIX)
+    for extension, report in reports.items():
+        key = build_profile_s3_key(prefix=prefix, data_key=data_key, stage=stage, extension=extension)
+        try:
+            put_to_s3(bucket_name=bucket, key=key, data=report)
+        except Exception as e:
+            logger.warning(f"Failed to write the profile to {bucket}/{key}: {type(e).__name__}: {e}")
+        else:
+            logger.info(f"Wrote the profile of {stage} to {bucket}/{key}")
+
+
+def profiled(stage: str, get_location: Callable[..., tuple[str, str]]) -> Callable:
+    """
+    Decorator for stage entry points: profile the stage if requested and write the reports to S3,
+    also if the stage raises. get_location is called before the stage runs with the arguments of the stage,
+    passed positionally in the order of its parameters however the stage was called, and returns the bucket
+    and the key of the data that the profiles are stored by.
+    """
+
+    def decorator(func: Callable) -> Callable:
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            modes = get_profile_modes()
+            if not modes:
+                return func(*args, **kwargs)
+
+            arguments = signature.bind(*args, **kwargs)
+            arguments.apply_defaults()
+            bucket, data_key = get_location(*arguments.args, **arguments.kwargs)
+            top_n = int(os.environ.get("PROFILE_TOP_N", DEFAULT_PROFILE_TOP_N))
+            profiler = cProfile.Profile() if "cpu" in modes else None
+            if "memory" in modes:
+                tracemalloc.start()
+            if profiler is not None:
+                profiler.enable()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                reports: dict[str, bytes] = {}
+                if profiler is not None:
+                    profiler.disable()
+                    profiler.create_stats()
+                    # The same format as cProfile's dump_stats, readable by pstats and snakeviz
+                    reports["prof"] = marshal.dumps(profiler.stats)  # type: ignore[attr-defined]
+                    reports["cpu.txt"] = format_cpu_report(profiler, top_n).encode("utf-8")
+                if "memory" in modes:
+                    snapshot = tracemalloc.take_snapshot()
+                    peak_bytes = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+                    reports["allocations.txt"] = format_allocation_report(snapshot, peak_bytes, top_n).encode("utf-8")
+                put_profile_reports(bucket=bucket, data_key=data_key, stage=stage, reports=reports)
+
+        return wrapper
+
+    return decorator
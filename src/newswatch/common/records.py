@@ -0,0 +1,133 @@
+"""
+Lightweight record types for the hot path of the pipeline.
+
+The Pydantic models in common.models remain the public schema and validate data as it enters the
+pipeline, e.g. scraped headlines. Records created inside the pipeline are plain slotted dataclasses
+without per-instance dicts or validation, which makes them several times cheaper to construct and
+a fraction of the size. Records in a batch share a single timestamp object instead of each holding a copy.
+
+Parquet files are validated once per table against the record fields instead of once per row.
+"""
+
+from dataclasses import dataclass, fields
+from datetime import datetime
+from typing import Any, Callable, Mapping, Sequence, TypeVar
+
+from pydantic import BaseModel
+
+import pyarrow as pa
+
+from common.models import Headline, WordFrequency
+
+R = TypeVar("R", bound="HeadlineRecord | WordFrequencyRecord")
+M = TypeVar("M", bound=BaseModel)
+
+
+@dataclass(slots=True)
+class HeadlineRecord:
+    """Internal counterpart of the Headline model."""
+
+    site_name: str
+    timestamp: datetime
+    headline: str
+
+
+@dataclass(slots=True)
+class WordFrequencyRecord:
+    """Internal counterpart of the WordFrequency model."""
+
+    word: str
+    frequency: int
+    timestamp: datetime
+
+
+HeadlineLike = Headline | HeadlineRecord
+WordFrequencyLike = WordFrequency | WordFrequencyRecord
+WordFrequencyT = TypeVar("WordFrequencyT", WordFrequency, WordFrequencyRecord)
+
+# Arrow type checks of the record fields, keyed by the Python annotation
+_ARROW_TYPE_CHECKS: dict[type, Callable[[pa.DataType], bool]] = {
+    str: lambda t: pa.types.is_string(t) or pa.types.is_large_string(t),
+    int: pa.types.is_integer,
+    datetime: pa.types.is_timestamp,
+}
+
+# Keyed by name, because the handlers (common.records) and tests (newswatch.common.records) import separate copies
+_FIELD_TYPES: dict[str, dict[str, type]] = {
+    "HeadlineRecord": {"site_name": str, "timestamp": datetime, "headline": str},
+    "WordFrequencyRecord": {"word": str, "frequency": int, "timestamp": datetime},
+}
+
+
+def is_record_type(cls: type) -> bool:
+    """Return True if cls is one of the record types of this module."""
+    return cls.__name__ in _FIELD_TYPES and cls.__module__.endswith("common.records")
+
+
+def get_field_names(cls: type) -> list[str]:
+    """Return the field names of a record type in declaration order."""
+    return [f.name for f in fields(cls)]
+
+
+def to_records(models: Sequence[Any], cls: type[R]) -> list[R]:
+    """Convert validated Pydantic models (or other records) into records of the given type."""
+
+    field_names = get_field_names(cls)
+    return [cls(*(getattr(model, name) for name in field_names)) for model in models]
+
+
+def to_models(records: Sequence[Any], model: type[M]) -> list[M]:
+    """Convert records into Pydantic models, validating each of them, e.g. before exposing them publicly."""
+
+    field_names = list(model.model_fields)
+    return [model(**{name: getattr(record, name) for name in field_names}) for record in records]
+
+
+def validate_table_schema(table: pa.Table, cls: type, defaults: Mapping[str, Any] | None = None) -> None:
+    """
+    Raise a ValueError if the columns of the table don't match the fields of the record type.
+    Columns with a default value may be missing, e.g. if they were not read.
+    """
+
+    expected_field_types = _FIELD_TYPES[cls.__name__]
+    missing_columns = set(expected_field_types) - set(table.column_names) - set(defaults or {})
+    if missing_columns:
+        raise ValueError(f"Missing columns for {cls.__name__}: {sorted(missing_columns)}")
+
+    for name, python_type in expected_field_types.items():
+        if name not in table.column_names:
+            continue
+        arrow_type = table.schema.field(name).type
+        # An empty column (e.g. from an empty table) has no type to check
+        if not pa.types.is_null(arrow_type) and not _ARROW_TYPE_CHECKS[python_type](arrow_type):
+            raise ValueError(f"Column {name} of {cls.__name__} has type {arrow_type}, expected {python_type.__name__}")
+
+
+def records_to_table(records: Sequence[Any], cls: type) -> pa.Table:
+    """Build an Arrow table column by column from records of the given type."""
+
+    return pa.Table.from_pydict({name: [getattr(record, name) for record in records] for name in get_field_names(cls)})
+
+
+def table_to_records(table: pa.Table, cls: type[R], defaults: Mapping[str, Any] | None = None) -> list[R]:
+    """
+    Validate the table once and build records from its columns.
+    Fields missing from the table take their value from defaults.
+    """
+
+    if table.num_rows == 0:
+        return []
+    defaults = defaults or {}
+    validate_table_schema(table, cls, defaults)
+    columns: list[list[Any]] = []
+    for name in get_field_names(cls):
+        if name not in table.column_names:
+            columns.append([defaults.get(name)] * table.num_rows)
+            continue
+        column: list[Any] = table.column(name).to_pylist()
+        if _FIELD_TYPES[cls.__name__][name] is datetime:
+            # Rows of a batch usually share the timestamp, so they share a single object too
+            shared_timestamps: dict[Any, Any] = {}
+            column = [shared_timestamps.setdefault(value, value) for value in column]
+        columns.append(column)
+    return [cls(*values) for values in zip(*columns)]
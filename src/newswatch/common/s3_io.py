@@ -0,0 +1,237 @@
+"""
+Streaming reads and writes of Parquet files in S3.
+
+Reads fetch the end of the object first, which holds the Parquet footer, then only the byte ranges
+of the requested columns, so a large file is never downloaded or held in memory as a whole.
+Objects that fit in the first read, like the hourly files, take a single request and are read
+from the response without another copy.
+
+Writes stream the Parquet output to S3 in the parts of a multipart upload, keeping at most one
+part in memory, or upload it with a single request if it is smaller than a part.
+
+With the local and memory storage backends (common.storage) the files are read and written whole.
+"""
+
+import io
+from typing import Any, Mapping
+
+import boto3
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from common.metrics import span
+from common.storage import S3Storage, get_storage
+from common.utils import convert_objects_to_table, convert_table_to_objects
+
+TAIL_PREFETCH_BYTES = 1024 * 1024
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+MIN_PART_SIZE = 5 * 1024 * 1024  # The minimum size of all but the last part of a multipart upload
+
+
+class S3RangeReader(io.RawIOBase):
+    """Seekable, read-only file object over an S3 object, fetching the byte ranges that are read."""
+
+    def __init__(self, bucket: str, key: str, tail_prefetch_bytes: int = TAIL_PREFETCH_BYTES, s3_client: Any = None):
+        super().__init__()
+        self.bucket = bucket
+        self.key = key
+        self.s3: Any = s3_client or boto3.client("s3")
+        self.position = 0
+        self.bytes_fetched = 0
+        # The total size is taken from the response instead of a separate HEAD request
+        response = self._get_range(f"bytes=-{tail_prefetch_bytes}")
+        self.tail: bytes = response["Body"].read()
+        self.bytes_fetched += len(self.tail)
+        self.size = int(response["ContentRange"].rsplit("/", 1)[1])
+        self.tail_start = self.size - len(self.tail)
+
+    def _get_range(self, byte_range: str) -> dict:
+        return self.s3.get_object(Bucket=self.bucket, Key=self.key, Range=byte_range)
+
+    @property
+    def is_fully_fetched(self) -> bool:
+        return self.tail_start == 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            self.position = offset
+        elif whence == io.SEEK_CUR:
+            self.position += offset
+        elif whence == io.SEEK_END:
+            self.position = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        return self.position
+
+    def readinto(self, buffer: Any) -> int:
+        length = min(len(buffer), self.size - self.position)
+        if length <= 0:
+            return 0
+        end = self.position + length
+        if self.position >= self.tail_start:
+            data: bytes | memoryview = memoryview(self.tail)[self.position - self.tail_start : end - self.tail_start]
+        else:
+            data = self._get_range(f"bytes={self.position}-{end - 1}")["Body"].read()
+            self.bytes_fetched += len(data)
+        buffer[: len(data)] = data
+        self.position += len(data)
+        return len(data)
+
+
+class S3MultipartWriter(io.RawIOBase):
+    """
+    Write-only file object uploading to an S3 object in parts of part_size bytes.
+    The object is created when the writer is closed, and the upload is aborted if the writer
+    is used as a context manager and the block raises.
+    """
+
+    def __init__(self, bucket: str, key: str, part_size: int = DEFAULT_PART_SIZE, s3_client: Any = None):
+        super().__init__()
+        if part_size < MIN_PART_SIZE:
+            raise ValueError(f"part_size must be at least {MIN_PART_SIZE} bytes, got {part_size}")
+        self.bucket = bucket
+        self.key = key
+        self.part_size = part_size
+        self.s3: Any = s3_client or boto3.client("s3")
+        self.buffer = bytearray()
+        self.upload_id: str | None = None
+        self.parts: list[dict[str, Any]] = []
+        self.bytes_written = 0
+        self.response: dict[str, Any] = {}
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: Any) -> int:
+        length = memoryview(data).nbytes
+        self.buffer += data
+        self.bytes_written += length
+        while len(self.buffer) >= self.part_size:
+            self._upload_part(bytes(self.buffer[: self.part_size]))
+            del self.buffer[: self.part_size]
+        return length
+
+    def _upload_part(self, data: bytes) -> None:
+        if self.upload_id is None:
+            self.upload_id = self.s3.create_multipart_upload(Bucket=self.bucket, Key=self.key)["UploadId"]
+        part_number = len(self.parts) + 1
+        response = self.s3.upload_part(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            PartNumber=part_number,
+            Body=data,
+        )
+        self.parts.append({"ETag": response["ETag"], "PartNumber": part_number})
+
+    def close(self) -> None:
+        """Upload the remaining data and create the object."""
+
+        if self.closed:
+            return
+        try:
+            if self.upload_id is None:
+                self.response = self.s3.put_object(Bucket=self.bucket, Key=self.key, Body=bytes(self.buffer))
+            else:
+                if self.buffer:
+                    self._upload_part(bytes(self.buffer))
+                self.response = self.s3.complete_multipart_upload(
+                    Bucket=self.bucket,
+                    Key=self.key,
+                    UploadId=self.upload_id,
+                    MultipartUpload={"Parts": self.parts},
+                )
+        finally:
+            self.buffer = bytearray()
+            super().close()
+
+    def abort(self) -> None:
+        """Discard the data and the parts uploaded so far without creating the object."""
+
+        if self.upload_id is not None:
+            self.s3.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+        self.buffer = bytearray()
+        super().close()
+
+    def __exit__(self, exc_type: Any, exc: Any, traceback: Any) -> None:
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
+
+
+def read_parquet_table_from_s3(
+    bucket: str,
+    key: str,
+    columns: list[str] | None = None,
+    filters: pc.Expression | None = None,
+) -> pa.Table:
+    """
+    Read a Parquet file from S3, decoding only the given columns and the rows matching the filters.
+    Only the footer and the byte ranges of the columns are fetched from large files, and row groups
+    that can't match the filters are skipped by their statistics.
+    """
+
+    storage = get_storage()
+    with span("s3_read_parquet") as read_span:
+        if isinstance(storage, S3Storage):
+            reader = S3RangeReader(bucket=bucket, key=key, s3_client=storage.client)
+            source = pa.BufferReader(reader.tail) if reader.is_fully_fetched else pa.PythonFile(reader, mode="r")
+            table = pq.read_table(source, columns=columns, filters=filters)
+            bytes_fetched = reader.bytes_fetched
+        else:
+            data = storage.get(bucket=bucket, key=key)
+            table = pq.read_table(pa.BufferReader(data), columns=columns, filters=filters)
+            bytes_fetched = len(data)
+        read_span.add(rows=table.num_rows, bytes=bytes_fetched)
+    return table
+
+
+def write_parquet_table_to_s3(bucket: str, key: str, table: pa.Table, part_size: int = DEFAULT_PART_SIZE) -> dict:
+    """Write a table to S3 as a Parquet file, streamed in parts if larger than part_size."""
+
+    storage = get_storage()
+    with span("s3_write_parquet") as write_span:
+        if not isinstance(storage, S3Storage):
+            sink = io.BytesIO()
+            pq.write_table(table, sink, compression="gzip")
+            write_span.add(rows=table.num_rows, bytes=sink.tell())
+            return storage.put(bucket=bucket, key=key, data=sink.getvalue())
+        with S3MultipartWriter(bucket=bucket, key=key, part_size=part_size, s3_client=storage.client) as writer:
+            pq.write_table(table, pa.PythonFile(writer, mode="w"), compression="gzip")
+        write_span.add(rows=table.num_rows, bytes=writer.bytes_written)
+    return writer.response
+
+
+def get_objects_from_s3(
+    bucket: str,
+    key: str,
+    cls: type,
+    columns: list[str] | None = None,
+    filters: pc.Expression | None = None,
+    defaults: Mapping[str, Any] | None = None,
+) -> list:
+    """
+    Read a Parquet file from S3 into a list of objects (records or Pydantic models) of the given class.
+    The fields of the columns that are not read take their value from defaults.
+    """
+
+    table = read_parquet_table_from_s3(bucket=bucket, key=key, columns=columns, filters=filters)
+    return convert_table_to_objects(table, cls, defaults)
+
+
+def put_objects_to_s3(bucket: str, key: str, objects: list, part_size: int = DEFAULT_PART_SIZE) -> dict:
+    """Write a list of objects (records or Pydantic models) to S3 as a Parquet file."""
+    return write_parquet_table_to_s3(
+        bucket=bucket, key=key, table=convert_objects_to_table(objects), part_size=part_size
+    )
@@ -0,0 +1,70 @@
+"""
+Assignment of sites to extraction shards and the S3 keys of the partial results of the shards.
+
+Sites are either assigned by a stable hash of their name, or balanced by their measured cost,
+the median fetch latency kept in the site health state, so that the slowest shard finishes as
+early as possible.
+"""
+
+import hashlib
+import heapq
+import statistics
+from collections.abc import Mapping
+from datetime import datetime
+
+from common.models import Site
+from common.site_health import SiteHealthState
+
+SHARDING_MODES = ("hash", "cost")
+
+
+def get_site_shard(site_name: str, shard_count: int) -> int:
+    """Return the shard of a site by a stable hash of its name."""
+    digest = hashlib.blake2b(site_name.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % shard_count
+
+
+def split_sites_by_hash(sites: list[Site], shard_count: int) -> list[list[Site]]:
+    """Split sites into shards by the hash of their names. Shards may be uneven or empty."""
+
+    shards: list[list[Site]] = [[] for _ in range(shard_count)]
+    for site in sites:
+        shards[get_site_shard(site.name, shard_count)].append(site)
+    return shards
+
+
+def get_site_costs(sites: list[Site], site_health: SiteHealthState) -> dict[str, float]:
+    """
+    Return the median fetch latency of each site in milliseconds.
+    Sites without latencies are assumed to cost as much as the median of the other sites.
+    """
+
+    costs = {
+        site.name: statistics.median(site_health.sites[site.name].latencies_ms)
+        for site in sites
+        if site.name in site_health.sites and site_health.sites[site.name].latencies_ms
+    }
+    default_cost = statistics.median(costs.values()) if costs else 1.0
+    return {site.name: costs.get(site.name, default_cost) for site in sites}
+
+
+def split_sites_by_cost(sites: list[Site], shard_count: int, costs: Mapping[str, float]) -> list[list[Site]]:
+    """Split sites into shards, assigning the most expensive sites first, each to the cheapest shard so far."""
+
+    shards: list[list[Site]] = [[] for _ in range(shard_count)]
+    shard_costs = [(0.0, shard_index) for shard_index in range(shard_count)]
+    for site in sorted(sites, key=lambda site: costs[site.name], reverse=True):
+        shard_cost, shard_index = heapq.heappop(shard_costs)
+        shards[shard_index].append(site)
+        heapq.heappush(shard_costs, (shard_cost + costs[site.name], shard_index))
+    return shards
+
+
+def build_partial_s3_key(prefix: str, timestamp: datetime, shard_index: int, shard_count: int) -> str:
+    """
+    Generate the S3 key of the partial result of a shard.
+    For example: sample_prefix/year=1999/month=01/day=05/hour=22/shard=1-of-4.parquet
+    """
+    return (
+        f"{prefix}/{timestamp.strftime('year=%Y/month=%m/day=%d/hour=%H')}/shard={shard_index}-of-{shard_count}.parquet"
+    )
@@ -0,0 +1,108 @@
+"""
+Per-site scraping health: recent latencies for adaptive timeouts and a circuit breaker for failing sites.
+
+The state is small and persisted between runs (e.g. in S3), so that a site that has been down for
+several hours is skipped and only probed again from time to time, instead of costing the full
+timeout and retries every hour.
+"""
+
+import json
+import math
+import random
+from dataclasses import asdict, dataclass, field
+
+from common.storage import NoSuchKeyError
+from common.utils import get_logger, get_from_s3, put_to_s3
+
+logger = get_logger()
+
+LATENCY_SAMPLE_SIZE = 50
+MIN_LATENCY_SAMPLES = 5
+DEFAULT_TIMEOUT_MULTIPLIER = 3.0
+MIN_TIMEOUT_SEC = 3.0
+DEFAULT_FAILURE_THRESHOLD = 3
+DEFAULT_COOLDOWN_SEC = 6 * 3600
+
+
+@dataclass
+class SiteHealth:
+    """Recent fetch latencies and the circuit breaker state of a site."""
+
+    latencies_ms: list[float] = field(default_factory=list)
+    consecutive_failures: int = 0
+    # Unix time until which the site is skipped, None if the circuit is closed
+    open_until: float | None = None
+
+    def get_timeout_sec(self, max_timeout_sec: float, multiplier: float = DEFAULT_TIMEOUT_MULTIPLIER) -> float:
+        """Return the p99 latency times the multiplier, between MIN_TIMEOUT_SEC and max_timeout_sec."""
+
+        if len(self.latencies_ms) < MIN_LATENCY_SAMPLES:
+            return max_timeout_sec
+        sorted_latencies = sorted(self.latencies_ms)
+        p99_ms = sorted_latencies[min(len(sorted_latencies) - 1, math.ceil(0.99 * len(sorted_latencies)) - 1)]
+        return min(max_timeout_sec, max(MIN_TIMEOUT_SEC, p99_ms * multiplier / 1000))
+
+    def is_open(self, now: float) -> bool:
+        """Return True if the site should be skipped."""
+        return self.open_until is not None and now < self.open_until
+
+    def is_half_open(self, now: float) -> bool:
+        """Return True if the cooldown has passed, so that the next fetch is a probe."""
+        return self.open_until is not None and now >= self.open_until
+
+    def record_success(self, latency_ms: float) -> None:
+        self.latencies_ms = (self.latencies_ms + [round(latency_ms, 1)])[-LATENCY_SAMPLE_SIZE:]
+        self.consecutive_failures = 0
+        self.open_until = None
+
+    def record_failure(self, now: float, failure_threshold: int, cooldown_sec: float) -> None:
+        """Count a failed run of the site and open the circuit if it failed too many times in a row."""
+
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= failure_threshold:
+            self.open_until = now + cooldown_sec
+
+
+class SiteHealthState:
+    """Health of every site by name."""
+
+    def __init__(self, sites: dict[str, SiteHealth] | None = None):
+        self.sites: dict[str, SiteHealth] = sites or {}
+
+    def get(self, site_name: str) -> SiteHealth:
+        return self.sites.setdefault(site_name, SiteHealth())
+
+    def to_dict(self) -> dict[str, dict]:
+        return {name: asdict(site_health) for name, site_health in self.sites.items()}
+
+    @classmethod
+    def from_dict(cls, state_dict: dict[str, dict]) -> "SiteHealthState":
+        return cls({name: SiteHealth(**site_health) for name, site_health in state_dict.items()})
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict())
+
+    @classmethod
+    def from_json(cls, state_json: str) -> "SiteHealthState":
+        return cls.from_dict(json.loads(state_json))
+
+
+def get_backoff_sec(attempt: int, base_sec: float, max_sec: float) -> float:
+    """Exponential backoff with full jitter: a random delay up to base_sec * 2^attempt, capped at max_sec."""
+    return random.uniform(0, min(max_sec, base_sec * 2**attempt))
+
+
+def load_site_health(bucket: str, key: str) -> SiteHealthState:
+    """Load the site health state from S3 or return an empty one if it doesn't exist yet."""
+
+    try:
+        data = get_from_s3(bucket_name=bucket, key=key)
+    except NoSuchKeyError:
+        logger.info(f"No site health state found at {bucket}/{key}")
+        return SiteHealthState()
+    return SiteHealthState.from_json(data.decode("utf-8"))
+
+
+def save_site_health(bucket: str, key: str, state: SiteHealthState) -> None:
+    """Save the site health state to S3."""
+    put_to_s3(bucket_name=bucket, key=key, data=state.to_json().encode("utf-8"))
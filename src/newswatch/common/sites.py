@@ -0,0 +1,117 @@
+"""
+Site configuration registry, built once per container and reloaded only when the configuration changes.
+
+The YAML configuration of the sites is parsed and validated by Pydantic. The result can be
+precompiled into a JSON file next to the YAML (scripts/compile_sites.py), which is loaded without
+validating again as long as the hash of the YAML it was compiled from matches.
+"""
+
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+
+import yaml
+
+from common.models import Filter, Site
+from common.utils import coalesce_dict_values, get_logger
+
+logger = get_logger()
+
+COMPILED_SITES_FORMAT_VERSION = 1
+
+
+@dataclass(frozen=True, slots=True)
+class FilterMatcher:
+    """Arguments of BeautifulSoup's find_all built from a Filter."""
+
+    name: str | None
+    attrs: dict[str, str | bool] | None
+
+
+def compile_filter(bsoup_filter: Filter) -> FilterMatcher:
+    """Build the find_all arguments of a filter, matching attributes without a value by their presence."""
+
+    if (optional_attrs := bsoup_filter.attrs) is not None:
+        return FilterMatcher(name=bsoup_filter.tag, attrs=coalesce_dict_values(dct=optional_attrs, default=True))
+    return FilterMatcher(name=bsoup_filter.tag, attrs=None)
+
+
+@dataclass
+class SiteRegistry:
+    """Validated sites with their prebuilt filter matchers."""
+
+    sites: list[Site]
+    source_stat: tuple[int, int] | None = None
+    matchers: dict[str, list[FilterMatcher]] = field(init=False)
+
+    def __post_init__(self) -> None:
+        self.matchers = {site.name: [compile_filter(f) for f in site.filters] for site in self.sites}
+
+
+def get_compiled_sites_path(yaml_path: str) -> str:
+    """Return the path of the precompiled JSON of a YAML configuration."""
+    return f"{os.path.splitext(yaml_path)[0]}.compiled.json"
+
+
+def get_file_stat(path: str) -> tuple[int, int] | None:
+    """Return the modification time and size of a file, or None if it doesn't exist."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def get_file_hash(path: str) -> str:
+    with open(path, "rb") as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+def parse_sites_yaml(yaml_path: str) -> list[Site]:
+    """Parse and validate the sites of a YAML configuration."""
+    with open(yaml_path, "r") as stream:
+        sites_from_yaml = yaml.safe_load(stream)
+        return [Site(**site) for site in sites_from_yaml]
+
+
+def compile_sites(yaml_path: str) -> str:
+    """Validate a YAML configuration and write it as JSON next to it. Returns the path of the JSON."""
+
+    sites = parse_sites_yaml(yaml_path)
+    compiled_sites = {
+        "format_version": COMPILED_SITES_FORMAT_VERSION,
+        "source_sha256": get_file_hash(yaml_path),
+        "sites": [site.model_dump(mode="json") for site in sites],
+    }
+    compiled_sites_path = get_compiled_sites_path(yaml_path)
+    with open(compiled_sites_path, "w") as file:
+        json.dump(compiled_sites, file, indent=2)
+    return compiled_sites_path
+
+
+def load_compiled_sites(yaml_path: str) -> list[Site] | None:
+    """
+    Load the precompiled sites of a YAML configuration without validating them again.
+    Returns None if there is no compiled file or it was compiled from a different version of the YAML.
+    """
+
+    compiled_sites_path = get_compiled_sites_path(yaml_path)
+    if not os.path.exists(compiled_sites_path):
+        return None
+    with open(compiled_sites_path, "r") as file:
+        compiled_sites = json.load(file)
+    if compiled_sites.get("format_version") != COMPILED_SITES_FORMAT_VERSION:
+        logger.warning(f"Ignoring {compiled_sites_path} with an unsupported format version")
+        return None
+    if compiled_sites.get("source_sha256") != get_file_hash(yaml_path):
+        logger.warning(f"Ignoring {compiled_sites_path}, because {yaml_path} has changed since it was compiled")
+        return None
+    return [
+        Site.model_construct(
+            name=site["name"],
+            url=site["url"],
+            filters=[Filter.model_construct(**bsoup_filter) for bsoup_filter in site["filters"]],
+        )
+        for site in compiled_sites["sites"]
+    ]
@@ -0,0 +1,275 @@
+"""
+Object storage backends behind the S3 helpers of common.utils and common.s3_io.
+
+S3 is used by default. For local runs and benchmarks, STORAGE_BACKEND can be set to "local" to keep
+the objects in files under STORAGE_LOCAL_ROOT (<root>/<bucket>/<key>, the same key layout as in S3),
+or to "memory" to keep them in the memory of the process, so that the stages run without a network.
+State shared by concurrent invocations is updated with conditional puts, which fail if the object was changed
+since it was read: on the ETag in S3, and on the content under a lock in the local backends.
+"""
+
+import fcntl
+import hashlib
+import os
+import shutil
+import threading
+from datetime import datetime, timezone
+from typing import Any, Protocol
+
+import boto3
+
+STORAGE_BACKENDS = ("s3", "local", "memory")
+DEFAULT_LOCAL_ROOT = ".storage"
+OK_RESPONSE: dict[str, Any] = {"ResponseMetadata": {"HTTPStatusCode": 200}}
+
+
+class NoSuchKeyError(KeyError):
+    """Raised when an object doesn't exist in any of the backends."""
+
+
+class PreconditionFailedError(Exception):
+    """Raised when a conditional put finds that the object was changed since it was read."""
+
+
+def get_content_version(data: bytes) -> str:
+    """Return the version of an object of the local backends, the MD5 like the ETag of a single part S3 object."""
+    return hashlib.md5(data).hexdigest()
+
+
+class ObjectStorage(Protocol):
+    def put(self, bucket: str, key: str, data: bytes) -> dict[str, Any]: ...
+
+    def get(self, bucket: str, key: str) -> bytes: ...
+
+    def get_versioned(self, bucket: str, key: str) -> tuple[bytes, str]: ...
+
+    def put_if_version(self, bucket: str, key: str, data: bytes, version: str | None) -> None: ...
+
+    def delete(self, bucket: str, keys: list[str]) -> None: ...
+
+    def get_last_modified(self, bucket: str, key: str) -> datetime | None: ...
+
+    def download(self, bucket: str, key: str, filename: str) -> None: ...
+
+    def upload(self, bucket: str, key: str, filename: str) -> None: ...
+
+    def list_keys(self, bucket: str, prefix: str) -> list[str]: ...
+
+
+class S3Storage:
+    """Objects in S3. A client is created per call, as it is cheap compared to the request."""
+
+    @property
+    def client(self) -> Any:
+        return boto3.client("s3")
+
+    def put(self, bucket: str, key: str, data: bytes) -> dict[str, Any]:
+        return self.client.put_object(Bucket=bucket, Key=key, Body=data)
+
+    def get(self, bucket: str, key: str) -> bytes:
+        s3 = self.client
+        try:
+            return s3.get_object(Bucket=bucket, Key=key)["Body"].read()
+        except s3.exceptions.NoSuchKey as e:
+            raise NoSuchKeyError(f"{bucket}/{key}") from e
+
+    def get_versioned(self, bucket: str, key: str) -> tuple[bytes, str]:
+        s3 = self.client
+        try:
+            response = s3.get_object(Bucket=bucket, Key=key)
+        except s3.exceptions.NoSuchKey as e:
+            raise NoSuchKeyError(f"{bucket}/{key}") from e
+        return response["Body"].read(), response["ETag"]
+
+    def put_if_version(self, bucket: str, key: str, data: bytes, version: str | None) -> None:
+        """Put the object if its ETag is still the version, or if it doesn't exist when the version is None."""
+
+        s3 = self.client
+        condition = {"IfMatch": version} if version is not None else {"IfNoneMatch": "*"}
+        try:
+            s3.put_object(Bucket=bucket, Key=key, Body=data, **condition)
+        except s3.exceptions.ClientError as e:
+            # A concurrent conditional put of the same key can also fail with a conflict
+            if e.response["Error"]["Code"] in ("PreconditionFailed", "ConditionalRequestConflict"):
+                raise PreconditionFailedError(f"{bucket}/{key}") from e
+            raise
+
+    def delete(self, bucket: str, keys: list[str]) -> None:
+        self.client.delete_objects(Bucket=bucket, Delete={"Objects": [{"Key": key} for key in keys]})
+
+    def get_last_modified(self, bucket: str, key: str) -> datetime | None:
+        s3 = self.client
+        try:
+            return s3.head_object(Bucket=bucket, Key=key)["LastModified"]
+        except s3.exceptions.ClientError:
+            return None
+
+    def download(self, bucket: str, key: str, filename: str) -> None:
+        self.client.download_file(Bucket=bucket, Key=key, Filename=filename)
+
+    def upload(self, bucket: str, key: str, filename: str) -> None:
+        self.client.upload_file(Filename=filename, Bucket=bucket, Key=key)
+
+    def list_keys(self, bucket: str, prefix: str) -> list[str]:
+        pages = self.client.get_paginator("list_objects_v2").paginate(Bucket=bucket, Prefix=prefix)
+        return [stored_object["Key"] for page in pages for stored_object in page.get("Contents", [])]
+
+
+class LocalStorage:
+    """Objects in files under a root directory, written atomically so that readers never see partial objects."""
+
+    def __init__(self, root: str = DEFAULT_LOCAL_ROOT):
+        self.root = root
+
+    def get_path(self, bucket: str, key: str) -> str:
+        return os.path.join(self.root, bucket, *key.split("/"))
+
+    def put(self, bucket: str, key: str, data: bytes) -> dict[str, Any]:
+        path = self.get_path(bucket, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary_path = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+        with open(temporary_path, "wb") as file:
+            file.write(data)
+        os.replace(temporary_path, path)
+        return OK_RESPONSE
+
+    def get(self, bucket: str, key: str) -> bytes:
+        try:
+            with open(self.get_path(bucket, key), "rb") as file:
+                return file.read()
+        except FileNotFoundError as e:
+            raise NoSuchKeyError(f"{bucket}/{key}") from e
+
+    def get_versioned(self, bucket: str, key: str) -> tuple[bytes, str]:
+        data = self.get(bucket, key)
+        return data, get_content_version(data)
+
+    def put_if_version(self, bucket: str, key: str, data: bytes, version: str | None) -> None:
+        """Put the object if its content is still the version, holding a lock file shared by the processes."""
+
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, ".lock"), "wb") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                current_version: str | None = self.get_versioned(bucket, key)[1]
+            except NoSuchKeyError:
+                current_version = None
+            if current_version != version:
+                raise PreconditionFailedError(f"{bucket}/{key}")
+            self.put(bucket, key, data)
+
+    def delete(self, bucket: str, keys: list[str]) -> None:
+        for key in keys:
+            try:
+                os.remove(self.get_path(bucket, key))
+            except FileNotFoundError:
+                pass
+
+    def get_last_modified(self, bucket: str, key: str) -> datetime | None:
+        try:
+            return datetime.fromtimestamp(os.stat(self.get_path(bucket, key)).st_mtime, tz=timezone.utc)
+        except FileNotFoundError:
+            return None
+
+    def download(self, bucket: str, key: str, filename: str) -> None:
+        path = self.get_path(bucket, key)
+        if not os.path.exists(path):
+            raise NoSuchKeyError(f"{bucket}/{key}")
+        shutil.copyfile(path, filename)
+
+    def upload(self, bucket: str, key: str, filename: str) -> None:
+        with open(filename, "rb") as file:
+            self.put(bucket, key, file.read())
+
+    def list_keys(self, bucket: str, prefix: str) -> list[str]:
+        bucket_root = os.path.join(self.root, bucket)
+        keys = []
+        for directory, _, filenames in os.walk(bucket_root):
+            for filename in filenames:
+                key = os.path.relpath(os.path.join(directory, filename), bucket_root).replace(os.sep, "/")
+                if key.startswith(prefix) and not filename.endswith(".tmp"):
+                    keys.append(key)
+        return sorted(keys)
+
+
+class MemoryStorage:
+    """Objects in the memory of the process, lost when it exits."""
+
+    def __init__(self) -> None:
+        self.objects: dict[tuple[str, str], tuple[bytes, datetime]] = {}
+        self.lock = threading.Lock()
+
+    def put(self, bucket: str, key: str, data: bytes) -> dict[str, Any]:
+        with self.lock:
+            self.objects[(bucket, key)] = (bytes(data), datetime.now(timezone.utc))
+        return OK_RESPONSE
+
+    def get(self, bucket: str, key: str) -> bytes:
+        try:
+            return self.objects[(bucket, key)][0]
+        except KeyError:
+            raise NoSuchKeyError(f"{bucket}/{key}") from None
+
+    def get_versioned(self, bucket: str, key: str) -> tuple[bytes, str]:
+        data = self.get(bucket, key)
+        return data, get_content_version(data)
+
+    def put_if_version(self, bucket: str, key: str, data: bytes, version: str | None) -> None:
+        with self.lock:
+            stored_object = self.objects.get((bucket, key))
+            current_version = get_content_version(stored_object[0]) if stored_object else None
+            if current_version != version:
+                raise PreconditionFailedError(f"{bucket}/{key}")
+            self.objects[(bucket, key)] = (bytes(data), datetime.now(timezone.utc))
+
+    def delete(self, bucket: str, keys: list[str]) -> None:
+        with self.lock:
+            for key in keys:
+                self.objects.pop((bucket, key), None)
+
+    def get_last_modified(self, bucket: str, key: str) -> datetime | None:
+        stored_object = self.objects.get((bucket, key))
+        return stored_object[1] if stored_object else None
+
+    def download(self, bucket: str, key: str, filename: str) -> None:
+        with open(filename, "wb") as file:
+            file.write(self.get(bucket, key))
+
+    def upload(self, bucket: str, key: str, filename: str) -> None:
+        with open(filename, "rb") as file:
+            self.put(bucket, key, file.read())
+
+    def list_keys(self, bucket: str, prefix: str) -> list[str]:
+        with self.lock:
+            return sorted(
+                key for object_bucket, key in self.objects if object_bucket == bucket and key.startswith(prefix)
+            )
+
+
+def create_storage(backend: str, local_root: str = DEFAULT_LOCAL_ROOT) -> ObjectStorage:
+    if backend == "s3":
+        return S3Storage()
+    if backend == "local":
+        return LocalStorage(root=local_root)
+    if backend == "memory":
+        return MemoryStorage()
+    raise ValueError(f"Invalid STORAGE_BACKEND: {backend}, expected one of {STORAGE_BACKENDS}")
+
+
+# Created on first use and kept for the container, so that the memory backend keeps its objects
+_storage: ObjectStorage | None = None
+_storage_config: tuple[str, str] | None = None
+
+
+def get_storage() -> ObjectStorage:
+    """Return the backend configured by STORAGE_BACKEND and STORAGE_LOCAL_ROOT."""
+
+    global _storage, _storage_config
+    storage_config = (
+        os.environ.get("STORAGE_BACKEND", "s3"),
+        os.environ.get("STORAGE_LOCAL_ROOT", DEFAULT_LOCAL_ROOT),
+    )
+    if _storage is None or storage_config != _storage_config:
+        _storage = create_storage(*storage_config)
+        _storage_config = storage_config
+    return _storage
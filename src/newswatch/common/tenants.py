@@ -0,0 +1,172 @@
+"""
+Routing of S3 objects to tenants, so that one transform or load function can serve several countries.
+
+The tenants are configured as a JSON list in TENANTS, e.g.:
+[{"name": "uk", "bucket": "newswatch-live", "extract_s3_prefix": "headlines",
+  "transform_s3_prefix": "word-frequencies", "bigquery_table_id": "project.dataset.table-live"}, ...]
+
+If TENANTS is not set, the stages are configured by their environment variables as a single tenant.
+
+The outputs of a tenant without a configured location are written under its name, e.g. the filtered word
+frequencies of "us" to us/filtered-word-frequencies, so that tenants sharing a bucket never write to the
+same objects. Tenants whose configured locations collide in a bucket are rejected.
+"""
+
+import os
+from typing import Literal
+
+from pydantic import TypeAdapter
+
+from common.models import Tenant
+
+tenants_adapter = TypeAdapter(list[Tenant])
+
+DEFAULT_FILTERED_TRANSFORM_S3_PREFIX = "filtered-word-frequencies"
+DEFAULT_PHRASE_TRANSFORM_S3_PREFIX = "phrase-frequencies"
+DEFAULT_BURSTS_S3_PREFIX = "bursts"
+
+# Parsed once per container, keyed by the configuration they were parsed from
+_tenants: tuple[str, list[Tenant]] | None = None
+
+
+def get_tenants() -> list[Tenant]:
+    """Return the tenants configured in TENANTS, or an empty list in single tenant mode."""
+
+    global _tenants
+    tenants_json = os.environ.get("TENANTS", "")
+    if not tenants_json:
+        return []
+    if _tenants is None or _tenants[0] != tenants_json:
+        tenants = tenants_adapter.validate_json(tenants_json)
+        validate_tenant_locations(tenants)
+        _tenants = (tenants_json, tenants)
+    return _tenants[1]
+
+
+def get_tenant_location(tenant: Tenant | None, location: str | None, env_var: str, default: str = "") -> str:
+    """
+    Return the S3 prefix or key of an output: the location configured for the tenant, or the one set by
+    the environment variable, under the name of the tenant if given. Empty if the output is disabled.
+    """
+
+    if tenant and location:
+        return location
+    env_location = os.environ.get(env_var, default)
+    if tenant and env_location:
+        return f"{tenant.name}/{env_location}"
+    return env_location
+
+
+def get_filtered_transform_s3_prefix(tenant: Tenant | None) -> str:
+    """Return the prefix of the prefiltered word frequencies of the tenant, or of the stack if None."""
+
+    return get_tenant_location(
+        tenant,
+        tenant.filtered_transform_s3_prefix if tenant else None,
+        "TRANSFORM_FILTERED_S3_PREFIX",
+        DEFAULT_FILTERED_TRANSFORM_S3_PREFIX,
+    )
+
+
+def get_phrase_transform_s3_prefix(tenant: Tenant | None) -> str:
+    """Return the prefix of the phrase frequencies of the tenant, or of the stack if None."""
+
+    return get_tenant_location(
+        tenant,
+        tenant.phrase_transform_s3_prefix if tenant else None,
+        "TRANSFORM_NGRAMS_S3_PREFIX",
+        DEFAULT_PHRASE_TRANSFORM_S3_PREFIX,
+    )
+
+
+def get_word_sketches_s3_prefix(tenant: Tenant | None) -> str:
+    """Return the prefix of the word sketches of the tenant, or of the stack if None, empty if disabled."""
+
+    return get_tenant_location(
+        tenant,
+        tenant.word_sketches_s3_prefix if tenant else None,
+        "WORD_SKETCHES_S3_PREFIX",
+    )
+
+
+def get_burst_state_s3_key(tenant: Tenant | None) -> str:
+    """Return the key of the burst detection state of the tenant, or of the stack if None, empty if disabled."""
+
+    return get_tenant_location(tenant, tenant.burst_state_s3_key if tenant else None, "BURST_STATE_S3_KEY")
+
+
+def get_bursts_s3_prefix(tenant: Tenant | None) -> str:
+    """Return the prefix of the bursting words of the tenant, or of the stack if None."""
+
+    return get_tenant_location(
+        tenant,
+        tenant.bursts_s3_prefix if tenant else None,
+        "BURSTS_S3_PREFIX",
+        DEFAULT_BURSTS_S3_PREFIX,
+    )
+
+
+def get_tenant_output_locations(tenant: Tenant) -> list[str]:
+    """Return the S3 prefixes and keys the stages write for the tenant."""
+
+    locations = [
+        tenant.transform_s3_prefix,
+        get_filtered_transform_s3_prefix(tenant),
+        get_phrase_transform_s3_prefix(tenant),
+        get_word_sketches_s3_prefix(tenant),
+        get_burst_state_s3_key(tenant),
+        get_bursts_s3_prefix(tenant),
+    ]
+    return [location for location in locations if location]
+
+
+def validate_tenant_locations(tenants: list[Tenant]) -> None:
+    """Raise ValueError if two tenants have the same name, or write to the same location of a bucket."""
+
+    for index, tenant in enumerate(tenants):
+        for other in tenants[:index]:
+            if tenant.name == other.name:
+                raise ValueError(f"Tenant {tenant.name} is configured more than once")
+            if tenant.bucket is not None and other.bucket is not None and tenant.bucket != other.bucket:
+                continue
+            shared_locations = set(get_tenant_output_locations(tenant)) & set(get_tenant_output_locations(other))
+            if shared_locations:
+                raise ValueError(
+                    f"Tenants {other.name} and {tenant.name} share a bucket and write to {sorted(shared_locations)}"
+                )
+
+
+def get_tenant_prefixes(tenant: Tenant, stage: Literal["transform", "load"]) -> list[str]:
+    """Return the prefixes of the objects the stage processes for the tenant."""
+
+    if stage == "transform":
+        return [tenant.extract_s3_prefix]
+    return [tenant.transform_s3_prefix, get_filtered_transform_s3_prefix(tenant)]
+
+
+def find_tenant(tenants: list[Tenant], bucket: str, key: str, stage: Literal["transform", "load"]) -> Tenant | None:
+    """Return the tenant of an object processed by the stage, matched by its bucket and the longest prefix."""
+
+    matches = [
+        (len(prefix), tenant)
+        for tenant in tenants
+        if tenant.bucket in (None, bucket)
+        for prefix in get_tenant_prefixes(tenant, stage)
+        if key.startswith(f"{prefix}/")
+    ]
+    return max(matches, key=lambda match: match[0])[1] if matches else None
+
+
+def resolve_tenant(bucket: str, key: str, stage: Literal["transform", "load"]) -> Tenant | None:
+    """
+    Return the tenant of an object processed by the stage, or None in single tenant mode.
+    Raises ValueError if tenants are configured, but none of them matches the object.
+    """
+
+    tenants = get_tenants()
+    if not tenants:
+        return None
+    tenant = find_tenant(tenants, bucket, key, stage)
+    if tenant is None:
+        raise ValueError(f"No tenant is configured for {bucket}/{key} in the {stage} stage")
+    return tenant
@@ -0,0 +1,105 @@
+"""
+Cache of the lemmatised words of each headline in order, keyed by a hash of the headline text.
+
+Most headlines stay on a front page for hours, so their words can be counted again, and their phrases
+listed, without tokenising and lemmatising them again. The cache is a bounded LRU in memory, which can be
+backed by a gzipped JSON file locally (e.g. in /tmp) or in S3, loaded at cold start and saved when changed.
+The words depend on the lemmatiser, so a cache saved with a different lemmatiser is not used.
+"""
+
+import gzip
+import json
+import time
+from collections import OrderedDict
+from typing import Callable
+
+DEFAULT_MAX_ENTRIES = 50_000
+# Version 1 cached word counts, which don't keep the order of the words needed for phrases
+TOKEN_CACHE_FORMAT_VERSION = 2
+# Caches saved before the lemmatiser was recorded were counted with the default lemmatiser
+DEFAULT_LEMMATISER = "textblob"
+
+
+class TokenCountCache:
+    """LRU cache of lemmatised words by headline fingerprint, with hit and miss statistics."""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, lemmatiser: str = DEFAULT_LEMMATISER):
+        self.max_entries = max_entries
+        self.lemmatiser = lemmatiser
+        self.entries: OrderedDict[str, list[str]] = OrderedDict()
+        self.changed = False
+        self.hits = 0
+        self.misses = 0
+        self.miss_time_ms = 0.0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get_or_compute(self, key: str, compute: Callable[[], list[str]]) -> list[str]:
+        """Return the cached words of the key, or compute, cache and return them."""
+
+        words = self.entries.get(key)
+        if words is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return words
+
+        start = time.perf_counter()
+        words = compute()
+        self.miss_time_ms += (time.perf_counter() - start) * 1000
+        self.misses += 1
+        self.put(key, words)
+        return words
+
+    def get(self, key: str) -> list[str] | None:
+        """Return the cached words of the key, or None, without counting a hit or a miss."""
+        return self.entries.get(key)
+
+    def put(self, key: str, words: list[str]) -> None:
+        """Cache the words of the key, evicting the least recently used entries if full."""
+
+        self.entries[key] = words
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        self.changed = True
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    @property
+    def estimated_saved_ms(self) -> float:
+        """Time saved by the hits, estimated from the average time of the misses."""
+        return self.hits * self.miss_time_ms / self.misses if self.misses else 0.0
+
+    def reset_stats(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.miss_time_ms = 0.0
+
+    def to_bytes(self) -> bytes:
+        """Serialise the entries from least to most recently used as gzipped JSON."""
+        data = {"format_version": TOKEN_CACHE_FORMAT_VERSION, "lemmatiser": self.lemmatiser, "entries": self.entries}
+        return gzip.compress(json.dumps(data, separators=(",", ":")).encode("utf-8"))
+
+    @classmethod
+    def from_bytes(
+        cls,
+        cache_bytes: bytes,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        lemmatiser: str = DEFAULT_LEMMATISER,
+    ) -> "TokenCountCache":
+        """Deserialise a cache, starting empty if the format is not supported or it was saved with another lemmatiser."""
+
+        cache = cls(max_entries=max_entries, lemmatiser=lemmatiser)
+        data = json.loads(gzip.decompress(cache_bytes))
+        if (
+            data.get("format_version") == TOKEN_CACHE_FORMAT_VERSION
+            and data.get("lemmatiser", DEFAULT_LEMMATISER) == lemmatiser
+        ):
+            for key, words in data["entries"].items():
+                cache.put(key, words)
+        cache.changed = False
+        return cache
@@ -1,36 +1,31 @@
 """
 Utility functions for YAML parsing, text normalization and logging.
+BigQuery helpers live in common.bigquery, so that only the load stage pays for importing the GCP libraries.
 """
 
 import io
-import json
 import logging
 import os
 from datetime import datetime, timezone
-from typing import Any, Callable, Protocol, Sequence, TypeVar
+from typing import Any, Callable, Mapping, Protocol, TypeVar
 
-import boto3
 import pyarrow as pa
+import pyarrow.compute as pc
 import pyarrow.parquet as pq
-from google.api_core.exceptions import BadRequest as GcpBadRequest
-from google.cloud import bigquery
-from google.oauth2 import service_account
 
+from common.metrics import span
+from common.records import is_record_type, records_to_table, table_to_records
+from common.storage import NoSuchKeyError, PreconditionFailedError, get_storage
 
 T = TypeVar("T")
 
+DEFAULT_UPDATE_ATTEMPTS = 5
+
 
 class HasDict(Protocol):
     __dict__: dict
 
 
-class DeleteFailedError(Exception):
-    """Raised when a BigQuery delete operation fails."""
-
-    def __init__(self, errors: str):
-        self.errors = errors
-
-
 def get_current_timestamp() -> datetime:
     """Return the current UTC timestamp."""
     return datetime.now(timezone.utc)
@@ -41,23 +36,56 @@ def coalesce_dict_values(dct: dict[str, str | None], default: T) -> dict[str, st
     return {k: v or default for k, v in dct.items()} if dct is not None else None
 
 
-def convert_objects_to_parquet_bytes(object_collection: list) -> bytes:
-    """Convert a list of objects to Parquet format and return as bytes."""
+def convert_objects_to_table(object_collection: list) -> pa.Table:
+    """Convert a list of objects (Pydantic models or records) to an Arrow table."""
+
+    if object_collection and is_record_type(type(object_collection[0])):
+        return records_to_table(object_collection, type(object_collection[0]))
+    return pa.Table.from_pylist([obj.model_dump() for obj in object_collection])
+
 
-    data = [obj.model_dump() for obj in object_collection]
-    table = pa.Table.from_pylist(data)
-    sink = io.BytesIO()
-    pq.write_table(table, sink, compression="gzip")
-    return sink.getvalue()
+def convert_table_to_objects(table: pa.Table, cls: type, defaults: Mapping[str, Any] | None = None) -> list:
+    """
+    Convert an Arrow table into a list of objects of the given class.
+    Record types are validated once per table, other classes are constructed (and validated) per row.
+    Fields missing from the table, e.g. because they were not read, take their value from defaults.
+    """
 
+    if is_record_type(cls):
+        return table_to_records(table, cls, defaults)
+    return [cls(**(defaults or {}), **item) for item in table.to_pylist()]
 
-def convert_parquet_bytes_to_objects(parquet_bytes: bytes, cls: type) -> list:
-    """Convert Parquet bytes back into a list of objects of the given class."""
 
-    sink = io.BytesIO(parquet_bytes)
-    table = pq.read_table(sink)
-    data = table.to_pylist()
-    return [cls(**item) for item in data]
+def convert_objects_to_parquet_bytes(object_collection: list) -> bytes:
+    """Convert a list of objects (Pydantic models or records) to Parquet format and return as bytes."""
+
+    with span("serialise_parquet") as serialise_span:
+        table = convert_objects_to_table(object_collection)
+        sink = io.BytesIO()
+        pq.write_table(table, sink, compression="gzip")
+        parquet_bytes = sink.getvalue()
+        serialise_span.add(rows=table.num_rows, bytes=len(parquet_bytes))
+    return parquet_bytes
+
+
+def convert_parquet_bytes_to_objects(
+    parquet_bytes: bytes,
+    cls: type,
+    columns: list[str] | None = None,
+    filters: pc.Expression | None = None,
+    defaults: Mapping[str, Any] | None = None,
+) -> list:
+    """
+    Convert Parquet bytes back into a list of objects of the given class, reading the bytes without a copy.
+    Only the given columns and the rows matching the filters are decoded, the fields of other columns
+    take their value from defaults.
+    """
+
+    with span("deserialise_parquet") as deserialise_span:
+        table = pq.read_table(pa.BufferReader(parquet_bytes), columns=columns, filters=filters)
+        objects = convert_table_to_objects(table, cls, defaults)
+        deserialise_span.add(rows=len(objects), bytes=len(parquet_bytes))
+    return objects
 
 
 def build_s3_key(prefix: str, timestamp: datetime, extension: str) -> str:
@@ -84,74 +112,91 @@ def extract_s3_bucket_and_key_from_event(event: dict) -> tuple[str, str]:
 
 def put_to_s3(bucket_name: str, key: str, data: bytes) -> dict[str, Any]:
     """Upload binary data to an S3 bucket."""
-    s3 = boto3.client("s3")
-    return s3.put_object(Bucket=bucket_name, Key=key, Body=data)  # type: ignore  # mypy-boto3 stub is too specific
+    with span("s3_put") as put_span:
+        response = get_storage().put(bucket=bucket_name, key=key, data=data)
+        put_span.add(bytes=len(data))
+    return response
 
 
 def get_from_s3(bucket_name: str, key: str) -> bytes:
-    """Retrieve data from an S3 object."""
-    s3 = boto3.client("s3")
-    return s3.get_object(Bucket=bucket_name, Key=key)["Body"].read()
+    """Retrieve data from an S3 object. Raises NoSuchKeyError if it doesn't exist."""
+    with span("s3_get") as get_span:
+        data = get_storage().get(bucket=bucket_name, key=key)
+        get_span.add(bytes=len(data))
+    return data
+
+
+def update_s3_object(
+    bucket_name: str,
+    key: str,
+    update: Callable[[bytes | None], bytes],
+    max_attempts: int = DEFAULT_UPDATE_ATTEMPTS,
+) -> bytes:
+    """
+    Read an S3 object, or None if it doesn't exist, and put the bytes returned by update, only if the object
+    wasn't changed in the meantime. Otherwise the update is applied again to the object written concurrently,
+    up to max_attempts times, so update must be safe to repeat. Returns the bytes that were put.
+    """
+
+    storage = get_storage()
+    attempt = 1
+    while True:
+        try:
+            data, version = storage.get_versioned(bucket=bucket_name, key=key)
+        except NoSuchKeyError:
+            data, version = None, None
+        updated_data = update(data)
+        try:
+            with span("s3_put") as put_span:
+                storage.put_if_version(bucket=bucket_name, key=key, data=updated_data, version=version)
+                put_span.add(bytes=len(updated_data))
+            return updated_data
+        except PreconditionFailedError:
+            if attempt >= max_attempts:
+                raise
+            get_logger().info(f"{bucket_name}/{key} was changed concurrently, updating it again")
+            attempt += 1
+
+
+def delete_from_s3(bucket: str, keys: list[str]) -> None:
+    """Delete objects from an S3 bucket."""
+    if keys:
+        get_storage().delete(bucket=bucket, keys=keys)
+
+
+def list_s3_keys(bucket: str, prefix: str) -> list[str]:
+    """Return the keys of the objects in an S3 bucket that start with the prefix, in lexicographic order."""
+    with span("s3_list") as list_span:
+        keys = get_storage().list_keys(bucket=bucket, prefix=prefix)
+        list_span.add(rows=len(keys))
+    return keys
 
 
 def get_s3_object_age_days(bucket: str, key: str) -> int | None:
     """Return the age of an S3 object in days or None if it does not exist."""
 
-    s3 = boto3.client("s3")
-    try:
-        response = s3.head_object(Bucket=bucket, Key=key)
-    except s3.exceptions.ClientError:
+    last_modified = get_storage().get_last_modified(bucket=bucket, key=key)
+    if last_modified is None:
         return None
-    file_upload_time = response["LastModified"].replace(tzinfo=None)
+    file_upload_time = last_modified.replace(tzinfo=None)
     return (datetime.now() - file_upload_time).days
 
 
 def download_from_s3(bucket: str, key: str, filename: str) -> None:
     """Download a file from S3 and save it locally."""
 
-    s3 = boto3.client("s3")
     path = os.path.dirname(filename)
     if not os.path.exists(path):
         os.makedirs(path)
-    s3.download_file(Bucket=bucket, Key=key, Filename=filename)
+    with span("s3_download"):
+        get_storage().download(bucket=bucket, key=key, filename=filename)
 
 
 def upload_to_s3(bucket: str, key: str, filename: str) -> None:
     """Upload a local file to S3."""
 
-    s3 = boto3.client("s3")
-    s3.upload_file(Filename=filename, Bucket=bucket, Key=key)
-
-
-def _get_bq_client() -> bigquery.Client:
-    """
-    Return a BigQuery client using credentials stored in AWS SSM Paramter Store.
-    Note: SSM is used instead of Secrets Manager to reduce the number of AWS services involved.
-    """
-
-    ssm = boto3.client("ssm")
-    response = ssm.get_parameter(Name="NewsWatchBigQueryCredentials", WithDecryption=True)
-    credentials_info = json.loads(response["Parameter"]["Value"], strict=False)
-    credentials = service_account.Credentials.from_service_account_info(credentials_info)
-    return bigquery.Client(credentials=credentials)
-
-
-def delete_timestamp_from_bigquery(table_id: str, timestamp: datetime) -> bigquery.table.RowIterator:
-    """Delete records from a BigQuery table with a given timestamp"""
-
-    client = _get_bq_client()
-    query_delete = f"DELETE FROM `{table_id}` WHERE timestamp = '{timestamp}'"
-    try:
-        return client.query(query_delete).result()
-    except GcpBadRequest as e:
-        raise DeleteFailedError(errors=e.errors)
-
-
-def insert_data_into_bigquery_table(table_id: str, data: list[dict]) -> Sequence[dict]:
-    """Insert multiple records into a BigQuery table."""
-
-    client = _get_bq_client()
-    return client.insert_rows_json(table_id, data)
+    with span("s3_upload"):
+        get_storage().upload(bucket=bucket, key=key, filename=filename)
 
 
 def get_logger() -> logging.Logger:
@@ -175,7 +220,7 @@ def call_and_catch_error_with_logging(logger: logging.Logger) -> Callable:
             try:
                 return func(*args, **kwargs)
             except Exception as e:
-                error_msg = f"Error in {func.__name__}: {e}"
+                error_msg = f"Error in {func.__name__}: {type(e).__name__}: {e}"
                 logger.error(error_msg)
 
         return wrapper
@@ -0,0 +1,55 @@
+"""
+Word frequency filters shared by the transform and load stages.
+"""
+
+import os
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from common.records import WordFrequencyT
+
+DEFAULT_MIN_WORD_LENGTH = 3
+DEFAULT_MIN_FREQUENCY = 500  # 0.5% multiplied by 10,000 for backwards compatibility
+
+
+def load_excluded_words(txt_path: str) -> set[str]:
+    """Load excluded words that shouldn't be inserted to BigQuery."""
+    with open(txt_path, "r") as file:
+        return {line.strip() for line in file}
+
+
+def filter_word_frequencies(
+    flat_word_frequencies: list[WordFrequencyT],
+    excluded_words: set[str],
+) -> list[WordFrequencyT]:
+    """
+    Filter out words that are too short, in the exclusion list or below a frequency threshold.
+    """
+
+    min_word_length = int(os.environ.get("MIN_WORD_LENGTH", DEFAULT_MIN_WORD_LENGTH))
+    min_frequency = int(os.environ.get("MIN_FREQUENCY", DEFAULT_MIN_FREQUENCY))
+
+    def _keep_word_frequency(word: str, frequency: int) -> bool:
+        """Return True if the word meets the length and frequency criteria."""
+        if len(word) < min_word_length or word in excluded_words or frequency < min_frequency:
+            return False
+        return True
+
+    return [fwf for fwf in flat_word_frequencies if _keep_word_frequency(fwf.word, fwf.frequency)]
+
+
+def build_word_frequency_filter(excluded_words: set[str]) -> pc.Expression:
+    """
+    Return the filters of filter_word_frequencies as an Arrow expression,
+    so that rows not passing them are skipped while reading Parquet files.
+    """
+
+    min_word_length = int(os.environ.get("MIN_WORD_LENGTH", DEFAULT_MIN_WORD_LENGTH))
+    min_frequency = int(os.environ.get("MIN_FREQUENCY", DEFAULT_MIN_FREQUENCY))
+    word = pc.field("word")
+    return (
+        (pc.utf8_length(word) >= min_word_length)
+        & (pc.field("frequency") >= min_frequency)
+        & ~word.isin(pa.array(sorted(excluded_words), type=pa.string()))
+    )
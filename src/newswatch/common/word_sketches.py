@@ -0,0 +1,179 @@
+"""
+Sketches of the loaded word frequencies by hour, day and month, for top-k and frequency queries
+over long periods without reading every hourly file.
+
+When WORD_SKETCHES_S3_PREFIX is set, the load stage writes a sketch of the word frequencies it loaded
+and adds it to the sketches of the day and the month, e.g.
+word-sketches/year=2024/month=01/day=05/hour=12.sketch, word-sketches/year=2024/month=01/day=05.sketch
+and word-sketches/year=2024/month=01.sketch. The day and the month keep the hours added to them, and are
+rebuilt from the sketches of their hours and days instead when an hour is loaded again, or when a loaded
+hour is missing from them, e.g. if a load failed after writing its hour. They are saved with conditional puts,
+so that an hour added by a concurrent load is not overwritten.
+
+A query merges the fewest sketches covering its time range: whole months, then whole days, then hours.
+The counts are sums of the hourly frequencies, like SUM(frequency) in BigQuery, and the error bounds are:
+- An estimate is never below the true sum, and exceeds it by at most e / SKETCH_WIDTH (0.017%) of the total
+  of all words in the range with a probability of 1 - e^-SKETCH_DEPTH (98%).
+- Each sketch keeps its HEAVY_HITTERS_CAPACITY words with the highest estimates, more than the words
+  loaded in an hour, so a word is only missing from the top k (up to the capacity) if it fell out of
+  the top of a day or a month. Words whose sums differ by less than the error bound may be swapped.
+"""
+
+from collections.abc import Iterable, Iterator, Sequence
+from datetime import datetime, timedelta
+
+from common.records import WordFrequencyLike
+from common.sketches import CountMinSketch, HeavyHitters
+from common.storage import NoSuchKeyError
+from common.utils import get_from_s3, get_logger, list_s3_keys, put_to_s3, update_s3_object
+
+logger = get_logger()
+
+DEFAULT_WORD_SKETCHES_S3_PREFIX = "word-sketches"
+# Sketches of different sizes can't be merged, so these must not change once sketches are written
+SKETCH_WIDTH = 16_384
+SKETCH_DEPTH = 4
+HEAVY_HITTERS_CAPACITY = 10_000
+
+_PARTITION_FORMATS = {
+    "hour": "year=%Y/month=%m/day=%d/hour=%H",
+    "day": "year=%Y/month=%m/day=%d",
+    "month": "year=%Y/month=%m",
+}
+
+
+def build_word_sketch_s3_key(prefix: str, timestamp: datetime, granularity: str) -> str:
+    """
+    Generate the S3 key of the sketch of the hour, day or month of the timestamp.
+    For example: word-sketches/year=1999/month=01/day=05.sketch
+    """
+    return f"{prefix}/{timestamp.strftime(_PARTITION_FORMATS[granularity])}.sketch"
+
+
+def build_word_sketch(word_frequencies: Sequence[WordFrequencyLike]) -> HeavyHitters:
+    word_sketch = HeavyHitters(
+        capacity=HEAVY_HITTERS_CAPACITY,
+        sketch=CountMinSketch(width=SKETCH_WIDTH, depth=SKETCH_DEPTH),
+    )
+    for wf in word_frequencies:
+        word_sketch.add(wf.word, wf.frequency)
+    return word_sketch
+
+
+def get_word_sketch(bucket: str, key: str) -> HeavyHitters | None:
+    try:
+        return HeavyHitters.from_bytes(get_from_s3(bucket_name=bucket, key=key))
+    except NoSuchKeyError:
+        return None
+
+
+def merge_word_sketches(bucket: str, keys: Iterable[str]) -> tuple[HeavyHitters | None, list[str]]:
+    """
+    Merge the sketches of the keys, and return the merged sketch and the keys that don't exist.
+    The sketches are read while they are merged, so that only one of them is in memory at a time.
+    """
+
+    missing_keys = []
+
+    def iterate_word_sketches() -> Iterator[HeavyHitters]:
+        for key in keys:
+            word_sketch = get_word_sketch(bucket=bucket, key=key)
+            if word_sketch is None:
+                missing_keys.append(key)
+            else:
+                yield word_sketch
+
+    word_sketches = iterate_word_sketches()
+    merged_sketch = next(word_sketches, None)
+    if merged_sketch is not None:
+        merged_sketch.merge_all(word_sketches)
+    return merged_sketch, missing_keys
+
+
+def rebuild_word_sketch(bucket: str, key: str, part_keys: list[str]) -> HeavyHitters:
+    """Merge the sketch of a period from the sketches of its parts."""
+
+    word_sketch, _ = merge_word_sketches(bucket=bucket, keys=part_keys)
+    if word_sketch is None:
+        raise NoSuchKeyError(f"None of the parts of {bucket}/{key} exist")
+    return word_sketch
+
+
+def add_word_sketch(bucket: str, key: str, hour_key: str, hour_sketch_bytes: bytes) -> None:
+    """
+    Add the sketch of an hour to the sketch of its day or month, or rebuild it from the sketches of its hours
+    or days if the hour was already added or another loaded hour is missing from it.
+    Repeated on the sketch saved by a concurrent load, if any.
+    """
+
+    period_prefix = f"{key.removesuffix('.sketch')}/"
+
+    def add_hour(period_sketch_bytes: bytes | None) -> bytes:
+        keys = [key for key in list_s3_keys(bucket=bucket, prefix=period_prefix) if key.endswith(".sketch")]
+        loaded_hour_keys = {key for key in keys if key.count("/") == hour_key.count("/")}
+        if period_sketch_bytes is not None:
+            period_sketch = HeavyHitters.from_bytes(period_sketch_bytes)
+            if hour_key not in period_sketch.parts and loaded_hour_keys - {hour_key} <= period_sketch.parts:
+                period_sketch.merge(HeavyHitters.from_bytes(hour_sketch_bytes))
+                return period_sketch.to_bytes()
+        # The month is listed with the hours of all its days, of which only the day sketches are merged
+        part_keys = [key for key in keys if "/" not in key.removeprefix(period_prefix)]
+        logger.info(f"Rebuilding the word sketch of {key} from {len(part_keys)} sketches")
+        return rebuild_word_sketch(bucket=bucket, key=key, part_keys=part_keys).to_bytes()
+
+    update_s3_object(bucket_name=bucket, key=key, update=add_hour)
+
+
+def put_word_sketches(
+    bucket: str, prefix: str, timestamp: datetime, word_frequencies: Sequence[WordFrequencyLike]
+) -> None:
+    """Write the sketch of the hour and add it to the sketches of its day and month."""
+
+    hour_key = build_word_sketch_s3_key(prefix=prefix, timestamp=timestamp, granularity="hour")
+    hour_sketch = build_word_sketch(word_frequencies)
+    hour_sketch.parts = {hour_key}
+    hour_sketch_bytes = hour_sketch.to_bytes()
+    put_to_s3(bucket_name=bucket, key=hour_key, data=hour_sketch_bytes)
+
+    # The day is updated first, as the month is rebuilt from the days
+    day_key = build_word_sketch_s3_key(prefix=prefix, timestamp=timestamp, granularity="day")
+    add_word_sketch(bucket=bucket, key=day_key, hour_key=hour_key, hour_sketch_bytes=hour_sketch_bytes)
+    month_key = build_word_sketch_s3_key(prefix=prefix, timestamp=timestamp, granularity="month")
+    add_word_sketch(bucket=bucket, key=month_key, hour_key=hour_key, hour_sketch_bytes=hour_sketch_bytes)
+    logger.info(f"Updated the word sketches of {day_key} and {month_key}")
+
+
+def get_next_month(timestamp: datetime) -> datetime:
+    return timestamp.replace(year=timestamp.year + timestamp.month // 12, month=timestamp.month % 12 + 1, day=1)
+
+
+def get_word_sketch_keys(prefix: str, start: datetime, end: datetime) -> list[str]:
+    """Return the keys of the fewest sketches covering the hours from start (inclusive) to end (exclusive)."""
+
+    keys = []
+    current = start.replace(minute=0, second=0, microsecond=0)
+    while current < end:
+        if current.day == 1 and current.hour == 0 and get_next_month(current) <= end:
+            keys.append(build_word_sketch_s3_key(prefix=prefix, timestamp=current, granularity="month"))
+            current = get_next_month(current)
+        elif current.hour == 0 and current + timedelta(days=1) <= end:
+            keys.append(build_word_sketch_s3_key(prefix=prefix, timestamp=current, granularity="day"))
+            current += timedelta(days=1)
+        else:
+            keys.append(build_word_sketch_s3_key(prefix=prefix, timestamp=current, granularity="hour"))
+            current += timedelta(hours=1)
+    return keys
+
+
+def query_word_sketches(
+    bucket: str,
+    start: datetime,
+    end: datetime,
+    prefix: str = DEFAULT_WORD_SKETCHES_S3_PREFIX,
+) -> tuple[HeavyHitters | None, list[str]]:
+    """
+    Merge the sketches of the hours from start (inclusive) to end (exclusive).
+    Return the merged sketch, None if there is none in the range, and the keys of the missing sketches,
+    i.e. the periods without loaded word frequencies.
+    """
+    return merge_word_sketches(bucket=bucket, keys=get_word_sketch_keys(prefix=prefix, start=start, end=end))
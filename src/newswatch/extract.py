@@ -2,25 +2,66 @@
 Extract raw headlines from target news sites and store them in S3.
 """
 
+import json
 import os
 import sys
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import nullcontext
 from datetime import datetime
 
+import boto3
 import requests
-import yaml
+from botocore.config import Config
 from bs4 import BeautifulSoup
 from aws_lambda_typing.events import EventBridgeEvent
 from aws_lambda_typing.context import Context
 
+from common.metrics import emit_metrics, span
 from common.models import Filter, Headline, Site
+from common.politeness import (
+    DEFAULT_BURST,
+    DEFAULT_MAX_IN_FLIGHT,
+    DEFAULT_MAX_WAIT_SEC,
+    DEFAULT_RATE_PER_SEC,
+    HostScheduler,
+    fetch_crawl_delay,
+    parse_retry_after,
+)
+from common.profiling import profile_requested_by, profiled
+from common.records import HeadlineRecord, to_records
+from common.s3_io import get_objects_from_s3, put_objects_to_s3
+from common.shards import (
+    SHARDING_MODES,
+    build_partial_s3_key,
+    get_site_costs,
+    split_sites_by_cost,
+    split_sites_by_hash,
+)
+from common.site_health import (
+    DEFAULT_COOLDOWN_SEC,
+    DEFAULT_FAILURE_THRESHOLD,
+    DEFAULT_TIMEOUT_MULTIPLIER,
+    SiteHealth,
+    SiteHealthState,
+    get_backoff_sec,
+    load_site_health,
+    save_site_health,
+)
+from common.sites import (
+    FilterMatcher,
+    SiteRegistry,
+    compile_filter,
+    get_file_stat,
+    load_compiled_sites,
+    parse_sites_yaml,
+)
 from common.utils import (
     build_s3_key,
     call_and_catch_error_with_logging,
-    coalesce_dict_values,
-    convert_objects_to_parquet_bytes,
+    delete_from_s3,
     get_current_timestamp,
     get_logger,
-    put_to_s3,
 )
 
 logger = get_logger()
@@ -40,102 +81,448 @@ REQUEST_HEADERS = {
     "Cache-Control": "max-age=0",
     "Upgrade-Insecure-Requests": "1",
 }
+DEFAULT_MAX_RETRIES = 2
+RETRY_BACKOFF_BASE_SEC = 1.0
+RETRY_BACKOFF_MAX_SEC = 8.0
+THROTTLED_STATUS_CODES = (429, 503)
+# Used if a throttling response has no valid Retry-After
+DEFAULT_THROTTLED_DELAY_SEC = 60.0
+DEFAULT_SCRAPE_CONCURRENCY = 1
+DEFAULT_EXTRACT_PARTIALS_S3_PREFIX = "partials/headlines"
+# A shard worker invocation can run as long as the function timeout
+SHARD_WORKER_READ_TIMEOUT_SEC = 310
+
+# Kept across the invocations of a warm Lambda container if the site health is not persisted
+_in_memory_site_health = SiteHealthState()
+
+# Built at cold start and kept until the configuration changes
+_site_registry: SiteRegistry | None = None
+
+# Kept across the invocations of a warm Lambda container to honour the Retry-After of throttling hosts
+_host_scheduler: HostScheduler | None = None
 
 
 def load_sites_from_yaml(yaml_path: str) -> list[Site]:
     """Load site structure configurations from a YAML file."""
-    with open(yaml_path, "r") as stream:
-        sites_from_yaml = yaml.safe_load(stream)
-        return [Site(**site) for site in sites_from_yaml]
+    with span("load_sites"):
+        return parse_sites_yaml(yaml_path)
 
 
-@call_and_catch_error_with_logging(logger=logger)
-def scrape_url(url: str) -> BeautifulSoup:
-    """Fetch and parse HTML content from a URL."""
+def get_site_registry(yaml_path: str) -> SiteRegistry:
+    """
+    Return the site registry of the container, rebuilding it only if the modification time or size
+    of the YAML has changed. A precompiled JSON of the YAML is used if it is up to date.
+    """
+
+    global _site_registry
+    source_stat = get_file_stat(yaml_path)
+    if _site_registry is not None and source_stat is not None and _site_registry.source_stat == source_stat:
+        return _site_registry
+
+    sites = None
+    if source_stat is not None:
+        with span("load_compiled_sites"):
+            sites = load_compiled_sites(yaml_path)
+    if sites is None:
+        sites = load_sites_from_yaml(yaml_path=yaml_path)
+    _site_registry = SiteRegistry(sites=sites, source_stat=source_stat)
+    return _site_registry
 
-    response = requests.get(url=url, headers=REQUEST_HEADERS, timeout=REQUEST_GET_TIMEOUT_SEC)
-    content = response.content
+
+@call_and_catch_error_with_logging(logger=logger)
+def scrape_url(
+    url: str,
+    timeout_sec: float = REQUEST_GET_TIMEOUT_SEC,
+    host_scheduler: HostScheduler | None = None,
+) -> BeautifulSoup | None:
+    """
+    Fetch and parse HTML content from a URL.
+    Returns None if the host is throttling the requests, and defers the next request to the host by its Retry-After.
+    """
+
+    with span("fetch") as fetch_span:
+        response = requests.get(url=url, headers=REQUEST_HEADERS, timeout=timeout_sec)
+        content = response.content
+        fetch_span.add(bytes=len(content))
     logger.info(f"{url} response: {response.status_code}, received {len(content)} bytes")
-    return BeautifulSoup(markup=content, features="html.parser")
+    if response.status_code in THROTTLED_STATUS_CODES:
+        retry_after_sec = parse_retry_after(response.headers.get("Retry-After"))
+        if host_scheduler is not None:
+            host_scheduler.defer(str(url), retry_after_sec or DEFAULT_THROTTLED_DELAY_SEC)
+        logger.warning(f"{url} is throttling requests, Retry-After: {retry_after_sec}")
+        return None
+    with span("parse_html"):
+        return BeautifulSoup(markup=content, features="html.parser")
+
+
+def scrape_site(
+    site: Site,
+    site_health: SiteHealth,
+    host_scheduler: HostScheduler | None = None,
+) -> BeautifulSoup | None:
+    """
+    Scrape a site with an adaptive timeout and bounded retries, unless its circuit breaker is open.
+    Returns None if the site was skipped or all attempts failed.
+
+    - The timeout is the recent p99 latency of the site times SCRAPE_TIMEOUT_MULTIPLIER, capped at
+      REQUEST_GET_TIMEOUT_SEC, so the worst case of a run is known in advance.
+    - Failed attempts are retried up to SCRAPE_MAX_RETRIES times with exponential backoff and jitter.
+    - After CIRCUIT_BREAKER_FAILURES failed runs in a row, the site is skipped for CIRCUIT_BREAKER_COOLDOWN_SEC,
+      then probed with a single attempt.
+    - Every attempt waits for the host scheduler, if given, and gives up if the host is rate limited for too long.
+    """
+
+    now = time.time()
+    if site_health.is_open(now):
+        logger.warning(f"Skipping {site.name} after {site_health.consecutive_failures} failed runs in a row")
+        return None
+
+    probing = site_health.is_half_open(now)
+    max_retries = 0 if probing else int(os.environ.get("SCRAPE_MAX_RETRIES", DEFAULT_MAX_RETRIES))
+    timeout_sec = site_health.get_timeout_sec(
+        max_timeout_sec=REQUEST_GET_TIMEOUT_SEC,
+        multiplier=float(os.environ.get("SCRAPE_TIMEOUT_MULTIPLIER", DEFAULT_TIMEOUT_MULTIPLIER)),
+    )
+
+    for attempt in range(max_retries + 1):
+        if attempt > 0:
+            time.sleep(get_backoff_sec(attempt - 1, RETRY_BACKOFF_BASE_SEC, RETRY_BACKOFF_MAX_SEC))
+        request_slot = host_scheduler.request_slot(str(site.url)) if host_scheduler is not None else nullcontext(True)
+        with request_slot as allowed:
+            if not allowed:
+                logger.warning(f"Not scraping {site.name}, its host is rate limited for too long")
+                break
+            # The latency excludes the time waiting for the host scheduler
+            start = time.perf_counter()
+            bs = scrape_url(site.url, timeout_sec=timeout_sec, host_scheduler=host_scheduler)
+        if bs is not None:
+            site_health.record_success(latency_ms=(time.perf_counter() - start) * 1000)
+            return bs
+
+    site_health.record_failure(
+        now=time.time(),
+        failure_threshold=int(os.environ.get("CIRCUIT_BREAKER_FAILURES", DEFAULT_FAILURE_THRESHOLD)),
+        cooldown_sec=float(os.environ.get("CIRCUIT_BREAKER_COOLDOWN_SEC", DEFAULT_COOLDOWN_SEC)),
+    )
+    logger.warning(
+        f"Failed to scrape {site.name} in up to {max_retries + 1} attempts with a {timeout_sec:.1f} s timeout"
+    )
+    return None
 
 
-def extract_headline_strings(bs: BeautifulSoup, bsoup_filters: list[Filter]) -> list[str]:
-    """Extract and return deduplicated headlines from HTML using given filters."""
+def extract_headline_strings(
+    bs: BeautifulSoup,
+    bsoup_filters: list[Filter],
+    matchers: list[FilterMatcher] | None = None,
+) -> list[str]:
+    """Extract and return deduplicated headlines from HTML using given filters, or their prebuilt matchers."""
+
+    if matchers is None:
+        matchers = [compile_filter(bsoup_filter) for bsoup_filter in bsoup_filters]
 
     headlines: set[str] = set()
-    for bsoup_filter in bsoup_filters:
-        if (optional_attrs := bsoup_filter.attrs) is not None:
-            bsoup_attrs = coalesce_dict_values(dct=optional_attrs, default=True)
-        else:
-            bsoup_attrs = None
+    for matcher in matchers:
         for element in bs.find_all(
-            name=bsoup_filter.tag,
-            attrs=bsoup_attrs,
+            name=matcher.name,
+            attrs=matcher.attrs,
         ):
             headlines.add(element.text)
 
     return sorted(list(headlines))
 
 
-def get_headlines(sites: list[Site], timestamp: datetime) -> list[Headline]:
-    """Scrape headlines from a list of sites and return them with timestamps."""
+def get_host_scheduler() -> HostScheduler:
+    """Return the host scheduler of the container, so that Retry-After is honoured across warm invocations."""
+
+    global _host_scheduler
+    if _host_scheduler is None:
+        respect_crawl_delay = os.environ.get("SCRAPE_RESPECT_CRAWL_DELAY", "false").lower() == "true"
+        _host_scheduler = HostScheduler(
+            rate_per_sec=float(os.environ.get("SCRAPE_HOST_RATE_PER_SEC", DEFAULT_RATE_PER_SEC)),
+            burst=int(os.environ.get("SCRAPE_HOST_BURST", DEFAULT_BURST)),
+            max_in_flight=int(os.environ.get("SCRAPE_HOST_MAX_IN_FLIGHT", DEFAULT_MAX_IN_FLIGHT)),
+            max_wait_sec=float(os.environ.get("SCRAPE_HOST_MAX_WAIT_SEC", DEFAULT_MAX_WAIT_SEC)),
+            crawl_delay_fetcher=(
+                (lambda url: fetch_crawl_delay(url, REQUEST_HEADERS["User-Agent"])) if respect_crawl_delay else None
+            ),
+        )
+    return _host_scheduler
+
+
+def extract_site_headlines(
+    site: Site,
+    timestamp: datetime,
+    matchers: list[FilterMatcher] | None,
+    site_health: SiteHealth,
+    host_scheduler: HostScheduler,
+) -> list[Headline]:
+    """Scrape the headlines of a site and return them with timestamps, or nothing if the site failed."""
+
+    logger.info(f"Extracting from site: {site.name}")
+    with span("extract_site", site=site.name) as site_span:
+        bs = scrape_site(site, site_health, host_scheduler)
+        if bs is None:
+            site_span.add(rows=0, failures=1)
+            return []
+        extracted_headlines = extract_headline_strings(bs=bs, bsoup_filters=site.filters, matchers=matchers)
+        site_span.add(rows=len(extracted_headlines))
+
+    return [
+        Headline(
+            site_name=site.name,
+            timestamp=timestamp,
+            headline=headline,
+        )
+        for headline in extracted_headlines
+    ]
+
+
+def get_headlines(
+    sites: list[Site],
+    timestamp: datetime,
+    matchers: dict[str, list[FilterMatcher]] | None = None,
+    site_health: SiteHealthState | None = None,
+    host_scheduler: HostScheduler | None = None,
+) -> list[Headline]:
+    """
+    Scrape headlines from a list of sites and return them with timestamps in the order of the sites.
+    Up to SCRAPE_CONCURRENCY sites are scraped at the same time, within the limits of the host scheduler.
+    """
 
     logger.info(f"Sites to be scraped: {[site.name for site in sites]}")
     headlines: list[Headline] = []
+    if site_health is None:
+        site_health = SiteHealthState()
+    if host_scheduler is None:
+        host_scheduler = get_host_scheduler()
+
+    concurrency = int(os.environ.get("SCRAPE_CONCURRENCY", DEFAULT_SCRAPE_CONCURRENCY))
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="scrape") as executor:
+        futures = [
+            executor.submit(
+                extract_site_headlines,
+                site,
+                timestamp,
+                (matchers or {}).get(site.name),
+                site_health.get(site.name),
+                host_scheduler,
+            )
+            for site in sites
+        ]
+        for future in futures:
+            headlines.extend(future.result())
+
+    return headlines
 
-    for site in sites:
-        logger.info(f"Extracting from site: {site.name}")
-        extracted_headlines = extract_headline_strings(bs=scrape_url(site.url), bsoup_filters=site.filters)
-        if extracted_headlines:
-            site_headlines = [
-                Headline(
-                    site_name=site.name,
-                    timestamp=timestamp,
-                    headline=headline,
-                )
-                for headline in extracted_headlines
-            ]
-            headlines.extend(site_headlines)
 
+def extract_headlines(timestamp: datetime, site_health: SiteHealthState | None = None) -> list[Headline]:
+    """Load the configured sites and scrape their headlines."""
+
+    sites_yaml_path = os.environ.get("SITES_YAML_PATH", "")
+    site_registry = get_site_registry(yaml_path=sites_yaml_path)
+    return get_headlines(
+        sites=site_registry.sites,
+        timestamp=timestamp,
+        matchers=site_registry.matchers,
+        site_health=site_health,
+    )
+
+
+def split_sites_into_shards(sites: list[Site], shard_count: int, site_health: SiteHealthState) -> list[list[Site]]:
+    """Split sites into shards by the hash of their names or by their measured cost (EXTRACT_SHARDING)."""
+
+    sharding_mode = os.environ.get("EXTRACT_SHARDING", "cost")
+    if sharding_mode not in SHARDING_MODES:
+        raise ValueError(f"EXTRACT_SHARDING must be one of {SHARDING_MODES}, got {sharding_mode}")
+    if sharding_mode == "hash":
+        return split_sites_by_hash(sites=sites, shard_count=shard_count)
+    return split_sites_by_cost(sites=sites, shard_count=shard_count, costs=get_site_costs(sites, site_health))
+
+
+@emit_metrics(stage="extract_shard")
+def extract_shard(shard: dict) -> dict:
+    """
+    Extract the headlines of the sites of a shard and upload them to S3 as a partial result.
+    Returns the S3 key of the partial result and the updated health of the sites.
+    """
+
+    timestamp = datetime.fromisoformat(shard["timestamp"])
+    site_names = set(shard["sites"])
+    site_registry = get_site_registry(yaml_path=os.environ.get("SITES_YAML_PATH", ""))
+    site_health = SiteHealthState.from_dict(shard["site_health"])
+    headlines = get_headlines(
+        sites=[site for site in site_registry.sites if site.name in site_names],
+        timestamp=timestamp,
+        matchers=site_registry.matchers,
+        site_health=site_health,
+    )
+
+    s3_bucket_name, _ = get_extract_s3_location(timestamp=timestamp)
+    partials_s3_prefix = os.environ.get("EXTRACT_PARTIALS_S3_PREFIX", DEFAULT_EXTRACT_PARTIALS_S3_PREFIX)
+    partial_key = build_partial_s3_key(
+        prefix=partials_s3_prefix,
+        timestamp=timestamp,
+        shard_index=shard["index"],
+        shard_count=shard["count"],
+    )
+    put_headlines_to_s3(bucket=s3_bucket_name, key=partial_key, headlines=headlines)
+    return {"key": partial_key, "site_health": site_health.to_dict()}
+
+
+def invoke_shard_worker(shard: dict) -> dict:
+    """Extract a shard in a separate invocation of this Lambda function and return its result."""
+
+    lambda_client = boto3.client(
+        "lambda",
+        config=Config(read_timeout=SHARD_WORKER_READ_TIMEOUT_SEC, retries={"max_attempts": 0}),
+    )
+    response = lambda_client.invoke(
+        FunctionName=os.environ.get("AWS_LAMBDA_FUNCTION_NAME", ""),
+        InvocationType="RequestResponse",
+        Payload=json.dumps({"shard": shard}).encode("utf-8"),
+    )
+    result: dict = json.loads(response["Payload"].read())
+    if "FunctionError" in response:
+        raise RuntimeError(result.get("errorMessage", response["FunctionError"]))
+    return result
+
+
+def get_shard_executor(shard_count: int) -> Executor:
+    """
+    Return the executor running the shards: separate processes locally, or threads waiting for
+    the invocations of the shard workers in Lambda. With the memory storage backend, the local shards run
+    in threads, as the partial results written by other processes would not be in the memory of this one.
+    """
+
+    if is_local and os.environ.get("STORAGE_BACKEND") != "memory":
+        return ProcessPoolExecutor(max_workers=shard_count)
+    return ThreadPoolExecutor(max_workers=shard_count, thread_name_prefix="shard")
+
+
+def extract_headlines_sharded(
+    timestamp: datetime, bucket: str, shard_count: int, site_health: SiteHealthState
+) -> list[Headline]:
+    """
+    Extract headlines in shards running in parallel and merge their partial results in the order of the sites.
+    A failed shard is logged and its sites are missing from the result, like the sites that failed to be scraped.
+    """
+
+    site_registry = get_site_registry(yaml_path=os.environ.get("SITES_YAML_PATH", ""))
+    shards = [
+        {
+            "index": shard_index,
+            "count": shard_count,
+            "timestamp": timestamp.isoformat(),
+            "sites": [site.name for site in shard_sites],
+            "site_health": SiteHealthState({site.name: site_health.get(site.name) for site in shard_sites}).to_dict(),
+        }
+        for shard_index, shard_sites in enumerate(
+            split_sites_into_shards(site_registry.sites, shard_count, site_health)
+        )
+        if shard_sites
+    ]
+    logger.info(f"Extracting {len(site_registry.sites)} sites in {len(shards)} shards")
+
+    run_shard = extract_shard if is_local else invoke_shard_worker
+    headlines: list[Headline] = []
+    partial_keys: list[str] = []
+    with get_shard_executor(len(shards)) as executor:
+        futures = [executor.submit(run_shard, shard) for shard in shards]
+        for shard, future in zip(shards, futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.error(f"Error in shard {shard['index']}: {type(e).__name__}: {e}")
+                continue
+            site_health.sites.update(SiteHealthState.from_dict(result["site_health"]).sites)
+            partial_keys.append(result["key"])
+            with span("merge_shard", shard=str(shard["index"])):
+                headlines.extend(get_objects_from_s3(bucket=bucket, key=result["key"], cls=Headline))
+
+    site_order = {site.name: site_index for site_index, site in enumerate(site_registry.sites)}
+    headlines.sort(key=lambda headline: site_order.get(headline.site_name, len(site_order)))
+    delete_from_s3(bucket=bucket, keys=partial_keys)
     return headlines
 
 
-def extract() -> None:
-    """Extract headlines from news sites and upload them to S3 in parquet format."""
+def get_site_health(bucket: str) -> SiteHealthState:
+    """Load the site health from S3 if SITE_HEALTH_S3_KEY is set, otherwise use the one in memory."""
 
-    timestamp_at_start = get_current_timestamp()
-    logger.info(f"Extracting headlines at {timestamp_at_start}")
+    site_health_s3_key = os.environ.get("SITE_HEALTH_S3_KEY", "")
+    if not site_health_s3_key:
+        return _in_memory_site_health
+    return load_site_health(bucket=bucket, key=site_health_s3_key)
 
-    sites_yaml_path = os.environ.get("SITES_YAML_PATH", "")
-    sites: list[Site] = load_sites_from_yaml(yaml_path=sites_yaml_path)
-    headlines: list[Headline] = get_headlines(sites=sites, timestamp=timestamp_at_start)
 
-    headlines_parquet: bytes = convert_objects_to_parquet_bytes(headlines)
+def put_site_health(bucket: str, site_health: SiteHealthState) -> None:
+    """Save the site health to S3 if SITE_HEALTH_S3_KEY is set."""
+
+    site_health_s3_key = os.environ.get("SITE_HEALTH_S3_KEY", "")
+    if site_health_s3_key:
+        save_site_health(bucket=bucket, key=site_health_s3_key, state=site_health)
+
+
+def extract_all_headlines(timestamp: datetime, bucket: str, site_health: SiteHealthState) -> list[Headline]:
+    """Extract the headlines of all sites, in EXTRACT_SHARDS shards running in parallel if more than 1."""
+
+    shard_count = int(os.environ.get("EXTRACT_SHARDS", 1))
+    if shard_count > 1:
+        return extract_headlines_sharded(
+            timestamp=timestamp,
+            bucket=bucket,
+            shard_count=shard_count,
+            site_health=site_health,
+        )
+    return extract_headlines(timestamp=timestamp, site_health=site_health)
+
+
+def get_extract_s3_location(timestamp: datetime) -> tuple[str, str]:
+    """Return the S3 bucket and object key where headlines extracted at the timestamp are stored."""
 
     if (not is_local) or is_pytest:
         s3_bucket_name = os.environ.get("S3_BUCKET_NAME", "")
         extract_s3_prefix = os.environ.get("EXTRACT_S3_PREFIX", "")
-        object_key = build_s3_key(prefix=extract_s3_prefix, timestamp=timestamp_at_start, extension="parquet")
+        object_key = build_s3_key(prefix=extract_s3_prefix, timestamp=timestamp, extension="parquet")
     else:
         s3_bucket_name = os.environ.get("TEST_S3_BUCKET_NAME", "")
         object_key = os.environ.get("TEST_S3_EXTRACT_KEY", "")
+    return s3_bucket_name, object_key
 
-    s3_response: dict = put_to_s3(
-        bucket_name=s3_bucket_name,
-        key=object_key,
-        data=headlines_parquet,
-    )
+
+def put_headlines_to_s3(bucket: str, key: str, headlines: list[Headline]) -> None:
+    """Upload headlines to S3 in parquet format."""
+
+    s3_response: dict = put_objects_to_s3(bucket=bucket, key=key, objects=to_records(headlines, HeadlineRecord))
 
     if s3_response.get("ResponseMetadata", {}).get("HTTPStatusCode") == 200:
-        logger.info(f"Uploaded headlines to S3: {s3_bucket_name}/{object_key}")
+        logger.info(f"Uploaded headlines to S3: {bucket}/{key}")
+
+
+@emit_metrics(stage="extract")
+@profiled(stage="extract", get_location=lambda timestamp_at_start: get_extract_s3_location(timestamp_at_start))
+def extract(timestamp_at_start: datetime) -> None:
+    """Extract headlines from news sites at the given time and upload them to S3 in parquet format."""
+
+    logger.info(f"Extracting headlines at {timestamp_at_start}")
+
+    s3_bucket_name, object_key = get_extract_s3_location(timestamp=timestamp_at_start)
+    site_health = get_site_health(bucket=s3_bucket_name)
+    headlines = extract_all_headlines(timestamp=timestamp_at_start, bucket=s3_bucket_name, site_health=site_health)
+    put_site_health(bucket=s3_bucket_name, site_health=site_health)
+    put_headlines_to_s3(bucket=s3_bucket_name, key=object_key, headlines=headlines)
 
 
 # Lambda handler
 
 
-def lambda_handler(event: EventBridgeEvent, context: Context) -> None:
-    extract()
+def lambda_handler(event: EventBridgeEvent, context: Context) -> dict | None:
+    # Invoked by the coordinator with the shard to extract if EXTRACT_SHARDS is more than 1
+    if event and "shard" in event:
+        return extract_shard(event["shard"])  # type: ignore[typeddict-item]
+    with profile_requested_by(event):
+        extract(timestamp_at_start=get_current_timestamp())
+    return None
 
 
 if is_local and not is_pytest and __name__ == "__main__":
-    extract()
+    extract(timestamp_at_start=get_current_timestamp())
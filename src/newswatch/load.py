@@ -4,63 +4,40 @@ Load processed word frequency records into a BigQuery table.
 
 import os
 import sys
+from collections.abc import Sequence
+from datetime import datetime
 
 from aws_lambda_typing.events import S3Event
 from aws_lambda_typing.context import Context
 
-from common.models import WordFrequency
+from common.intake import process_s3_object_events
+from common.metrics import emit_metrics, span
+from common.models import Tenant
+from common.profiling import profile_requested_by, profiled
+from common.records import WordFrequencyLike, WordFrequencyRecord, WordFrequencyT
+from common.bigquery import DeleteFailedError, delete_timestamp_from_bigquery, insert_data_into_bigquery_table
+from common.tenants import get_word_sketches_s3_prefix, resolve_tenant
+from common.s3_io import get_objects_from_s3
 from common.utils import (
-    DeleteFailedError,
-    convert_parquet_bytes_to_objects,
-    delete_timestamp_from_bigquery,
-    extract_s3_bucket_and_key_from_event,
     get_datetime_from_s3_key,
-    get_from_s3,
     get_logger,
-    insert_data_into_bigquery_table,
 )
+from common.word_filters import build_word_frequency_filter, filter_word_frequencies, load_excluded_words
+from common.word_sketches import put_word_sketches
 
 
 logger = get_logger()
 
-DEFAULT_MIN_WORD_LENGTH = 3
-DEFAULT_MIN_FREQUENCY = 500  # 0.5% multiplied by 10,000 for backwards compatibility
-
-
 excluded_words_txt_path = os.environ.get("EXCLUDED_WORDS_TXT_PATH", "./resources/excluded-words.txt")
 
 is_local = os.environ.get("AWS_EXECUTION_ENV") is None
 is_pytest = "pytest" in sys.modules
 
 
-def load_excluded_words(txt_path: str) -> set[str]:
-    """Load excluded words that shouldn't be inserted to BigQuery."""
-    with open(txt_path, "r") as file:
-        return {line.strip() for line in file}
-
-
-def filter_word_frequencies(
-    flat_word_frequencies: list[WordFrequency],
-    excluded_words: set[str],
-) -> list[WordFrequency]:
-    """
-    Filter out words that are too short, in the exclusion list or below a frequency threshold.
-    """
-
-    min_word_length = int(os.environ.get("MIN_WORD_LENGTH", DEFAULT_MIN_WORD_LENGTH))
-    min_frequency = int(os.environ.get("MIN_FREQUENCY", DEFAULT_MIN_FREQUENCY))
-
-    def _keep_word_frequency(word: str, frequency: int) -> bool:
-        """Return True if the word meets the length and frequency criteria."""
-        if len(word) < min_word_length or word in excluded_words or frequency < min_frequency:
-            return False
-        return True
-
-    return [fwf for fwf in flat_word_frequencies if _keep_word_frequency(fwf.word, fwf.frequency)]
-
-
-def convert_filtered_word_frequencies_to_dict(word_frequencies: list[WordFrequency]) -> list[dict[str, int | str]]:
-    """Convert a list of WordFrequency objects into a dictionary format with timestamps as strings."""
+def convert_filtered_word_frequencies_to_dict(
+    word_frequencies: Sequence[WordFrequencyLike],
+) -> list[dict[str, int | str]]:
+    """Convert word frequencies into a dictionary format with timestamps as strings."""
 
     return [
         {
@@ -72,27 +49,31 @@ def convert_filtered_word_frequencies_to_dict(word_frequencies: list[WordFrequen
     ]
 
 
-def load(bucket: str, word_frequencies_key: str) -> None:
-    """Load word frequencies from S3 and insert them into BigQuery after applying filters."""
+def load_word_frequencies(
+    word_frequencies: list[WordFrequencyT],
+    timestamp: datetime,
+    bigquery_table_id: str | None = None,
+    excluded_words: set[str] | None = None,
+) -> list[WordFrequencyT]:
+    """
+    Insert word frequencies into BigQuery after applying filters, into BIGQUERY_TABLE_ID if no table is given.
+    The excluded words are read from EXCLUDED_WORDS_TXT_PATH if not given. Returns the filtered word frequencies.
+    """
 
-    logger.info(f"Loading word frequencies from {bucket}/{word_frequencies_key}")
-    timestamp = get_datetime_from_s3_key(word_frequencies_key)
-    word_frequency_bytes: bytes = get_from_s3(bucket_name=bucket, key=word_frequencies_key)
-    word_frequencies: list[WordFrequency] = convert_parquet_bytes_to_objects(
-        parquet_bytes=word_frequency_bytes,
-        cls=WordFrequency,
-    )
-    excluded_words = load_excluded_words(excluded_words_txt_path) if excluded_words_txt_path else set()
-    filtered_word_frequencies = filter_word_frequencies(word_frequencies, excluded_words)
+    with span("filter_words") as filter_span:
+        if excluded_words is None:
+            excluded_words = load_excluded_words(excluded_words_txt_path) if excluded_words_txt_path else set()
+        filtered_word_frequencies = filter_word_frequencies(word_frequencies, excluded_words)
+        filter_span.add(rows=len(filtered_word_frequencies))
 
     records_to_load_dicts = convert_filtered_word_frequencies_to_dict(filtered_word_frequencies)
 
     if is_local and not is_pytest:
         logger.warning("Local testing. Logging a sample of the records that would be loaded, but not loading them.")
         logger.warning(records_to_load_dicts[:5])
-        return
+        return filtered_word_frequencies
 
-    bigquery_table_id = os.environ.get("BIGQUERY_TABLE_ID", "")
+    bigquery_table_id = bigquery_table_id or os.environ.get("BIGQUERY_TABLE_ID", "")
     bigquery_delete_before_write = os.environ.get("BIGQUERY_DELETE_BEFORE_WRITE", "false").lower()
 
     if bigquery_delete_before_write == "true":
@@ -106,14 +87,76 @@ def load(bucket: str, word_frequencies_key: str) -> None:
         logger.info(f"Skipping delete of {timestamp} from {bigquery_table_id}")
 
     insert_data_into_bigquery_table(table_id=bigquery_table_id, data=records_to_load_dicts)
+    return filtered_word_frequencies
+
+
+def update_word_sketches(
+    bucket: str,
+    timestamp: datetime,
+    loaded_word_frequencies: list[WordFrequencyT],
+    tenant: Tenant | None = None,
+) -> None:
+    """
+    Update the hour, day and month sketches with the word frequencies as loaded, i.e. as returned by
+    load_word_frequencies after applying the filters, if WORD_SKETCHES_S3_PREFIX (or the prefix of the tenant)
+    is set, under the name of a tenant without a prefix. Failures are logged, as the words are loaded.
+    """
+
+    word_sketches_s3_prefix = get_word_sketches_s3_prefix(tenant)
+    if not word_sketches_s3_prefix:
+        return
+
+    try:
+        with span("word_sketches"):
+            put_word_sketches(
+                bucket=bucket,
+                prefix=word_sketches_s3_prefix,
+                timestamp=timestamp,
+                word_frequencies=loaded_word_frequencies,
+            )
+    except Exception as e:
+        logger.error(f"Failed to update the word sketches of {timestamp}: {type(e).__name__}: {e}")
+
+
+@emit_metrics(stage="load")
+@profiled(stage="load", get_location=lambda bucket, key: (bucket, key))
+def load(bucket: str, word_frequencies_key: str) -> None:
+    """
+    Load word frequencies from S3 and insert them into BigQuery after applying filters,
+    into the table of the tenant if configured.
+    """
+
+    tenant = resolve_tenant(bucket=bucket, key=word_frequencies_key, stage="load")
+    logger.info(
+        f"Loading word frequencies from {bucket}/{word_frequencies_key}" + (f" for {tenant.name}" if tenant else "")
+    )
+    timestamp = get_datetime_from_s3_key(word_frequencies_key)
+    # Rows that would be filtered out before loading are not decoded
+    excluded_words = load_excluded_words(excluded_words_txt_path) if excluded_words_txt_path else set()
+    word_frequencies: list[WordFrequencyRecord] = get_objects_from_s3(
+        bucket=bucket,
+        key=word_frequencies_key,
+        cls=WordFrequencyRecord,
+        filters=build_word_frequency_filter(excluded_words),
+    )
+    loaded_word_frequencies = load_word_frequencies(
+        word_frequencies=word_frequencies,
+        timestamp=timestamp,
+        bigquery_table_id=tenant.bigquery_table_id if tenant else None,
+        excluded_words=excluded_words,
+    )
+    update_word_sketches(
+        bucket=bucket, timestamp=timestamp, loaded_word_frequencies=loaded_word_frequencies, tenant=tenant
+    )
 
 
 # Lambda handler
 
 
-def lambda_handler(event: S3Event, context: Context) -> None:
-    bucket, key = extract_s3_bucket_and_key_from_event(event)
-    load(bucket, key)
+def lambda_handler(event: S3Event, context: Context) -> dict | None:
+    # Invoked with batches of events from the intake queue, or with a single event
+    with profile_requested_by(event):
+        return process_s3_object_events(event, load)  # type: ignore[arg-type]
 
 
 if is_local and not is_pytest and __name__ == "__main__":
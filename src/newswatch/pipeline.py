@@ -0,0 +1,117 @@
+"""
+Run extract, transform and load in a single process, passing data between the stages in memory.
+"""
+
+import os
+import sys
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from aws_lambda_typing.events import EventBridgeEvent
+from aws_lambda_typing.context import Context
+
+from common.metrics import emit_metrics
+from common.models import Headline
+from common.ngrams import get_ngram_sizes
+from common.records import WordFrequencyRecord
+from common.token_cache import TokenCountCache
+from common.utils import get_current_timestamp, get_datetime_from_s3_key, get_logger
+from extract import (
+    extract_all_headlines,
+    extract_shard,
+    get_extract_s3_location,
+    get_site_health,
+    put_headlines_to_s3,
+    put_site_health,
+)
+from load import load_word_frequencies, update_word_sketches
+from transform import (
+    detect_bursts,
+    ensure_wordnet_corpus,
+    get_token_count_cache,
+    put_token_count_cache,
+    transform_headlines,
+    transform_phrases,
+    write_phrase_frequencies,
+    write_word_frequencies,
+)
+
+logger = get_logger()
+
+is_local = os.environ.get("AWS_EXECUTION_ENV") is None
+is_pytest = "pytest" in sys.modules
+
+
+@emit_metrics(stage="pipeline")
+def run_pipeline() -> None:
+    """
+    Extract, transform and load headlines without waiting for S3 between the stages.
+
+    The intermediate objects are still written to S3 in the background, so that they can be
+    used for lineage and replayed by the separate stages, e.g. when backfilling.
+    Note: the S3 event rules triggering the separate stages must be disabled in this mode.
+    """
+
+    timestamp_at_start = get_current_timestamp()
+    logger.info(f"Running the fused pipeline at {timestamp_at_start}")
+
+    bucket, extract_object_key = get_extract_s3_location(timestamp=timestamp_at_start)
+    # The transform and load stages use the hourly timestamp encoded in the extract object key
+    extraction_timestamp = get_datetime_from_s3_key(extract_object_key)
+
+    # A single writer thread keeps the uploads in order while the next stage is running
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="s3-writer") as s3_writer:
+        # Only fetched at the first invocation of the container, if the lemmatiser needs it
+        corpus_future: Future = s3_writer.submit(ensure_wordnet_corpus, bucket)
+        token_count_cache_future: Future = s3_writer.submit(get_token_count_cache, bucket)
+
+        site_health = get_site_health(bucket=bucket)
+        headlines: list[Headline] = extract_all_headlines(
+            timestamp=timestamp_at_start,
+            bucket=bucket,
+            site_health=site_health,
+        )
+        uploads: list[Future] = [s3_writer.submit(put_site_health, bucket, site_health)]
+        uploads.append(s3_writer.submit(put_headlines_to_s3, bucket, extract_object_key, headlines))
+
+        corpus_future.result()
+        token_count_cache: TokenCountCache = token_count_cache_future.result()
+        word_frequencies: list[WordFrequencyRecord] = transform_headlines(
+            headlines=headlines,
+            timestamp=extraction_timestamp,
+            token_count_cache=token_count_cache,
+        )
+        uploads.append(s3_writer.submit(write_word_frequencies, bucket, extraction_timestamp, word_frequencies))
+        uploads.append(s3_writer.submit(detect_bursts, bucket, extraction_timestamp, word_frequencies))
+        if ngram_sizes := get_ngram_sizes():
+            phrase_frequencies = transform_phrases(
+                headlines=headlines,
+                timestamp=extraction_timestamp,
+                ngram_sizes=ngram_sizes,
+                token_count_cache=token_count_cache,
+            )
+            uploads.append(s3_writer.submit(write_phrase_frequencies, bucket, extraction_timestamp, phrase_frequencies))
+        uploads.append(s3_writer.submit(put_token_count_cache, bucket, token_count_cache))
+
+        loaded_word_frequencies = load_word_frequencies(
+            word_frequencies=word_frequencies, timestamp=extraction_timestamp
+        )
+        uploads.append(s3_writer.submit(update_word_sketches, bucket, extraction_timestamp, loaded_word_frequencies))
+
+        # Lambda may freeze the container after returning, so the uploads must finish before that
+        for upload in uploads:
+            upload.result()
+
+
+# Lambda handler
+
+
+def lambda_handler(event: EventBridgeEvent, context: Context) -> dict | None:
+    # Invoked by the pipeline with the shard to extract if EXTRACT_SHARDS is more than 1
+    if event and "shard" in event:
+        return extract_shard(event["shard"])  # type: ignore[typeddict-item]
+    run_pipeline()
+    return None
+
+
+if is_local and not is_pytest and __name__ == "__main__":
+    run_pipeline()
@@ -6,20 +6,25 @@ import os
 import re
 import sys
 from collections import Counter
+from collections.abc import Mapping, Sequence
 from datetime import datetime
 
-import nltk
-from textblob import Word
+from botocore.exceptions import ClientError
 from aws_lambda_typing.events import S3Event
 from aws_lambda_typing.context import Context
 
-from common.models import Headline, WordFrequency
+from common.bursts import BurstDetector, get_burst_settings, update_burst_detector
+from common.fingerprints import fingerprint_headline
+from common.intake import process_s3_object_events
+from common.lemmatisers import get_lemmatiser
+from common.metrics import emit_metrics, span
+from common.models import Burst, Tenant
+from common.ngrams import get_ngram_sizes, iterate_ngrams
+from common.profiling import profile_requested_by, profiled
+from common.records import HeadlineLike, HeadlineRecord, WordFrequencyLike, WordFrequencyRecord
 from common.utils import (
     build_s3_key,
-    convert_objects_to_parquet_bytes,
-    convert_parquet_bytes_to_objects,
     download_from_s3,
-    extract_s3_bucket_and_key_from_event,
     get_datetime_from_s3_key,
     get_from_s3,
     get_logger,
@@ -27,6 +32,18 @@ from common.utils import (
     put_to_s3,
     upload_to_s3,
 )
+from common.s3_io import get_objects_from_s3, put_objects_to_s3
+from common.sketches import DEFAULT_HEAVY_HITTERS_CAPACITY, SpaceSaving
+from common.storage import NoSuchKeyError
+from common.tenants import (
+    get_burst_state_s3_key,
+    get_bursts_s3_prefix,
+    get_filtered_transform_s3_prefix,
+    get_phrase_transform_s3_prefix,
+    resolve_tenant,
+)
+from common.token_cache import DEFAULT_MAX_ENTRIES, TokenCountCache
+from common.word_filters import filter_word_frequencies, load_excluded_words
 
 logger = get_logger()
 
@@ -35,10 +52,23 @@ is_pytest = "pytest" in sys.modules
 
 WRITABLE_PATH = "/tmp"
 
+PREFILTER_MODES = ("none", "inline", "separate")
+
+excluded_words_txt_path = os.environ.get("EXCLUDED_WORDS_TXT_PATH", "./resources/excluded-words.txt")
+
+# Loaded once per container from TOKEN_CACHE_S3_KEY or TOKEN_CACHE_PATH, if set
+_token_count_cache: TokenCountCache | None = None
+
+# Set once the WordNet corpus is available in the container, shared by the invocations of all tenants
+_wordnet_corpus_ready = False
+
 
 def get_wordnet_corpus(bucket: str) -> None:
     """Download or update the WordNet corpus from S3 if outdated."""
 
+    # Only the textblob lemmatiser needs NLTK, which is slow to import
+    import nltk
+
     wordnet_file_path = f"{WRITABLE_PATH}/corpora/wordnet.zip"
     wordnet_s3_key = "nltk/corpora/wordnet.zip"
 
@@ -46,7 +76,8 @@ def get_wordnet_corpus(bucket: str) -> None:
     max_wordnet_age_days = 7
 
     if wordnet_age_days is None or wordnet_age_days > max_wordnet_age_days:
-        nltk.download("wordnet", download_dir=WRITABLE_PATH)
+        with span("wordnet_download"):
+            nltk.download("wordnet", download_dir=WRITABLE_PATH)
         upload_to_s3(bucket=bucket, key=wordnet_s3_key, filename=f"{wordnet_file_path}")
     else:
         download_from_s3(bucket=bucket, key=wordnet_s3_key, filename=wordnet_file_path)
@@ -54,23 +85,113 @@ def get_wordnet_corpus(bucket: str) -> None:
     nltk.data.path.append(WRITABLE_PATH)
 
 
+def ensure_wordnet_corpus(bucket: str) -> None:
+    """
+    Get the WordNet corpus at the first invocation of the container and keep using it in warm invocations.
+    Lemmatisers that don't need the corpus skip it.
+    """
+
+    global _wordnet_corpus_ready
+    if not _wordnet_corpus_ready and get_lemmatiser().requires_wordnet_corpus:
+        get_wordnet_corpus(bucket)
+        _wordnet_corpus_ready = True
+
+
+def get_token_count_cache(bucket: str) -> TokenCountCache:
+    """
+    Return the token count cache of the container, loading it at cold start from S3 if TOKEN_CACHE_S3_KEY
+    is set, or from a local file if TOKEN_CACHE_PATH is set.
+    """
+
+    global _token_count_cache
+    if _token_count_cache is not None:
+        _token_count_cache.reset_stats()
+        return _token_count_cache
+
+    max_entries = int(os.environ.get("TOKEN_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES))
+    lemmatiser_name = get_lemmatiser().name
+    token_cache_s3_key = os.environ.get("TOKEN_CACHE_S3_KEY", "")
+    token_cache_path = os.environ.get("TOKEN_CACHE_PATH", "")
+    cache_bytes: bytes | None = None
+    if token_cache_s3_key:
+        try:
+            cache_bytes = get_from_s3(bucket_name=bucket, key=token_cache_s3_key)
+        except (NoSuchKeyError, ClientError):
+            logger.info(f"No token count cache found at {bucket}/{token_cache_s3_key}")
+    elif token_cache_path and os.path.exists(token_cache_path):
+        with open(token_cache_path, "rb") as cache_file:
+            cache_bytes = cache_file.read()
+
+    if cache_bytes is None:
+        _token_count_cache = TokenCountCache(max_entries=max_entries, lemmatiser=lemmatiser_name)
+    else:
+        _token_count_cache = TokenCountCache.from_bytes(
+            cache_bytes, max_entries=max_entries, lemmatiser=lemmatiser_name
+        )
+        logger.info(f"Loaded token count cache with {len(_token_count_cache)} headlines")
+    return _token_count_cache
+
+
+def put_token_count_cache(bucket: str, token_count_cache: TokenCountCache) -> None:
+    """Report the hit rate of the cache and save it if it has changed and a backing file is set."""
+
+    logger.info(
+        f"Token count cache: {token_count_cache.hits} hits, {token_count_cache.misses} misses "
+        f"({token_count_cache.hit_rate:.0%} hit rate), saved ~{token_count_cache.estimated_saved_ms:.0f} ms",
+    )
+    if not token_count_cache.changed:
+        return
+
+    token_cache_s3_key = os.environ.get("TOKEN_CACHE_S3_KEY", "")
+    token_cache_path = os.environ.get("TOKEN_CACHE_PATH", "")
+    if token_cache_s3_key:
+        put_to_s3(bucket_name=bucket, key=token_cache_s3_key, data=token_count_cache.to_bytes())
+    elif token_cache_path:
+        with open(token_cache_path, "wb") as cache_file:
+            cache_file.write(token_count_cache.to_bytes())
+    else:
+        return
+    token_count_cache.changed = False
+
+
+def split_text_into_words(text: str) -> list[str]:
+    """Convert text to lowercase and split it into words at non-word characters."""
+    return re.sub(r"\W+", " ", text.lower()).split()
+
+
+def lemmatise_words_in_text(text: str) -> list[str]:
+    """Split text into words, lemmatised by the lemmatiser set by LEMMATISER, in their order in the text."""
+
+    lemmatiser = get_lemmatiser()
+    return [lemmatiser.lemmatise(word) for word in split_text_into_words(text)]
+
+
 def count_words_in_text(text: str) -> dict[str, int]:
-    """Count lemmatised words in a given text."""
+    """Count words in a given text, lemmatised by the lemmatiser set by LEMMATISER."""
+    return dict(Counter(lemmatise_words_in_text(text)))
 
-    def _clean_text(text: str) -> str:
-        """Convert text to lowercase and replace non-word characters with spaces."""
-        return re.sub(r"\W+", " ", text.lower())
 
-    headline_words = _clean_text(text).split()
-    lemmatised_headline_words = [Word(headline_word).lemmatize() for headline_word in headline_words]
+def get_headline_words(text: str, token_count_cache: TokenCountCache) -> list[str]:
+    """Return the lemmatised words of a headline, reusing the cached words of headlines seen before."""
+    return token_count_cache.get_or_compute(fingerprint_headline(text), lambda: lemmatise_words_in_text(text))
 
-    return dict(Counter(lemmatised_headline_words))
 
+def count_words_in_headlines(headlines: Sequence[HeadlineLike], token_count_cache: TokenCountCache) -> Counter:
+    """
+    Count lemmatised words headline by headline, reusing the cached words of headlines seen before.
+    Adding up the counts of each headline gives the same result as counting their combined text.
+    """
 
-def group_headlines_by_site(headlines: list[Headline]) -> dict[str, list[Headline]]:
+    word_counts: Counter = Counter()
+    for headline in headlines:
+        word_counts.update(get_headline_words(headline.headline, token_count_cache))
+    return word_counts
+
+
+def group_headlines_by_site(headlines: Sequence[HeadlineLike]) -> dict[str, list[HeadlineLike]]:
     """Group headlines by site name."""
 
-    grouped_headlines: dict[str, list[Headline]] = {}
+    grouped_headlines: dict[str, list[HeadlineLike]] = {}
     for headline in headlines:
         grouped_headlines.setdefault(headline.site_name, []).append(headline)
     return grouped_headlines
@@ -82,46 +203,60 @@ def calculate_word_frequencies(text: str) -> dict[str, float]:
     Note: multiplied by 100,000 for backward compatibility.
     """
 
+    return convert_word_counts_to_frequencies(count_words_in_text(text))
+
+
+def convert_word_counts_to_frequencies(
+    word_counts: Mapping[str, int], total_count: int | None = None
+) -> dict[str, float]:
+    """
+    Convert word counts into frequencies of the total count, the sum of the counts if not given.
+    Note: multiplied by 100,000 for backward compatibility.
+    """
+
     compatibility_multiplier = 100_000
-    word_counts = count_words_in_text(text)
-    total_count = sum(word_counts.values())
+    if total_count is None:
+        total_count = sum(word_counts.values())
     return {word: count * compatibility_multiplier / total_count for word, count in word_counts.items()}
 
 
 def calculate_word_frequencies_by_site(
-    headlines_grouped_by_site: dict[str, list[Headline]],
+    headlines_grouped_by_site: Mapping[str, Sequence[HeadlineLike]],
     timestamp: datetime,
-) -> dict[str, list[WordFrequency]]:
-    """Compute word frequencies for each site."""
+    token_count_cache: TokenCountCache | None = None,
+) -> dict[str, list[WordFrequencyRecord]]:
+    """
+    Compute word frequencies for each site.
+    Only headlines missing from the token count cache are tokenised and lemmatised.
+    """
 
-    word_frequencies_by_site: dict[str, list[WordFrequency]] = {}
+    if token_count_cache is None:
+        token_count_cache = TokenCountCache()
+    word_frequencies_by_site: dict[str, list[WordFrequencyRecord]] = {}
 
     for name, headlines in headlines_grouped_by_site.items():
-        combined_text = " ".join([headline.headline for headline in headlines])
-        word_frequencies = calculate_word_frequencies(combined_text)
-        word_frequencies_by_site[name] = []
-
-        for word, freq in word_frequencies.items():
-            word_frequencies_by_site[name].append(
-                WordFrequency(
-                    word=word,
-                    frequency=int(freq),
-                    timestamp=timestamp,
-                ),
-            )
+        with span("count_words", site=name) as count_span:
+            hits_before = token_count_cache.hits
+            word_counts = count_words_in_headlines(headlines=headlines, token_count_cache=token_count_cache)
+            word_frequencies = convert_word_counts_to_frequencies(word_counts)
+            count_span.add(rows=len(headlines), cache_hits=token_count_cache.hits - hits_before)
+        word_frequencies_by_site[name] = [
+            WordFrequencyRecord(word=word, frequency=int(freq), timestamp=timestamp)
+            for word, freq in word_frequencies.items()
+        ]
     return word_frequencies_by_site
 
 
 def filter_sites(
-    site_word_frequencies: dict[str, list[WordFrequency]],
+    site_word_frequencies: Mapping[str, Sequence[WordFrequencyLike]],
     word_count_threshold: int,
-) -> dict[str, list[WordFrequency]]:
+) -> dict[str, Sequence[WordFrequencyLike]]:
     """Return sites that have more than word_count_threshold words."""
 
     return {site: freqs for site, freqs in site_word_frequencies.items() if len(freqs) >= word_count_threshold}
 
 
-def sum_frequencies(sites: dict[str, list[WordFrequency]]) -> Counter:
+def sum_frequencies(sites: Mapping[str, Sequence[WordFrequencyLike]]) -> Counter:
     """Aggregate word frequencies across all sites."""
 
     total_counter: Counter = Counter()
@@ -131,9 +266,9 @@ def sum_frequencies(sites: dict[str, list[WordFrequency]]) -> Counter:
 
 
 def merge_site_word_frequencies(
-    site_word_frequencies: dict[str, list[WordFrequency]],
+    site_word_frequencies: Mapping[str, Sequence[WordFrequencyLike]],
     word_count_threshold: int = 0,
-) -> list[WordFrequency]:
+) -> list[WordFrequencyRecord]:
     """Merge word frequencies across sites and get the average of each word frequency."""
 
     filtered_sites = filter_sites(site_word_frequencies, word_count_threshold)
@@ -145,14 +280,50 @@ def merge_site_word_frequencies(
     total_frequencies = sum_frequencies(filtered_sites)
 
     merged_frequencies = [
-        WordFrequency(word=word, frequency=total // site_count, timestamp=timestamp)
+        WordFrequencyRecord(word=word, frequency=total // site_count, timestamp=timestamp)
         for word, total in total_frequencies.items()
     ]
 
     return sorted(merged_frequencies, key=lambda wf: wf.frequency, reverse=True)
 
 
-def transform(bucket: str, site_headline_list_s3_key: str) -> None:
+def get_prefilter_mode() -> str:
+    """
+    Return how the load filters should be applied in the transform stage:
+    - none: write unfiltered word frequencies only (default)
+    - inline: write filtered word frequencies instead of the unfiltered ones
+    - separate: write unfiltered word frequencies and a second, filtered object
+    """
+
+    prefilter_mode = os.environ.get("TRANSFORM_PREFILTER", "none").lower()
+    if prefilter_mode not in PREFILTER_MODES:
+        raise ValueError(f"Invalid TRANSFORM_PREFILTER: {prefilter_mode}, expected one of {PREFILTER_MODES}")
+    return prefilter_mode
+
+
+def prefilter_word_frequencies(word_frequencies: list[WordFrequencyRecord]) -> list[WordFrequencyRecord]:
+    """Apply the same filters as the load stage so that fewer rows are stored and downloaded."""
+
+    excluded_words = load_excluded_words(excluded_words_txt_path) if excluded_words_txt_path else set()
+    filtered_word_frequencies = filter_word_frequencies(word_frequencies, excluded_words)
+    logger.info(f"Prefiltered word frequencies: kept {len(filtered_word_frequencies)} of {len(word_frequencies)}")
+    return filtered_word_frequencies
+
+
+def put_word_frequencies_to_s3(bucket: str, key: str, word_frequencies: list[WordFrequencyRecord]) -> None:
+    """Upload word frequencies to S3 in parquet format."""
+
+    s3_response = put_objects_to_s3(bucket=bucket, key=key, objects=word_frequencies)
+
+    if s3_response.get("ResponseMetadata", {}).get("HTTPStatusCode") == 200:
+        logger.info(f"Uploaded word counts to S3: {bucket}/{key}")
+
+
+def transform_headlines(
+    headlines: Sequence[HeadlineLike],
+    timestamp: datetime,
+    token_count_cache: TokenCountCache | None = None,
+) -> list[WordFrequencyRecord]:
     """
     Transforms headline data into aggregated word frequency data.
 
@@ -160,59 +331,258 @@ def transform(bucket: str, site_headline_list_s3_key: str) -> None:
     1. Calculating word frequencies for each site separately.
     2. Averaging the word frequencies across all sites to prevent sites with longer front pages
     from disproportionately influencing the results.
-
-    The final transformed data is stored in S3 as a Parquet file.
     """
-    get_wordnet_corpus(bucket)
-    logger.info(f"Transforming headlines from {bucket}/{site_headline_list_s3_key}")
-    headline_parquet_bytes: bytes = get_from_s3(bucket_name=bucket, key=site_headline_list_s3_key)
-    headlines: list[Headline] = convert_parquet_bytes_to_objects(
-        parquet_bytes=headline_parquet_bytes,
-        cls=Headline,
-    )
 
     headlines_grouped_by_site = group_headlines_by_site(headlines)
 
     # Each record must include a timestamp due to the flat data structure.
     # This redundancy is acceptable since the dataset is small enough to fit in memory
     # and is efficiently stored in Parquet format in S3.
-    extraction_timestamp = get_datetime_from_s3_key(site_headline_list_s3_key)
     word_frequencies_by_site = calculate_word_frequencies_by_site(
         headlines_grouped_by_site=headlines_grouped_by_site,
-        timestamp=extraction_timestamp,
+        timestamp=timestamp,
+        token_count_cache=token_count_cache,
     )
 
     word_count_threshold = int(os.environ.get("TRANSFORM_WORD_COUNT_THRESHOLD", "0"))
-    word_frequencies = merge_site_word_frequencies(word_frequencies_by_site, word_count_threshold)
-    data_bytes = convert_objects_to_parquet_bytes(word_frequencies)
+    with span("merge_sites") as merge_span:
+        word_frequencies = merge_site_word_frequencies(word_frequencies_by_site, word_count_threshold)
+        merge_span.add(rows=len(word_frequencies))
+    return word_frequencies
+
+
+def count_phrases_in_headlines(
+    headlines: Sequence[HeadlineLike],
+    ngram_sizes: Sequence[int],
+    excluded_words: set[str],
+    max_entries: int,
+    token_count_cache: TokenCountCache,
+) -> tuple[SpaceSaving, int]:
+    """
+    Count the phrases of the headlines of a site in memory bounded by max_entries phrases, exactly
+    if the site has at most max_entries distinct phrases, and return them with the number of distinct words.
+    The words of the headlines counted by the word pass are reused from the token count cache.
+    """
+
+    phrase_counts = SpaceSaving(capacity=max_entries)
+    distinct_words: set[str] = set()
+    for headline in headlines:
+        text = headline.headline
+        # Only lemmatised again if evicted since the word pass, which counted the lookup already
+        words = token_count_cache.get(fingerprint_headline(text))
+        if words is None:
+            words = lemmatise_words_in_text(text)
+        distinct_words.update(words)
+        for phrase in iterate_ngrams(words, ngram_sizes, excluded_words):
+            phrase_counts.add(phrase)
+    return phrase_counts, len(distinct_words)
+
+
+def transform_phrases(
+    headlines: Sequence[HeadlineLike],
+    timestamp: datetime,
+    ngram_sizes: Sequence[int],
+    token_count_cache: TokenCountCache | None = None,
+) -> list[WordFrequencyRecord]:
+    """
+    Transform headline data into aggregated phrase frequencies, averaged across the same sites as the words.
+    Each site keeps only its TRANSFORM_NGRAMS_MAX_ENTRIES most frequent phrases, and the frequencies are
+    relative to all phrases of the site, so that they don't depend on how many phrases are kept.
+    The counts are exact below that, and never exceed the true counts above it.
+    """
+
+    if token_count_cache is None:
+        token_count_cache = TokenCountCache()
+    excluded_words = load_excluded_words(excluded_words_txt_path) if excluded_words_txt_path else set()
+    max_entries = int(os.environ.get("TRANSFORM_NGRAMS_MAX_ENTRIES", DEFAULT_HEAVY_HITTERS_CAPACITY))
+    word_count_threshold = int(os.environ.get("TRANSFORM_WORD_COUNT_THRESHOLD", "0"))
+    phrase_frequencies_by_site: dict[str, list[WordFrequencyRecord]] = {}
+
+    for name, site_headlines in group_headlines_by_site(headlines).items():
+        with span("count_phrases", site=name) as count_span:
+            phrase_counts, word_count = count_phrases_in_headlines(
+                site_headlines, ngram_sizes, excluded_words, max_entries, token_count_cache
+            )
+            count_span.add(rows=len(site_headlines), phrases=len(phrase_counts))
+        # Sites are filtered by their distinct words like in merge_site_word_frequencies
+        if word_count < word_count_threshold or not phrase_counts.total:
+            continue
+        if not phrase_counts.is_exact:
+            logger.info(
+                f"{name} has more than {max_entries} distinct phrases, the counts of the rarest are lower bounds"
+            )
+        phrase_frequencies = convert_word_counts_to_frequencies(phrase_counts.guaranteed_counts(), phrase_counts.total)
+        phrase_frequencies_by_site[name] = [
+            WordFrequencyRecord(word=phrase, frequency=int(freq), timestamp=timestamp)
+            for phrase, freq in phrase_frequencies.items()
+        ]
+
+    if not phrase_frequencies_by_site:
+        logger.info("No phrases found in the headlines")
+        return []
+    with span("merge_site_phrases") as merge_span:
+        merged_phrase_frequencies = merge_site_word_frequencies(phrase_frequencies_by_site)
+        merge_span.add(rows=len(merged_phrase_frequencies))
+    return merged_phrase_frequencies
+
+
+def write_word_frequencies(
+    bucket: str,
+    timestamp: datetime,
+    word_frequencies: list[WordFrequencyRecord],
+    tenant: Tenant | None = None,
+) -> None:
+    """
+    Store word frequencies in S3, prefiltered according to TRANSFORM_PREFILTER.
+    The prefixes of the tenant are used instead of the environment variables, if given,
+    and the filtered word frequencies of a tenant without a filtered prefix are written under its name.
+    """
+
+    prefilter_mode = get_prefilter_mode()
+    if prefilter_mode == "inline":
+        word_frequencies = prefilter_word_frequencies(word_frequencies)
 
     if (not is_local) or is_pytest:
-        transform_s3_prefix = os.environ.get("TRANSFORM_S3_PREFIX", "")
+        transform_s3_prefix = tenant.transform_s3_prefix if tenant else os.environ.get("TRANSFORM_S3_PREFIX", "")
         object_key = build_s3_key(
             prefix=transform_s3_prefix,
-            timestamp=get_datetime_from_s3_key(site_headline_list_s3_key),
+            timestamp=timestamp,
             extension="parquet",
         )
     else:
         bucket = os.environ.get("TEST_S3_BUCKET_NAME", bucket)
         object_key = os.environ.get("TEST_S3_TRANSFORM_KEY", "")
 
-    s3_response = put_to_s3(
-        bucket_name=bucket,
-        key=object_key,
-        data=data_bytes,
-    )
+    put_word_frequencies_to_s3(bucket=bucket, key=object_key, word_frequencies=word_frequencies)
 
-    if s3_response.get("ResponseMetadata", {}).get("HTTPStatusCode") == 200:
-        logger.info(f"Uploaded word counts to S3: {bucket}/{object_key}")
+    if prefilter_mode == "separate":
+        # The filtered prefix must not start with the transform prefix, otherwise it triggers the load twice
+        filtered_object_key = build_s3_key(
+            prefix=get_filtered_transform_s3_prefix(tenant),
+            timestamp=timestamp,
+            extension="parquet",
+        )
+        put_word_frequencies_to_s3(
+            bucket=bucket,
+            key=filtered_object_key,
+            word_frequencies=prefilter_word_frequencies(word_frequencies),
+        )
+
+
+def write_phrase_frequencies(
+    bucket: str,
+    timestamp: datetime,
+    phrase_frequencies: list[WordFrequencyRecord],
+    tenant: Tenant | None = None,
+) -> None:
+    """
+    Store phrase frequencies in S3 alongside the word frequencies, unless there are none, under the prefix
+    of the tenant if given. The prefix must not start with the transform prefix, otherwise the phrases
+    are loaded as words.
+    """
+
+    if not phrase_frequencies:
+        return
+
+    object_key = build_s3_key(prefix=get_phrase_transform_s3_prefix(tenant), timestamp=timestamp, extension="parquet")
+    put_word_frequencies_to_s3(bucket=bucket, key=object_key, word_frequencies=phrase_frequencies)
+
+
+def detect_bursts(
+    bucket: str,
+    timestamp: datetime,
+    word_frequencies: list[WordFrequencyRecord],
+    tenant: Tenant | None = None,
+) -> list[Burst]:
+    """
+    Update the moving averages of the word frequencies, after applying the load filters, and store the bursting
+    words of the hour in S3 ranked by z-score, if BURST_STATE_S3_KEY (or the state key of the tenant) is set.
+    Each tenant has its own state and bursts, under its name if their locations are not configured.
+    The state is read and saved by each invocation with a conditional put, so hours should be transformed in order.
+    """
+
+    burst_state_s3_key = get_burst_state_s3_key(tenant)
+    if not burst_state_s3_key:
+        return []
+
+    excluded_words = load_excluded_words(excluded_words_txt_path) if excluded_words_txt_path else set()
+    filtered_word_frequencies = filter_word_frequencies(word_frequencies, excluded_words)
+    bursts: list[Burst] = []
+
+    # Repeated if the state was saved concurrently. The bursts are written before the state is saved,
+    # so that the hour is detected again if writing them fails.
+    def detect(detector: BurstDetector) -> None:
+        nonlocal bursts
+        with span("detect_bursts") as burst_span:
+            bursts = detector.update(timestamp, filtered_word_frequencies)
+            burst_span.add(rows=len(bursts), words=len(detector))
+        if bursts:
+            bursts_key = build_s3_key(prefix=get_bursts_s3_prefix(tenant), timestamp=timestamp, extension="parquet")
+            put_objects_to_s3(bucket=bucket, key=bursts_key, objects=bursts)
+
+    update_burst_detector(bucket=bucket, key=burst_state_s3_key, update=detect, settings=get_burst_settings())
+    if bursts:
+        logger.info(f"Bursting words: {', '.join(burst.word for burst in bursts)}")
+    return bursts
+
+
+@emit_metrics(stage="transform")
+@profiled(stage="transform", get_location=lambda bucket, key: (bucket, key))
+def transform(bucket: str, site_headline_list_s3_key: str) -> None:
+    """
+    Transform headlines stored in S3 into word frequencies.
+    The final transformed data is stored in S3 as a Parquet file, under the prefix of the tenant if configured.
+    """
+    tenant = resolve_tenant(bucket=bucket, key=site_headline_list_s3_key, stage="transform")
+    ensure_wordnet_corpus(bucket)
+    logger.info(
+        f"Transforming headlines from {bucket}/{site_headline_list_s3_key}" + (f" for {tenant.name}" if tenant else "")
+    )
+    extraction_timestamp = get_datetime_from_s3_key(site_headline_list_s3_key)
+    # The word frequencies are timestamped by the key, so only the sites and the headlines are read
+    headlines: list[HeadlineLike] = get_objects_from_s3(
+        bucket=bucket,
+        key=site_headline_list_s3_key,
+        cls=HeadlineRecord,
+        columns=["site_name", "headline"],
+        defaults={"timestamp": extraction_timestamp},
+    )
+    token_count_cache = get_token_count_cache(bucket)
+    word_frequencies = transform_headlines(
+        headlines=headlines,
+        timestamp=extraction_timestamp,
+        token_count_cache=token_count_cache,
+    )
+    write_word_frequencies(
+        bucket=bucket,
+        timestamp=extraction_timestamp,
+        word_frequencies=word_frequencies,
+        tenant=tenant,
+    )
+    detect_bursts(bucket=bucket, timestamp=extraction_timestamp, word_frequencies=word_frequencies, tenant=tenant)
+    if ngram_sizes := get_ngram_sizes():
+        phrase_frequencies = transform_phrases(
+            headlines=headlines,
+            timestamp=extraction_timestamp,
+            ngram_sizes=ngram_sizes,
+            token_count_cache=token_count_cache,
+        )
+        write_phrase_frequencies(
+            bucket=bucket,
+            timestamp=extraction_timestamp,
+            phrase_frequencies=phrase_frequencies,
+            tenant=tenant,
+        )
+    put_token_count_cache(bucket=bucket, token_count_cache=token_count_cache)
 
 
 # Lambda handler
 
 
-def lambda_handler(event: S3Event, context: Context) -> None:
-    bucket, key = extract_s3_bucket_and_key_from_event(event)
-    transform(bucket, key)
+def lambda_handler(event: S3Event, context: Context) -> dict | None:
+    # Invoked with batches of events from the intake queue, or with a single event
+    with profile_requested_by(event):
+        return process_s3_object_events(event, transform)  # type: ignore[arg-type]
 
 
 if is_local and not is_pytest and __name__ == "__main__":
@@ -0,0 +1,282 @@
+from datetime import datetime, timedelta
+
+import pyarrow.parquet as pq
+import pytest
+
+from newswatch.common.bursts import (
+    BurstDetector,
+    BurstSettings,
+    OutOfOrderHourError,
+    decay_ewma,
+    get_burst_detector,
+    get_burst_settings,
+    update_burst_detector,
+    update_ewma,
+)
+from newswatch.common.models import Tenant
+from newswatch.common.records import WordFrequencyRecord
+from newswatch.common.utils import convert_objects_to_parquet_bytes
+from newswatch.transform import detect_bursts
+
+from backtest_bursts import run_backtest
+
+BUCKET = "test-bucket"
+START = datetime(2024, 1, 1)
+
+
+def build_word_frequencies(timestamp: datetime, frequencies: dict[str, int]) -> list[WordFrequencyRecord]:
+    return [
+        WordFrequencyRecord(word=word, frequency=frequency, timestamp=timestamp)
+        for word, frequency in frequencies.items()
+    ]
+
+
+def run_hours(detector: BurstDetector, hourly_frequencies: list[dict[str, int]]) -> list[list]:
+    return [
+        detector.update(
+            START + timedelta(hours=hour), build_word_frequencies(START + timedelta(hours=hour), frequencies)
+        )
+        for hour, frequencies in enumerate(hourly_frequencies)
+    ]
+
+
+def test_decay_ewma_matches_updates_with_zeros():
+    mean, variance = 500.0, 2500.0
+    alpha = BurstSettings(half_life_hours=6).alpha
+    expected_mean, expected_variance = mean, variance
+    for _ in range(10):
+        expected_mean, expected_variance = update_ewma(expected_mean, expected_variance, alpha, 0)
+
+    assert decay_ewma(mean, variance, alpha, 10) == pytest.approx((expected_mean, expected_variance))
+    assert decay_ewma(mean, variance, alpha, 0) == (mean, variance)
+
+
+def test_burst_detector_ranks_bursting_words():
+    detector = BurstDetector(BurstSettings(warmup_hours=3, min_std=10, z_threshold=4))
+    steady_hours = [{"weather": 100 + hour % 3 * 10, "budget": 200, "election": 50} for hour in range(6)]
+    burst_hours = [{"weather": 110, "budget": 200, "election": 900, "earthquake": 600}]
+
+    bursts_by_hour = run_hours(detector, steady_hours + burst_hours)
+
+    assert all(not bursts for bursts in bursts_by_hour[:-1])
+    bursts = bursts_by_hour[-1]
+    assert [(burst.rank, burst.word) for burst in bursts] == [(1, "election"), (2, "earthquake")]
+    assert bursts[0].frequency == 900
+    assert bursts[0].expected_frequency == pytest.approx(50)
+    assert bursts[0].z_score > bursts[1].z_score >= 4
+    assert bursts[0].timestamp == START + timedelta(hours=6)
+
+
+def test_burst_detector_warms_up_and_limits_the_bursts():
+    detector = BurstDetector(BurstSettings(warmup_hours=1, min_std=10, top_n=1))
+
+    bursts_by_hour = run_hours(detector, [{"budget": 900}, {"budget": 100, "election": 900, "storm": 800}])
+
+    # Every word is new in the first hour
+    assert bursts_by_hour[0] == []
+    assert [burst.word for burst in bursts_by_hour[1]] == ["election"]
+
+
+def test_burst_detector_decays_missing_words():
+    settings = BurstSettings(warmup_hours=0, min_std=10, half_life_hours=1)
+    detector = BurstDetector(settings)
+    run_hours(detector, [{"storm": 1000}] + [{"other": 100}] * 20)
+
+    # The word has faded out while it was missing, so its return is a burst
+    (burst,) = [
+        burst
+        for burst in detector.update(
+            START + timedelta(hours=30), build_word_frequencies(START, {"storm": 1000, "other": 100})
+        )
+    ]
+    assert burst.word == "storm"
+    assert burst.expected_frequency < 1
+
+
+def test_burst_detector_counts_processed_hours():
+    detector = BurstDetector(BurstSettings(warmup_hours=0, min_std=10))
+    detector.update(START, build_word_frequencies(START, {"budget": 200}))
+    # Hours that were not extracted are not counted as zeros
+    detector.update(START + timedelta(days=7), build_word_frequencies(START, {"budget": 200}))
+
+    assert detector.hours_processed == 2
+    assert detector.words["budget"][2] == 1
+
+
+def test_burst_detector_skips_the_processed_hour():
+    detector = BurstDetector(BurstSettings(warmup_hours=0))
+    detector.update(START + timedelta(hours=1), build_word_frequencies(START, {"budget": 200}))
+    state = detector.to_bytes()
+
+    assert detector.update(START + timedelta(hours=1), build_word_frequencies(START, {"election": 900})) == []
+    assert detector.to_bytes() == state
+
+
+def test_burst_detector_rejects_earlier_hours():
+    detector = BurstDetector(BurstSettings(warmup_hours=0))
+    detector.update(START + timedelta(hours=1), build_word_frequencies(START, {"budget": 200}))
+    state = detector.to_bytes()
+
+    with pytest.raises(OutOfOrderHourError):
+        detector.update(START, build_word_frequencies(START, {"election": 900}))
+    assert detector.to_bytes() == state
+
+
+def test_burst_detector_prune():
+    detector = BurstDetector(BurstSettings(state_ttl_hours=2))
+    run_hours(detector, [{"storm": 100, "budget": 100}, {"budget": 100}, {"budget": 100}, {"budget": 100}])
+
+    assert detector.prune() == 1
+    assert set(detector.words) == {"budget"}
+
+
+def test_burst_detector_to_and_from_bytes():
+    detector = BurstDetector()
+    run_hours(detector, [{"budget": 100, "election": 50}, {"budget": 120}])
+
+    restored = BurstDetector.from_bytes(detector.to_bytes(), settings=BurstSettings(z_threshold=2))
+
+    assert restored.settings.z_threshold == 2
+    assert (restored.hours_processed, restored.last_hour) == (detector.hours_processed, detector.last_hour)
+    assert restored.words.keys() == detector.words.keys()
+    assert restored.words["budget"][0] == pytest.approx(detector.words["budget"][0], abs=0.001)
+
+
+def test_burst_detector_from_bytes_unsupported_format():
+    import gzip
+
+    detector = BurstDetector.from_bytes(gzip.compress(b'{"format_version": 0, "words": {"budget": [1, 1, 1]}}'))
+    assert len(detector) == 0
+
+
+def test_get_burst_settings(monkeypatch):
+    monkeypatch.setenv("BURST_HALF_LIFE_HOURS", "24")
+    monkeypatch.setenv("BURST_TOP_N", "5")
+    monkeypatch.delenv("BURST_Z_THRESHOLD", raising=False)
+
+    settings = get_burst_settings()
+
+    assert (settings.half_life_hours, settings.top_n, settings.z_threshold) == (24, 5, 4)
+    assert settings.alpha == pytest.approx(1 - 0.5 ** (1 / 24))
+
+
+def test_get_and_update_burst_detector(monkeypatch, tmp_path):
+    monkeypatch.setenv("STORAGE_BACKEND", "local")
+    monkeypatch.setenv("STORAGE_LOCAL_ROOT", str(tmp_path))
+    assert len(get_burst_detector(BUCKET, "state/burst-state.json.gz")) == 0
+
+    detector = update_burst_detector(
+        BUCKET, "state/burst-state.json.gz", lambda detector: run_hours(detector, [{"budget": 100}])
+    )
+
+    assert detector.words.keys() == {"budget"}
+    assert get_burst_detector(BUCKET, "state/burst-state.json.gz").words.keys() == {"budget"}
+
+
+def test_update_burst_detector_keeps_a_concurrent_update(monkeypatch, tmp_path):
+    monkeypatch.setenv("STORAGE_BACKEND", "local")
+    monkeypatch.setenv("STORAGE_LOCAL_ROOT", str(tmp_path))
+    key = "state/burst-state.json.gz"
+    update_burst_detector(
+        BUCKET, key, lambda detector: detector.update(START, build_word_frequencies(START, {"budget": 100}))
+    )
+    next_hour, hour_after = START + timedelta(hours=1), START + timedelta(hours=2)
+    attempts = []
+
+    def update_next_hour(detector):
+        attempts.append(detector.last_hour)
+        if len(attempts) == 1:
+            # Another invocation saves the hour after while this one is updating
+            update_burst_detector(
+                BUCKET, key, lambda other: other.update(hour_after, build_word_frequencies(hour_after, {"storm": 50}))
+            )
+        detector.update(next_hour, build_word_frequencies(next_hour, {"election": 900}))
+
+    # The update is applied again to the state saved concurrently, where the hour is out of order
+    with pytest.raises(OutOfOrderHourError):
+        update_burst_detector(BUCKET, key, update_next_hour)
+
+    detector = get_burst_detector(BUCKET, key)
+    assert len(attempts) == 2
+    assert (detector.hours_processed, detector.words.keys()) == (2, {"budget", "storm"})
+
+
+def test_detect_bursts(monkeypatch, tmp_path):
+    monkeypatch.setenv("STORAGE_BACKEND", "local")
+    monkeypatch.setenv("STORAGE_LOCAL_ROOT", str(tmp_path))
+    monkeypatch.setenv("BURSTS_S3_PREFIX", "bursts")
+    monkeypatch.setenv("BURST_WARMUP_HOURS", "1")
+    monkeypatch.setenv("MIN_WORD_LENGTH", "3")
+    monkeypatch.setenv("MIN_FREQUENCY", "20")
+    excluded_words_txt = tmp_path / "excluded-words.txt"
+    excluded_words_txt.write_text("the\n")
+    monkeypatch.setattr("newswatch.transform.excluded_words_txt_path", str(excluded_words_txt))
+
+    monkeypatch.delenv("BURST_STATE_S3_KEY", raising=False)
+    assert detect_bursts(BUCKET, START, build_word_frequencies(START, {"election": 900})) == []
+    assert not (tmp_path / BUCKET).exists()
+
+    monkeypatch.setenv("BURST_STATE_S3_KEY", "state/burst-state.json.gz")
+    assert detect_bursts(BUCKET, START, build_word_frequencies(START, {"budget": 200})) == []
+    next_hour = START + timedelta(hours=1)
+    bursts = detect_bursts(
+        BUCKET, next_hour, build_word_frequencies(next_hour, {"budget": 200, "election": 900, "the": 9000})
+    )
+
+    assert [burst.word for burst in bursts] == ["election"]
+    rows = pq.read_table(
+        tmp_path / BUCKET / "bursts" / "year=2024" / "month=01" / "day=01" / "hour=01.parquet"
+    ).to_pylist()
+    assert [(row["word"], row["rank"]) for row in rows] == [("election", 1)]
+    assert not (tmp_path / BUCKET / "bursts" / "year=2024" / "month=01" / "day=01" / "hour=00.parquet").exists()
+    assert (tmp_path / BUCKET / "state" / "burst-state.json.gz").exists()
+
+
+def test_detect_bursts_of_tenants_sharing_a_bucket(monkeypatch, tmp_path):
+    monkeypatch.setenv("STORAGE_BACKEND", "local")
+    monkeypatch.setenv("STORAGE_LOCAL_ROOT", str(tmp_path))
+    monkeypatch.setenv("BURST_STATE_S3_KEY", "state/burst-state.json.gz")
+    monkeypatch.setenv("BURSTS_S3_PREFIX", "bursts")
+    monkeypatch.setenv("BURST_WARMUP_HOURS", "1")
+    monkeypatch.setenv("MIN_WORD_LENGTH", "3")
+    monkeypatch.setenv("MIN_FREQUENCY", "20")
+    monkeypatch.setattr("newswatch.transform.excluded_words_txt_path", "")
+    tenants = {
+        name: Tenant(
+            name=name,
+            extract_s3_prefix=f"headlines-{name}",
+            transform_s3_prefix=f"word-frequencies-{name}",
+            bigquery_table_id=f"project.dataset.{name}",
+        )
+        for name in ("uk", "us")
+    }
+    next_hour = START + timedelta(hours=1)
+
+    for name, word in [("uk", "election"), ("us", "primary")]:
+        assert detect_bursts(BUCKET, START, build_word_frequencies(START, {"budget": 200}), tenants[name]) == []
+        bursts = detect_bursts(
+            BUCKET, next_hour, build_word_frequencies(next_hour, {"budget": 200, word: 900}), tenants[name]
+        )
+        # The hours of one tenant are not skipped as already processed by the other
+        assert [burst.word for burst in bursts] == [word]
+        assert (tmp_path / BUCKET / name / "bursts" / "year=2024" / "month=01" / "day=01" / "hour=01.parquet").exists()
+
+    for name, word in [("uk", "election"), ("us", "primary")]:
+        detector = get_burst_detector(BUCKET, f"{name}/state/burst-state.json.gz")
+        assert (detector.hours_processed, detector.words.keys()) == (2, {"budget", word})
+
+
+def test_run_backtest(tmp_path, capsys):
+    paths = []
+    for hour in range(5):
+        timestamp = START + timedelta(hours=hour)
+        frequencies = {"budget": 200, "election": 900 if hour == 4 else 50, "the": 5000}
+        path = tmp_path / f"year=2024/month=01/day=01/hour={hour:02d}.parquet"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(convert_objects_to_parquet_bytes(build_word_frequencies(timestamp, frequencies)))
+        paths.append(str(path))
+
+    bursts = run_backtest(list(reversed(paths)), BurstSettings(warmup_hours=2, min_std=10), excluded_words={"the"})
+
+    assert [(burst.word, burst.timestamp) for burst in bursts] == [("election", START + timedelta(hours=4))]
+    assert "2024-01-01 04:00  election" in capsys.readouterr().out
@@ -133,7 +133,7 @@ mock_bigquery_client = MockBigQueryClient()
 @patch("newswatch.extract.get_current_timestamp", return_value=timestamp)
 @patch("newswatch.transform.WRITABLE_PATH", transform_writable_path)
 @patch("newswatch.load.load_excluded_words", return_value=excluded_words)
-@patch("common.utils._get_bq_client", return_value=mock_bigquery_client)
+@patch("common.bigquery._get_bq_client", return_value=mock_bigquery_client)
 def test_newswatch_e2e(*__args):
     # Setup
     mp = MonkeyPatch()
@@ -1,21 +1,33 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from unittest.mock import patch
 
+import boto3
+import moto
 import pytest
 from bs4 import BeautifulSoup
 from pydantic import ValidationError
 from requests.models import Response
 
 from newswatch.common.models import Filter, Headline, Site
+from newswatch.common.politeness import HostScheduler
+from newswatch.common.site_health import SiteHealth, SiteHealthState
+from newswatch.common.sites import FilterMatcher, SiteRegistry
 from newswatch.extract import (
     REQUEST_GET_TIMEOUT_SEC,
     REQUEST_HEADERS,
     extract_headline_strings,
+    extract_headlines_sharded,
     get_headlines,
+    get_shard_executor,
     load_sites_from_yaml,
+    scrape_site,
     scrape_url,
 )
 
+from common.storage import get_storage
+
 
 def test_load_sites_from_yaml(test_sites: list[Site]) -> None:
     expected_sites = test_sites
@@ -93,3 +105,143 @@ def test_get_headlines(test_sites: list[Site], test_timestamp: datetime):
         extracted_headlines_data = [site.model_dump() for site in extracted_headlines]
 
         assert extracted_headlines_data == expected_headlines_data
+
+
+@patch("newswatch.extract.time.sleep")
+def test_scrape_site_retries(mock_sleep, monkeypatch, test_sites: list[Site]):
+    monkeypatch.setenv("SCRAPE_MAX_RETRIES", "2")
+    site_health = SiteHealth(latencies_ms=[1000.0] * 10)
+    bs = BeautifulSoup("<h2>Hi</h2>", "html.parser")
+
+    with patch("newswatch.extract.scrape_url", side_effect=[None, bs]) as mock_scrape_url:
+        assert scrape_site(test_sites[0], site_health) is bs
+    assert mock_scrape_url.call_count == 2
+    assert mock_scrape_url.call_args.kwargs["timeout_sec"] == 3.0
+    assert mock_sleep.call_count == 1
+    assert len(site_health.latencies_ms) == 11
+
+
+@patch("newswatch.extract.time.sleep")
+def test_scrape_site_circuit_breaker(_mock_sleep, monkeypatch, test_sites: list[Site]):
+    monkeypatch.setenv("SCRAPE_MAX_RETRIES", "1")
+    monkeypatch.setenv("CIRCUIT_BREAKER_FAILURES", "2")
+    monkeypatch.setenv("CIRCUIT_BREAKER_COOLDOWN_SEC", "3600")
+    site_health = SiteHealth()
+
+    with patch("newswatch.extract.scrape_url", return_value=None) as mock_scrape_url:
+        for _ in range(3):
+            assert scrape_site(test_sites[0], site_health) is None
+    # Two runs with a retry each, then the site is skipped
+    assert mock_scrape_url.call_count == 4
+    assert site_health.is_open(now=site_health.open_until - 1)
+
+    # After the cooldown a single probe is made
+    site_health.open_until = 0
+    with patch("newswatch.extract.scrape_url", return_value=None) as mock_scrape_url:
+        assert scrape_site(test_sites[0], site_health) is None
+    assert mock_scrape_url.call_count == 1
+
+
+def test_get_headlines_skips_failed_sites(test_sites: list[Site], test_timestamp: datetime):
+    bs = BeautifulSoup("<p>Foo</p>", "html.parser")
+    with patch("newswatch.extract.scrape_site", side_effect=[None, bs]):
+        headlines = get_headlines(sites=test_sites[1:3], timestamp=test_timestamp, site_health=SiteHealthState())
+    assert [(headline.site_name, headline.headline) for headline in headlines] == [("site3", "Foo")]
+
+
+def scrape_test_site(site: Site, site_health: SiteHealth, host_scheduler=None) -> BeautifulSoup:
+    if site.name == "site3":
+        raise RuntimeError("site3 is down")
+    site_health.record_success(latency_ms=100)
+    return BeautifulSoup(f"<a href='hey'>{site.name} link</a><h2>{site.name} title</h2>", "html.parser")
+
+
+@moto.mock_aws
+def test_extract_headlines_sharded(monkeypatch, test_sites: list[Site], test_timestamp: datetime):
+    bucket = "test-bucket"
+    s3 = boto3.client("s3", region_name="us-east-1")
+    s3.create_bucket(Bucket=bucket)
+    monkeypatch.setenv("S3_BUCKET_NAME", bucket)
+    monkeypatch.setenv("EXTRACT_SHARDING", "cost")
+    monkeypatch.setattr("newswatch.extract.get_site_registry", lambda yaml_path: SiteRegistry(sites=test_sites))
+    monkeypatch.setattr("newswatch.extract.get_shard_executor", lambda shard_count: ThreadPoolExecutor(shard_count))
+    monkeypatch.setattr("newswatch.extract.scrape_site", scrape_test_site)
+    site_health = SiteHealthState()
+
+    headlines = extract_headlines_sharded(
+        timestamp=test_timestamp,
+        bucket=bucket,
+        shard_count=len(test_sites),
+        site_health=site_health,
+    )
+
+    # Each site has its own shard, the shard of site3 fails and the others are merged in the order of the sites
+    assert [(headline.site_name, headline.headline) for headline in headlines] == [
+        ("site1", "site1 link"),
+        ("site4", "site4 title"),
+    ]
+    assert all(headline.timestamp == test_timestamp for headline in headlines)
+    assert site_health.get("site1").latencies_ms == [100.0]
+    # The partial results are deleted after merging
+    assert "Contents" not in s3.list_objects_v2(Bucket=bucket)
+
+
+def test_extract_headlines_sharded_locally_in_memory(monkeypatch, test_sites: list[Site], test_timestamp: datetime):
+    monkeypatch.setenv("STORAGE_BACKEND", "memory")
+    monkeypatch.setenv("S3_BUCKET_NAME", "test-bucket")
+    monkeypatch.setattr("newswatch.extract.is_local", True)
+    monkeypatch.setattr("newswatch.extract.get_site_registry", lambda yaml_path: SiteRegistry(sites=test_sites))
+    monkeypatch.setattr("newswatch.extract.scrape_site", scrape_test_site)
+
+    # The partial results of the shards must be written to the memory of this process
+    assert isinstance(get_shard_executor(len(test_sites)), ThreadPoolExecutor)
+    headlines = extract_headlines_sharded(
+        timestamp=test_timestamp, bucket="test-bucket", shard_count=len(test_sites), site_health=SiteHealthState()
+    )
+
+    assert [headline.site_name for headline in headlines] == ["site1", "site4"]
+    assert get_storage().list_keys("test-bucket", "") == []
+
+
+@patch("requests.get")
+def test_scrape_url_throttled(mock_get) -> None:
+    test_url = "http://test123abcxyz.io"
+    mock_response = Response()
+    mock_response.status_code = 429
+    mock_response.headers["Retry-After"] = "120"
+    mock_response._content = b"Too Many Requests"
+    mock_get.return_value = mock_response
+    host_scheduler = HostScheduler(clock=lambda: 1000.0)
+
+    assert scrape_url(url=test_url, host_scheduler=host_scheduler) is None
+    assert host_scheduler.hosts["test123abcxyz.io"].blocked_until == 1120.0
+
+
+def test_scrape_site_rate_limited(test_sites: list[Site]):
+    host_scheduler = HostScheduler(max_wait_sec=10, clock=lambda: 0.0)
+    host_scheduler.defer(str(test_sites[0].url), 60)
+    site_health = SiteHealth()
+
+    with patch("newswatch.extract.scrape_url") as mock_scrape_url:
+        assert scrape_site(test_sites[0], site_health, host_scheduler) is None
+    mock_scrape_url.assert_not_called()
+    assert site_health.consecutive_failures == 1
+
+
+def test_get_headlines_concurrently(monkeypatch, test_sites: list[Site], test_timestamp: datetime):
+    monkeypatch.setenv("SCRAPE_CONCURRENCY", "4")
+
+    def scrape_slow_site(site: Site, site_health: SiteHealth, host_scheduler=None) -> BeautifulSoup:
+        time.sleep(0.01 * (len(test_sites) - int(site.name[-1])))
+        return BeautifulSoup(f"<p>{site.name}</p>", "html.parser")
+
+    monkeypatch.setattr("newswatch.extract.scrape_site", scrape_slow_site)
+    headlines = get_headlines(
+        sites=test_sites,
+        timestamp=test_timestamp,
+        matchers={site.name: [FilterMatcher(name="p", attrs=None)] for site in test_sites},
+        host_scheduler=HostScheduler(),
+    )
+
+    # The slowest site is the first one, but the headlines are still in the order of the sites
+    assert [headline.headline for headline in headlines] == [site.name for site in test_sites]
@@ -0,0 +1,7 @@
+from newswatch.common.fingerprints import fingerprint_headline
+
+
+def test_fingerprint_headline():
+    assert fingerprint_headline("Go go go") == fingerprint_headline("Go go go")
+    assert fingerprint_headline("Go go go") != fingerprint_headline("Go go go!")
+    assert len(fingerprint_headline("Go go go")) == 16
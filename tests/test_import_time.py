@@ -0,0 +1,50 @@
+import pytest
+
+from import_time_report import get_handler_imports, measure_handler_import, parse_importtime_output
+
+# Generous budgets in milliseconds that catch accidentally importing heavy libraries, not small regressions
+IMPORT_TIME_BUDGETS_MS = {
+    "extract": 1500,
+    "transform": 2500,
+    "load": 2500,
+    "pipeline": 4000,
+}
+
+# Libraries a handler's stage does not need
+FORBIDDEN_IMPORTS = {
+    "extract": {"google.cloud.bigquery", "google.oauth2", "nltk", "textblob"},
+    "transform": {"google.cloud.bigquery", "google.oauth2", "bs4", "requests"},
+    "load": {"nltk", "textblob", "bs4", "yaml"},
+    "pipeline": set(),
+}
+
+
+def test_parse_importtime_output():
+    stderr = "\n".join(
+        [
+            "import time: self [us] | cumulative | imported package",
+            "import time:       100 |        100 | site",
+            "import time:        20 |         20 |     json.decoder",
+            "import time:        30 |         50 |   json",
+            "import time:        10 |         60 | handler",
+        ],
+    )
+
+    import_times = parse_importtime_output(stderr)
+
+    assert [(it.module, it.self_us, it.cumulative_us, it.depth) for it in import_times] == [
+        ("site", 100, 100, 0),
+        ("json.decoder", 20, 20, 2),
+        ("json", 30, 50, 1),
+        ("handler", 10, 60, 0),
+    ]
+    assert [it.module for it in get_handler_imports(import_times, "handler")] == ["json.decoder", "json", "handler"]
+
+
+@pytest.mark.parametrize("handler", IMPORT_TIME_BUDGETS_MS.keys())
+def test_handler_import_time(handler):
+    handler_imports = get_handler_imports(measure_handler_import(handler), handler)
+    imported_modules = {it.module for it in handler_imports}
+
+    assert not FORBIDDEN_IMPORTS[handler] & imported_modules
+    assert handler_imports[-1].cumulative_us / 1000 < IMPORT_TIME_BUDGETS_MS[handler]
@@ -0,0 +1,86 @@
+import pytest
+
+from newswatch.common.intake import (
+    batch_event_stream,
+    build_object_created_event,
+    build_sqs_event,
+    coalesce_s3_object_events,
+    process_s3_object_events,
+)
+
+BUCKET = "test-bucket"
+
+
+def test_coalesce_single_event():
+    s3_objects = coalesce_s3_object_events(build_object_created_event(BUCKET, "headlines/a.parquet"))
+
+    assert [(s3_object.bucket, s3_object.key, s3_object.message_ids) for s3_object in s3_objects] == [
+        (BUCKET, "headlines/a.parquet", [])
+    ]
+
+
+def test_coalesce_drops_duplicate_keys():
+    event = build_sqs_event(
+        build_object_created_event(BUCKET, key) for key in ["b.parquet", "a.parquet", "b.parquet", "b.parquet"]
+    )
+
+    s3_objects = coalesce_s3_object_events(event)
+
+    assert [s3_object.key for s3_object in s3_objects] == ["b.parquet", "a.parquet"]
+    message_ids = [record["messageId"] for record in event["Records"]]
+    assert s3_objects[0].message_ids == [message_ids[0], message_ids[2], message_ids[3]]
+    assert s3_objects[1].message_ids == [message_ids[1]]
+
+
+def test_process_reports_failed_messages_of_a_batch():
+    event = build_sqs_event(build_object_created_event(BUCKET, key) for key in ["a", "bad", "b", "bad"])
+    processed = []
+
+    def _process(bucket: str, key: str) -> None:
+        if key == "bad":
+            raise ValueError("Unreadable object")
+        processed.append(key)
+
+    response = process_s3_object_events(event, _process)
+
+    assert processed == ["a", "b"]
+    assert response == {
+        "batchItemFailures": [
+            {"itemIdentifier": event["Records"][1]["messageId"]},
+            {"itemIdentifier": event["Records"][3]["messageId"]},
+        ]
+    }
+
+
+def test_process_raises_for_a_single_event():
+    def _process(bucket: str, key: str) -> None:
+        raise ValueError("Unreadable object")
+
+    with pytest.raises(ValueError):
+        process_s3_object_events(build_object_created_event(BUCKET, "a"), _process)
+
+
+def test_batch_event_stream():
+    # A backfill of 25 hours within a few seconds, followed by the next hourly extraction
+    timed_events = [(i * 0.1, build_object_created_event(BUCKET, f"hour={i}")) for i in range(25)]
+    timed_events.append((3600.0, build_object_created_event(BUCKET, "hour=25")))
+
+    batches = batch_event_stream(timed_events, batch_size=10, batch_window_sec=60)
+
+    assert [len(batch["Records"]) for batch in batches] == [10, 10, 5, 1]
+    assert [s3_object.key for s3_object in coalesce_s3_object_events(batches[-1])] == ["hour=25"]
+
+
+def test_transform_handler_processes_each_key_of_a_batch_once(monkeypatch):
+    from newswatch import transform
+
+    transformed = []
+    monkeypatch.setattr(transform, "transform", lambda bucket, key: transformed.append((bucket, key)))
+    keys = [
+        "headlines/year=2024/month=01/day=01/hour=00.parquet",
+        "headlines/year=2024/month=01/day=01/hour=01.parquet",
+    ]
+    event = build_sqs_event(build_object_created_event(BUCKET, key) for key in keys + keys)
+
+    assert transform.lambda_handler(event, None) == {"batchItemFailures": []}
+    assert transformed == [(BUCKET, key) for key in keys]
@@ -0,0 +1,133 @@
+import random
+
+import pytest
+from synthetic_headlines import build_vocabulary, generate_headline_texts, zipf_weights
+
+from newswatch.common.lemmatisers import (
+    LookupLemmatiser,
+    SuffixLemmatiser,
+    TextBlobLemmatiser,
+    build_lemma_table,
+    create_lemmatiser,
+    get_lemmatiser,
+    get_noun_lemma_candidates,
+    load_lemma_table,
+    measure_divergence,
+    write_lemma_table,
+)
+from newswatch.transform import count_words_in_text, split_text_into_words
+
+# The suffix lemmatiser is only meant for experiments, but a large divergence would mean broken rules
+MAX_SUFFIX_DIVERGENCE = 0.1
+
+
+@pytest.fixture(scope="module")
+def historical_words() -> list[str]:
+    """The words of sample headlines and of synthetic headlines of the most frequent words in BigQuery."""
+
+    with open("tests/fixtures/headlines.txt", "r") as f:
+        texts = [line.strip() for line in f if line.strip()]
+    vocabulary = build_vocabulary(400)
+    texts += generate_headline_texts(500, vocabulary, zipf_weights(len(vocabulary)), random.Random(0))
+    return [word for text in texts for word in split_text_into_words(text)]
+
+
+@pytest.fixture(scope="module")
+def lemma_table() -> dict[str, str]:
+    return build_lemma_table()
+
+
+@pytest.mark.parametrize(
+    "word, lemma",
+    [
+        ("homes", "home"),
+        ("cities", "city"),
+        ("boxes", "box"),
+        ("churches", "church"),
+        ("glasses", "glass"),
+        ("women", "woman"),
+        ("bus", "bus"),
+        ("crisis", "crisis"),
+        ("class", "class"),
+        ("its", "its"),
+        ("vote", "vote"),
+    ],
+)
+def test_suffix_lemmatiser(word, lemma):
+    assert SuffixLemmatiser().lemmatise(word) == lemma
+
+
+def test_get_noun_lemma_candidates():
+    suffix_rules = [("s", ""), ("xes", "x"), ("men", "man"), ("ies", "y")]
+    assert get_noun_lemma_candidates(["box", "city", "man"], suffix_rules) == {
+        "box",
+        "boxs",
+        "boxes",
+        "city",
+        "citys",
+        "cities",
+        "man",
+        "mans",
+        "men",
+    }
+
+
+def test_lemma_table_round_trip(tmp_path):
+    path = str(tmp_path / "lemmas.json.gz")
+    write_lemma_table(path, {"homes": "home"}, wordnet_version="3.0")
+
+    assert load_lemma_table(path) == {"homes": "home"}
+    assert load_lemma_table(str(tmp_path / "missing.json.gz")) is None
+    assert isinstance(create_lemmatiser("lookup", lemma_table_path=path), LookupLemmatiser)
+    with pytest.raises(FileNotFoundError, match="build-lemma-table"):
+        create_lemmatiser("lookup", lemma_table_path=str(tmp_path / "missing"))
+    with pytest.raises(ValueError, match="LEMMATISER"):
+        create_lemmatiser("spacy")
+
+
+def test_get_lemmatiser(monkeypatch):
+    monkeypatch.setenv("LEMMATISER", "suffix")
+    assert get_lemmatiser() is get_lemmatiser()
+    assert get_lemmatiser().name == "suffix"
+
+    monkeypatch.delenv("LEMMATISER")
+    assert get_lemmatiser().name == "textblob"
+
+
+def test_measure_divergence():
+    divergence, differences = measure_divergence(
+        ["homes", "news", "news", "vote"], reference=LookupLemmatiser({"homes": "home"}), candidate=SuffixLemmatiser()
+    )
+
+    assert divergence == 0.5
+    assert differences == {("news", "news", "new"): 2}
+
+
+def test_lookup_lemmatiser_conforms_to_the_reference(historical_words, lemma_table):
+    divergence, differences = measure_divergence(
+        historical_words, reference=TextBlobLemmatiser(), candidate=LookupLemmatiser(lemma_table)
+    )
+
+    assert divergence == 0.0, differences
+
+
+def test_suffix_lemmatiser_divergence(historical_words):
+    divergence, differences = measure_divergence(
+        historical_words, reference=TextBlobLemmatiser(), candidate=SuffixLemmatiser()
+    )
+
+    assert 0.0 < divergence < MAX_SUFFIX_DIVERGENCE, sorted(differences.items(), key=lambda d: -d[1])[:20]
+
+
+def test_count_words_in_text_with_the_lookup_lemmatiser(monkeypatch, tmp_path, lemma_table):
+    text = "Storms bring floods and power cuts to coastal villages; villages clear the floods"
+    monkeypatch.delenv("LEMMATISER", raising=False)
+    reference_word_counts = count_words_in_text(text)
+
+    lemma_table_path = str(tmp_path / "lemmas.json.gz")
+    write_lemma_table(lemma_table_path, lemma_table, wordnet_version="3.0")
+    monkeypatch.setenv("LEMMATISER", "lookup")
+    monkeypatch.setenv("LEMMA_TABLE_PATH", lemma_table_path)
+
+    assert count_words_in_text(text) == reference_word_counts
+    assert reference_word_counts["village"] == 2
@@ -5,11 +5,9 @@ from datetime import datetime, timezone
 import pytest
 
 from newswatch.common.models import WordFrequency
-from newswatch.load import (
-    convert_filtered_word_frequencies_to_dict,
-    filter_word_frequencies,
-    load_excluded_words,
-)
+from newswatch.common.utils import convert_objects_to_parquet_bytes, convert_parquet_bytes_to_objects
+from newswatch.common.word_filters import build_word_frequency_filter, filter_word_frequencies, load_excluded_words
+from newswatch.load import convert_filtered_word_frequencies_to_dict
 
 dummy_timestamp = datetime(2023, 6, 13, 21, 0, tzinfo=timezone.utc)
 dummy_timestamp_str = "2023-06-13 21:00"
@@ -112,6 +110,26 @@ def test_filter_word_frequencies(
     assert filtered == expected_filtered
 
 
+@pytest.mark.parametrize(
+    "min_word_length, min_frequency, excluded_words", [(1, 1, set()), (4, 2, {"bbbb"}), (5, 1, set())]
+)
+def test_build_word_frequency_filter(monkeypatch, min_word_length, min_frequency, excluded_words):
+    monkeypatch.setenv("MIN_WORD_LENGTH", str(min_word_length))
+    monkeypatch.setenv("MIN_FREQUENCY", str(min_frequency))
+    word_frequencies = [
+        WordFrequency(word=word, frequency=frequency, timestamp=dummy_timestamp)
+        for word, frequency in [("a", 1), ("bbbb", 2), ("café", 3), ("ccccc", 1), ("déjà", 2)]
+    ]
+
+    read_word_frequencies = convert_parquet_bytes_to_objects(
+        convert_objects_to_parquet_bytes(word_frequencies),
+        WordFrequency,
+        filters=build_word_frequency_filter(excluded_words),
+    )
+
+    assert read_word_frequencies == filter_word_frequencies(word_frequencies, excluded_words)
+
+
 def test_convert_filtered_word_frequencies_to_dict():
     flat_list = [
         WordFrequency(word="alpha", frequency=100, timestamp=dummy_timestamp),
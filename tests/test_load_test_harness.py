@@ -0,0 +1,26 @@
+import pytest
+
+from load_test_harness import format_comparison, percentiles, run_load_test
+
+
+def test_percentiles():
+    assert percentiles([5.0]) == {"p50": 5.0, "p90": 5.0, "p99": 5.0, "max": 5.0}
+    assert percentiles([float(i) for i in range(1, 102)]) == {"p50": 51.0, "p90": 91.0, "p99": 100.0, "max": 101.0}
+
+
+@pytest.mark.parametrize("s3", ["moto", "memory"])
+def test_run_load_test(monkeypatch, s3):
+    monkeypatch.setenv("BIGQUERY_TABLE_ID", "project.dataset.table")
+    monkeypatch.setenv("BIGQUERY_DELETE_BEFORE_WRITE", "false")
+    monkeypatch.setenv("MIN_FREQUENCY", "0")
+
+    report = run_load_test(site_count=2, headlines_per_hour=10, hours=2, vocabulary_size=50, s3=s3)
+
+    assert report["parameters"]["hours"] == 2
+    assert report["loaded_rows"] > 0
+    assert report["peak_rss_mb"] > 0
+    assert set(report["latency_ms"]) == {"extract", "transform", "load"}
+    assert all(latency["p50"] <= latency["max"] for latency in report["latency_ms"].values())
+
+    comparison = format_comparison(report, report)
+    assert "(+0.0%)" in comparison
@@ -0,0 +1,121 @@
+import json
+import logging
+
+import pytest
+
+from newswatch.common.metrics import (
+    Span,
+    emit_metrics,
+    format_emf,
+    format_summary_table,
+    get_spans,
+    reset_spans,
+    span,
+    timed,
+)
+
+
+@pytest.fixture(autouse=True)
+def no_spans():
+    reset_spans()
+    yield
+    reset_spans()
+
+
+def test_span_records_duration_and_counts():
+    with span("fetch", site="site1") as fetch_span:
+        fetch_span.add(bytes=100)
+        fetch_span.add(bytes=50, rows=2)
+
+    [recorded] = get_spans()
+    assert recorded.name == "fetch"
+    assert recorded.dimensions == {"site": "site1"}
+    assert recorded.counts == {"bytes": 150, "rows": 2}
+    assert recorded.duration_ms >= 0
+
+
+def test_span_is_recorded_when_block_raises():
+    with pytest.raises(ZeroDivisionError):
+        with span("div"):
+            _ = 1 / 0
+
+    assert [s.name for s in get_spans()] == ["div"]
+
+
+def test_timed():
+    @timed("add")
+    def add(a, b):
+        return a + b
+
+    assert add(1, 2) == 3
+    assert [s.name for s in get_spans()] == ["add"]
+
+
+def test_format_emf():
+    spans = [Span(name="fetch", dimensions={"site": "site1"}, counts={"bytes": 10}, duration_ms=1.5)]
+
+    [document] = format_emf(stage="extract", spans=spans, timestamp_ms=1000)
+
+    assert document["_aws"] == {
+        "Timestamp": 1000,
+        "CloudWatchMetrics": [
+            {
+                "Namespace": "Newswatch",
+                "Dimensions": [["stage", "span", "site"]],
+                "Metrics": [
+                    {"Name": "duration_ms", "Unit": "Milliseconds"},
+                    {"Name": "bytes", "Unit": "Bytes"},
+                ],
+            },
+        ],
+    }
+    assert {k: v for k, v in document.items() if k != "_aws"} == {
+        "stage": "extract",
+        "span": "fetch",
+        "site": "site1",
+        "duration_ms": 1.5,
+        "bytes": 10,
+    }
+
+
+def test_format_summary_table():
+    spans = [
+        Span(name="fetch", dimensions={"site": "site1"}, counts={"bytes": 10}, duration_ms=1.0),
+        Span(name="fetch", dimensions={"site": "site1"}, counts={"bytes": 20}, duration_ms=2.0),
+        Span(name="s3_put", counts={"bytes": 5}, duration_ms=3.0),
+    ]
+
+    header, fetch_row, s3_put_row = format_summary_table(spans).splitlines()
+
+    assert header.split() == ["span", "dimensions", "calls", "total", "ms", "rows", "bytes"]
+    assert fetch_row.split() == ["fetch", "site=site1", "2", "3.0", "0", "30"]
+    assert s3_put_row.split() == ["s3_put", "1", "3.0", "0", "5"]
+
+
+def test_emit_metrics_emf(monkeypatch, capsys):
+    monkeypatch.setenv("METRICS_FORMAT", "emf")
+
+    @emit_metrics(stage="stage")
+    def run():
+        with span("step") as step_span:
+            step_span.add(rows=3)
+
+    run()
+
+    documents = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [(d["span"], d.get("rows")) for d in documents] == [("step", 3), ("stage", None)]
+    assert get_spans() == []
+
+
+def test_emit_metrics_table(monkeypatch, caplog):
+    monkeypatch.setenv("METRICS_FORMAT", "table")
+
+    @emit_metrics(stage="stage")
+    def run():
+        raise ValueError("failed")
+
+    with caplog.at_level(logging.INFO), pytest.raises(ValueError):
+        run()
+
+    assert "Metrics of stage" in caplog.text
+    assert get_spans() == []
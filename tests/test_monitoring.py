@@ -0,0 +1,119 @@
+import base64
+import gzip
+import json
+
+import boto3
+import moto
+import pytest
+
+import monitoring
+
+log_group = "/aws/lambda/newswatch-extract-live-uk"
+
+
+def build_awslogs_event(messages: list[str], timestamp_ms: int = 1_700_000_000_000) -> dict:
+    payload = {
+        "messageType": "DATA_MESSAGE",
+        "logGroup": log_group,
+        "logStream": "2024/01/01/[$LATEST]abc",
+        "logEvents": [
+            {"id": str(i), "timestamp": timestamp_ms + i, "message": message} for i, message in enumerate(messages)
+        ],
+    }
+    return {"awslogs": {"data": base64.b64encode(gzip.compress(json.dumps(payload).encode())).decode()}}
+
+
+timeout_message = (
+    "[ERROR]\t2024-01-01T00:05:10.000Z\treq-1\tError in scrape_url: ReadTimeout: "
+    "HTTPSConnectionPool(host='www.site1.com', port=443): Read timed out. (read timeout=10)\n"
+)
+connection_message = (
+    "[ERROR]\t2024-01-01T00:05:20.000Z\treq-1\tError in scrape_url: ConnectionError: "
+    "Max retries exceeded with url: https://www.site2.com/news\n"
+)
+uncaught_message = "[ERROR] ValueError: No sites matched the filter criteria, cannot merge frequencies.\nTraceback"
+
+
+@pytest.mark.parametrize(
+    "message, expected",
+    [
+        (timeout_message, ("scrape_url", "www.site1.com", "ReadTimeout")),
+        (connection_message, ("scrape_url", "www.site2.com", "ConnectionError")),
+        (uncaught_message, ("lambda_handler", "-", "ValueError")),
+        ("[ERROR] something odd", ("unknown", "-", "unknown")),
+    ],
+)
+def test_parse_error(message, expected):
+    error = monitoring.parse_error("newswatch-extract-live-uk", {"timestamp": 1, "message": message})
+    assert (error["function"], error["site"], error["exception_type"]) == expected
+    assert error["lambda_function"] == "newswatch-extract-live-uk"
+
+
+def test_aggregate_errors_deduplicates():
+    payload = monitoring.logpayload(build_awslogs_event([timeout_message] * 5 + [connection_message]))
+    state = monitoring.aggregate_errors({}, monitoring.parse_errors(payload), now=100)
+    state = monitoring.aggregate_errors(state, monitoring.parse_errors(payload), now=200)
+
+    assert state["window_start"] == 100
+    assert sorted(error["count"] for error in state["errors"].values()) == [2, 10]
+
+
+def test_format_digest():
+    payload = monitoring.logpayload(build_awslogs_event([timeout_message] * 3 + [connection_message]))
+    state = monitoring.aggregate_errors({}, monitoring.parse_errors(payload), now=0)
+
+    subject, message = monitoring.format_digest(state, now=3600)
+
+    assert subject == "4 execution errors for Lambda - newswatch-extract-live-uk"
+    assert "4 in total, 2 distinct" in message
+    assert message.index("3 x newswatch-extract-live-uk / scrape_url / www.site1.com / ReadTimeout") < message.index(
+        "1 x newswatch-extract-live-uk / scrape_url / www.site2.com / ConnectionError",
+    )
+
+
+@moto.mock_aws
+def test_lambda_handler_publishes_one_digest_per_window(monkeypatch):
+    s3_client = boto3.client("s3", region_name="us-east-1")
+    s3_client.create_bucket(Bucket="state-bucket")
+    sns_client = boto3.client("sns", region_name="us-east-1")
+    topic_arn = sns_client.create_topic(Name="errors")["TopicArn"]
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    monkeypatch.setenv("snsARN", topic_arn)
+    monkeypatch.setenv("STATE_S3_BUCKET", "state-bucket")
+    monkeypatch.setenv("DIGEST_WINDOW_SEC", "3600")
+
+    published = []
+    monkeypatch.setattr(monitoring, "publish_digest", lambda subject, message: published.append(subject) or True)
+    now = 1_700_000_000
+    monkeypatch.setattr(monitoring.time, "time", lambda: now)
+
+    # Every site failing in several batches within the window doesn't publish anything yet
+    for _ in range(3):
+        monitoring.lambda_handler(build_awslogs_event([timeout_message, connection_message]), None)
+    assert published == []
+
+    # The scheduled event after the window publishes a single digest with all errors and resets the state
+    now += 3600
+    monitoring.lambda_handler({"source": "aws.events"}, None)
+    monitoring.lambda_handler({"source": "aws.events"}, None)
+    assert published == ["6 execution errors for Lambda - newswatch-extract-live-uk"]
+    assert monitoring.load_state() == {}
+
+
+@moto.mock_aws
+def test_lambda_handler_keeps_the_errors_if_publishing_fails(monkeypatch):
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    # The topic doesn't exist, so publishing fails
+    monkeypatch.setenv("snsARN", "arn:aws:sns:us-east-1:123456789012:missing")
+    monkeypatch.delenv("STATE_S3_BUCKET", raising=False)
+    monkeypatch.setenv("DIGEST_WINDOW_SEC", "3600")
+    now = 1_700_000_000
+    monkeypatch.setattr(monitoring.time, "time", lambda: now)
+    monitoring.save_state({})
+
+    monitoring.lambda_handler(build_awslogs_event([timeout_message]), None)
+    now += 3600
+    monitoring.lambda_handler({"source": "aws.events"}, None)
+
+    assert monitoring.load_state() != {}
+    assert not monitoring.publish_digest(*monitoring.format_digest(monitoring.load_state(), now))
@@ -0,0 +1,36 @@
+import pytest
+
+from newswatch.common.ngrams import get_ngram_sizes, iterate_ngrams
+
+
+@pytest.mark.parametrize(
+    "env_value,expected_sizes",
+    [(None, []), ("", []), ("2", [2]), ("3, 2", [2, 3]), ("2,2,3", [2, 3])],
+)
+def test_get_ngram_sizes(monkeypatch, env_value, expected_sizes):
+    if env_value is None:
+        monkeypatch.delenv("TRANSFORM_NGRAMS", raising=False)
+    else:
+        monkeypatch.setenv("TRANSFORM_NGRAMS", env_value)
+    assert get_ngram_sizes() == expected_sizes
+
+
+@pytest.mark.parametrize("env_value", ["1", "2,6", "bigrams"])
+def test_get_ngram_sizes_invalid(monkeypatch, env_value):
+    monkeypatch.setenv("TRANSFORM_NGRAMS", env_value)
+    with pytest.raises(ValueError):
+        get_ngram_sizes()
+
+
+@pytest.mark.parametrize(
+    "words,sizes,expected_ngrams",
+    [
+        (["prime", "minister", "resign"], [2], ["prime minister", "minister resign"]),
+        (["prime", "minister", "resign"], [2, 3], ["prime minister", "minister resign", "prime minister resign"]),
+        (["minister"], [2], []),
+        (["the", "bank", "of", "england", "cut", "rate"], [2], ["england cut", "cut rate"]),
+        (["the", "bank", "of", "england", "cut", "rate"], [3], ["bank of england", "england cut rate"]),
+    ],
+)
+def test_iterate_ngrams(words, sizes, expected_ngrams):
+    assert list(iterate_ngrams(words, sizes, excluded_words={"the", "of"})) == expected_ngrams
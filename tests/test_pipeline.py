@@ -0,0 +1,136 @@
+import io
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from unittest.mock import patch
+
+import boto3
+import moto
+import pyarrow.parquet as pq
+from pydantic import HttpUrl, TypeAdapter
+from pytest import MonkeyPatch
+from requests.models import Response
+
+from common.models import Filter, Site
+from newswatch.pipeline import lambda_handler as pipeline_lambda_handler
+
+url_adapter = TypeAdapter(HttpUrl)
+
+s3_bucket_name = "test-bucket"
+timestamp = datetime(2023, 6, 13, 21, 5, 0)
+timestamp_partitions = "year=2023/month=06/day=13/hour=21"
+
+site_from_yaml = Site(
+    name="site",
+    url=url_adapter.validate_python("https://www.site.com"),
+    filters=[Filter(tag="h2", attrs=None)],
+)
+other_site_from_yaml = Site(
+    name="other-site",
+    url=url_adapter.validate_python("https://www.other-site.com"),
+    filters=[Filter(tag="h2", attrs=None)],
+)
+requests_get_response = Response()
+requests_get_response._content = b"<html><body><h2>Sports, sports and more sports</h2><h2>Go go go</h2></body></html>"
+
+
+class MockBigQueryClient:
+    def __init__(self):
+        self.inserted_rows = []
+
+    def insert_rows_json(self, table_id, data):
+        self.inserted_rows += data
+
+
+mock_bigquery_client = MockBigQueryClient()
+
+
+@moto.mock_aws
+@patch("requests.get", return_value=requests_get_response)
+@patch("extract.load_sites_from_yaml", return_value=[site_from_yaml])
+@patch("newswatch.pipeline.get_current_timestamp", return_value=timestamp)
+@patch("transform.get_wordnet_corpus")
+@patch("load.load_excluded_words", return_value={"and"})
+@patch("common.bigquery._get_bq_client", return_value=mock_bigquery_client)
+def test_pipeline(*__args):
+    with MonkeyPatch.context() as mp:
+        mp.setenv("S3_BUCKET_NAME", s3_bucket_name)
+        mp.setenv("EXTRACT_S3_PREFIX", "headlines")
+        mp.setenv("TRANSFORM_S3_PREFIX", "word-frequencies")
+        mp.setenv("BIGQUERY_TABLE_ID", "nwproject.nwdataset.nwtable")
+        mp.setenv("BIGQUERY_DELETE_BEFORE_WRITE", "false")
+        mp.setenv("MIN_WORD_LENGTH", "2")
+        mp.setenv("MIN_FREQUENCY", "10000")
+
+        s3_client = boto3.client("s3", region_name="us-east-1")
+        s3_client.create_bucket(Bucket=s3_bucket_name)
+
+        pipeline_lambda_handler(event=None, context=None)
+
+        # Data is passed to the load in memory
+        assert sorted(mock_bigquery_client.inserted_rows, key=lambda row: row["word"]) == [
+            {"word": "go", "frequency": 37500, "timestamp": "2023-06-13 21:00"},
+            {"word": "more", "frequency": 12500, "timestamp": "2023-06-13 21:00"},
+            {"word": "sport", "frequency": 37500, "timestamp": "2023-06-13 21:00"},
+        ]
+
+        # Intermediate objects are still written to S3
+        def _read_rows(key: str) -> list[dict]:
+            parquet_bytes = s3_client.get_object(Bucket=s3_bucket_name, Key=key)["Body"].read()
+            return pq.read_table(io.BytesIO(parquet_bytes)).to_pylist()
+
+        assert len(_read_rows(f"headlines/{timestamp_partitions}.parquet")) == 2
+        assert {row["word"] for row in _read_rows(f"word-frequencies/{timestamp_partitions}.parquet")} == {
+            "sport",
+            "and",
+            "more",
+            "go",
+        }
+
+
+@moto.mock_aws
+@patch("requests.get", return_value=requests_get_response)
+@patch("extract.load_sites_from_yaml", return_value=[site_from_yaml, other_site_from_yaml])
+@patch("extract.get_shard_executor", side_effect=lambda shard_count: ThreadPoolExecutor(shard_count))
+@patch("newswatch.pipeline.get_current_timestamp", return_value=timestamp)
+@patch("transform.get_wordnet_corpus")
+@patch("load.load_excluded_words", return_value={"and"})
+@patch("common.bigquery._get_bq_client", return_value=MockBigQueryClient())
+def test_pipeline_sharded(_mock_bq_client, _mock_excluded_words, _mock_corpus, _mock_timestamp, mock_executor, *__args):
+    with MonkeyPatch.context() as mp:
+        mp.setenv("S3_BUCKET_NAME", s3_bucket_name)
+        mp.setenv("EXTRACT_S3_PREFIX", "headlines")
+        mp.setenv("TRANSFORM_S3_PREFIX", "word-frequencies")
+        mp.setenv("EXTRACT_SHARDS", "2")
+        mp.setenv("EXTRACT_SHARDING", "hash")
+        mp.setenv("BIGQUERY_TABLE_ID", "nwproject.nwdataset.nwtable")
+        mp.setenv("BIGQUERY_DELETE_BEFORE_WRITE", "false")
+
+        s3_client = boto3.client("s3", region_name="us-east-1")
+        s3_client.create_bucket(Bucket=s3_bucket_name)
+
+        pipeline_lambda_handler(event=None, context=None)
+
+        # The sites are extracted in shards and merged in the order of the sites
+        mock_executor.assert_called_once()
+        parquet_bytes = s3_client.get_object(Bucket=s3_bucket_name, Key=f"headlines/{timestamp_partitions}.parquet")[
+            "Body"
+        ].read()
+        assert [row["site_name"] for row in pq.read_table(io.BytesIO(parquet_bytes)).to_pylist()] == [
+            "site",
+            "site",
+            "other-site",
+            "other-site",
+        ]
+        keys = [obj["Key"] for obj in s3_client.list_objects_v2(Bucket=s3_bucket_name)["Contents"]]
+        assert not [key for key in keys if key.startswith("partials/")]
+
+
+@patch("newswatch.pipeline.run_pipeline")
+@patch("newswatch.pipeline.extract_shard", return_value={"key": "partial"})
+def test_pipeline_lambda_handler_extracts_shards(mock_extract_shard, mock_run_pipeline):
+    shard = {"index": 0, "count": 2}
+
+    assert pipeline_lambda_handler(event={"shard": shard}, context=None) == {"key": "partial"}
+
+    mock_extract_shard.assert_called_once_with(shard)
+    mock_run_pipeline.assert_not_called()
@@ -0,0 +1,120 @@
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+import pytest
+from requests.models import Response
+
+from newswatch.common.politeness import HostScheduler, TokenBucket, fetch_crawl_delay, parse_retry_after
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps: list[float] = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, sec: float) -> None:
+        self.sleeps.append(sec)
+        self.now += sec
+
+
+@pytest.mark.parametrize(
+    "value, expected_sec",
+    [
+        ("120", 120.0),
+        (" 0 ", 0.0),
+        ("Wed, 21 Oct 2015 07:28:00 GMT", 60.0),
+        ("Wed, 21 Oct 2015 07:26:00 GMT", 0.0),
+        ("soon", None),
+        (None, None),
+    ],
+)
+def test_parse_retry_after(value, expected_sec):
+    now = datetime(2015, 10, 21, 7, 27, tzinfo=timezone.utc)
+    assert parse_retry_after(value, now=now) == expected_sec
+
+
+def test_token_bucket():
+    bucket = TokenBucket(rate_per_sec=0.5, capacity=2)
+    waits = []
+    for _ in range(4):
+        waits.append(bucket.get_wait_sec(now=0))
+        bucket.take(now=waits[-1])
+    assert waits == [0, 0, 2, 4]
+    # Refilled to capacity after a while
+    assert bucket.get_wait_sec(now=100) == 0
+
+
+def test_host_scheduler_rate_limits_each_host():
+    clock = FakeClock()
+    host_scheduler = HostScheduler(rate_per_sec=1, burst=1, clock=clock, sleep=clock.sleep)
+
+    for url in ["https://a.com/1", "https://b.com", "https://a.com/2", "https://A.com/3"]:
+        with host_scheduler.request_slot(url) as allowed:
+            assert allowed
+    assert clock.sleeps == [1.0, 1.0]
+
+
+def test_host_scheduler_defer():
+    clock = FakeClock()
+    host_scheduler = HostScheduler(max_wait_sec=30, clock=clock, sleep=clock.sleep)
+
+    host_scheduler.defer("https://a.com", 20)
+    with host_scheduler.request_slot("https://a.com") as allowed:
+        assert allowed
+    assert clock.sleeps == [20.0]
+
+    host_scheduler.defer("https://a.com", 60)
+    with host_scheduler.request_slot("https://a.com") as allowed:
+        assert not allowed
+    assert clock.sleeps == [20.0]
+
+
+def test_host_scheduler_limits_requests_in_flight():
+    host_scheduler = HostScheduler(rate_per_sec=1000, burst=10, max_in_flight=1, max_wait_sec=0.01)
+
+    with host_scheduler.request_slot("https://a.com") as allowed:
+        assert allowed
+        with host_scheduler.request_slot("https://a.com/other") as allowed_in_parallel:
+            assert not allowed_in_parallel
+        with host_scheduler.request_slot("https://b.com") as allowed_other_host:
+            assert allowed_other_host
+
+
+def test_host_scheduler_crawl_delay():
+    clock = FakeClock()
+    crawled_urls = []
+
+    def crawl_delay_fetcher(url: str) -> float:
+        crawled_urls.append(url)
+        return 5.0
+
+    host_scheduler = HostScheduler(
+        rate_per_sec=1, crawl_delay_fetcher=crawl_delay_fetcher, clock=clock, sleep=clock.sleep
+    )
+    for _ in range(3):
+        with host_scheduler.request_slot("https://a.com/news") as allowed:
+            assert allowed
+    assert clock.sleeps == [5.0, 5.0]
+    assert crawled_urls == ["https://a.com/news"]
+
+
+@pytest.mark.parametrize(
+    "status_code, robots_txt, expected_crawl_delay",
+    [
+        (200, "User-agent: *\nCrawl-delay: 10\nDisallow: /private", 10.0),
+        (200, "User-agent: *\nDisallow: /private", None),
+        (404, "", None),
+    ],
+)
+def test_fetch_crawl_delay(status_code, robots_txt, expected_crawl_delay):
+    response = Response()
+    response.status_code = status_code
+    response._content = robots_txt.encode("utf-8")
+    response.encoding = "utf-8"
+
+    with patch("requests.get", return_value=response) as mock_get:
+        assert fetch_crawl_delay("https://a.com/news?x=1", user_agent="Mozilla/5.0") == expected_crawl_delay
+    assert mock_get.call_args.kwargs["url"] == "https://a.com/robots.txt"
@@ -0,0 +1,135 @@
+import marshal
+from datetime import datetime
+from unittest.mock import patch
+
+import pytest
+
+from common.storage import get_storage
+from newswatch.common.profiling import (
+    build_profile_s3_key,
+    get_profile_modes,
+    profile_requested_by,
+    profiled,
+)
+from newswatch.extract import lambda_handler as extract_lambda_handler
+
+BUCKET = "test-bucket"
+DATA_KEY = "headlines/year=2024/month=01/day=01/hour=12.parquet"
+
+
+@pytest.fixture
+def memory_storage(monkeypatch):
+    # The storage of the handler modules, which import common.utils as a top-level package
+    monkeypatch.setenv("STORAGE_BACKEND", "memory")
+    monkeypatch.delenv("PROFILES_S3_PREFIX", raising=False)
+    storage = get_storage()
+    storage.objects.clear()
+    return storage
+
+
+def _stage(bucket: str, key: str, fail: bool = False) -> int:
+    words = [f"word{i}" for i in range(1000)]
+    if fail:
+        raise ValueError("Stage failed")
+    return len(words)
+
+
+def _profiled_stage(bucket: str, key: str, fail: bool = False) -> int:
+    return profiled(stage="transform", get_location=lambda bucket, key, fail=False: (bucket, key))(_stage)(
+        bucket, key, fail
+    )
+
+
+def test_get_profile_modes(monkeypatch):
+    monkeypatch.delenv("PROFILE", raising=False)
+    assert get_profile_modes() == set()
+
+    monkeypatch.setenv("PROFILE", "CPU, memory,gpu")
+    assert get_profile_modes() == {"cpu", "memory"}
+
+    with profile_requested_by({"profile": "memory"}):
+        assert get_profile_modes() == {"memory"}
+    with profile_requested_by({"profile": ""}):
+        assert get_profile_modes() == set()
+    with profile_requested_by(None):
+        assert get_profile_modes() == {"cpu", "memory"}
+
+
+def test_build_profile_s3_key():
+    assert (
+        build_profile_s3_key(prefix="profiles", data_key=DATA_KEY, stage="transform", extension="prof")
+        == "profiles/headlines/year=2024/month=01/day=01/hour=12.transform.prof"
+    )
+
+
+def test_not_profiled_by_default(monkeypatch, memory_storage):
+    monkeypatch.delenv("PROFILE", raising=False)
+
+    assert _profiled_stage(BUCKET, DATA_KEY) == 1000
+    assert memory_storage.objects == {}
+
+
+def test_profiled_stage_writes_the_reports(monkeypatch, memory_storage):
+    monkeypatch.setenv("PROFILE", "cpu,memory")
+
+    assert _profiled_stage(BUCKET, DATA_KEY) == 1000
+
+    profile_key = "profiles/headlines/year=2024/month=01/day=01/hour=12.transform"
+    assert {key for _, key in memory_storage.objects} == {
+        f"{profile_key}.prof",
+        f"{profile_key}.cpu.txt",
+        f"{profile_key}.allocations.txt",
+    }
+    stats = marshal.loads(memory_storage.get(BUCKET, f"{profile_key}.prof"))
+    assert any(function_name == "_stage" for _, _, function_name in stats)
+    assert b"cumulative" in memory_storage.get(BUCKET, f"{profile_key}.cpu.txt")
+    assert b"Peak traced memory" in memory_storage.get(BUCKET, f"{profile_key}.allocations.txt")
+
+
+def test_profiled_stage_writes_the_reports_if_it_raises(monkeypatch, memory_storage):
+    monkeypatch.delenv("PROFILE", raising=False)
+
+    with profile_requested_by({"profile": "memory"}), pytest.raises(ValueError, match="Stage failed"):
+        _profiled_stage(BUCKET, DATA_KEY, fail=True)
+
+    assert [key for _, key in memory_storage.objects] == [
+        "profiles/headlines/year=2024/month=01/day=01/hour=12.transform.allocations.txt"
+    ]
+
+
+def test_profiled_stage_called_with_keywords(monkeypatch, memory_storage):
+    monkeypatch.setenv("PROFILE", "cpu")
+
+    def _load(bucket: str, word_frequencies_key: str) -> None:
+        pass
+
+    profiled_load = profiled(stage="load", get_location=lambda bucket, key: (bucket, key))(_load)
+    profiled_load(bucket=BUCKET, word_frequencies_key=DATA_KEY)
+    profiled_load(BUCKET, word_frequencies_key=DATA_KEY)
+
+    assert {key for _, key in memory_storage.objects} == {
+        "profiles/headlines/year=2024/month=01/day=01/hour=12.load.prof",
+        "profiles/headlines/year=2024/month=01/day=01/hour=12.load.cpu.txt",
+    }
+
+
+@patch("newswatch.extract.put_headlines_to_s3")
+@patch("newswatch.extract.put_site_health")
+@patch("newswatch.extract.extract_all_headlines", return_value=[])
+@patch("newswatch.extract.get_site_health")
+def test_extract_profile_is_stored_by_the_key_of_the_headlines(
+    _mock_get_site_health, _mock_extract, _mock_put_site_health, mock_put_headlines, monkeypatch, memory_storage
+):
+    monkeypatch.setenv("S3_BUCKET_NAME", BUCKET)
+    monkeypatch.setenv("EXTRACT_S3_PREFIX", "headlines")
+    # The hour changes between the two readings of the clock
+    timestamps = [datetime(2024, 1, 1, 12, 59, 59), datetime(2024, 1, 1, 13, 0, 0)]
+
+    with patch("newswatch.extract.get_current_timestamp", side_effect=timestamps):
+        extract_lambda_handler(event={"profile": "cpu"}, context=None)
+
+    assert mock_put_headlines.call_args.kwargs["key"] == DATA_KEY
+    assert {key for _, key in memory_storage.objects} == {
+        "profiles/headlines/year=2024/month=01/day=01/hour=12.extract.prof",
+        "profiles/headlines/year=2024/month=01/day=01/hour=12.extract.cpu.txt",
+    }
@@ -0,0 +1,105 @@
+import datetime
+import io
+import sys
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from newswatch.common.models import Headline, WordFrequency
+from newswatch.common.records import (
+    HeadlineRecord,
+    WordFrequencyRecord,
+    records_to_table,
+    table_to_records,
+    to_models,
+    to_records,
+    validate_table_schema,
+)
+from newswatch.common.utils import convert_objects_to_parquet_bytes, convert_parquet_bytes_to_objects
+
+
+def test_records_are_slotted(test_timestamp):
+    record = WordFrequencyRecord(word="apple", frequency=10, timestamp=test_timestamp)
+    assert not hasattr(record, "__dict__")
+    model = WordFrequency(word="apple", frequency=10, timestamp=test_timestamp)
+    assert sys.getsizeof(record) < sys.getsizeof(model) + sys.getsizeof(model.__dict__)
+
+
+def test_to_records_and_to_models_round_trip(test_site_headlines_collection):
+    records = to_records(test_site_headlines_collection, HeadlineRecord)
+    assert [r.headline for r in records] == [h.headline for h in test_site_headlines_collection]
+    assert to_models(records, Headline) == test_site_headlines_collection
+
+
+def test_to_models_validates(test_timestamp):
+    with pytest.raises(ValueError):
+        to_models([WordFrequencyRecord(word="apple", frequency="many", timestamp=test_timestamp)], WordFrequency)
+
+
+def test_parquet_round_trip_shares_timestamps(test_timestamp):
+    records = [WordFrequencyRecord(word=word, frequency=i, timestamp=test_timestamp) for i, word in enumerate("abc")]
+    parquet_bytes = convert_objects_to_parquet_bytes(records)
+    result = convert_parquet_bytes_to_objects(parquet_bytes, WordFrequencyRecord)
+    assert result == records
+    assert result[0].timestamp is result[1].timestamp is result[2].timestamp
+
+
+def test_parquet_from_models_can_be_read_as_records(test_site_headlines_collection):
+    parquet_bytes = convert_objects_to_parquet_bytes(test_site_headlines_collection)
+    result = convert_parquet_bytes_to_objects(parquet_bytes, HeadlineRecord)
+    assert result == to_records(test_site_headlines_collection, HeadlineRecord)
+
+
+def test_records_and_models_write_the_same_schema(test_timestamp):
+    model_bytes = convert_objects_to_parquet_bytes([WordFrequency(word="a", frequency=1, timestamp=test_timestamp)])
+    record_bytes = convert_objects_to_parquet_bytes(
+        [WordFrequencyRecord(word="a", frequency=1, timestamp=test_timestamp)]
+    )
+    model_schema = pq.read_table(io.BytesIO(model_bytes)).schema
+    record_schema = pq.read_table(io.BytesIO(record_bytes)).schema
+    assert model_schema.equals(record_schema)
+
+
+def test_table_to_records_empty():
+    assert table_to_records(pa.table({}), WordFrequencyRecord) == []
+
+
+@pytest.mark.parametrize(
+    "columns, error",
+    [
+        ({"word": ["a"], "frequency": [1]}, "Missing columns"),
+        ({"word": ["a"], "frequency": ["1"], "timestamp": [datetime.datetime(2024, 1, 1)]}, "Column frequency"),
+        ({"word": [1], "frequency": [1], "timestamp": [datetime.datetime(2024, 1, 1)]}, "Column word"),
+    ],
+)
+def test_validate_table_schema_invalid(columns, error):
+    with pytest.raises(ValueError, match=error):
+        validate_table_schema(pa.table(columns), WordFrequencyRecord)
+
+
+def test_records_to_table_rejects_wrong_types(test_timestamp):
+    with pytest.raises((pa.ArrowInvalid, pa.ArrowTypeError)):
+        records_to_table(
+            [
+                WordFrequencyRecord(word="a", frequency=1, timestamp=test_timestamp),
+                WordFrequencyRecord(word="b", frequency="x", timestamp=test_timestamp),
+            ],
+            WordFrequencyRecord,
+        )
+
+
+def test_table_to_records_with_defaults(test_site_headlines_collection, test_timestamp):
+    table = pq.read_table(
+        pa.BufferReader(convert_objects_to_parquet_bytes(test_site_headlines_collection)),
+        columns=["site_name", "headline"],
+    )
+
+    with pytest.raises(ValueError, match="timestamp"):
+        table_to_records(table, HeadlineRecord)
+
+    records = table_to_records(table, HeadlineRecord, defaults={"timestamp": test_timestamp})
+    assert [(r.site_name, r.headline) for r in records] == [
+        (h.site_name, h.headline) for h in test_site_headlines_collection
+    ]
+    assert all(r.timestamp is test_timestamp for r in records)
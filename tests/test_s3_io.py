@@ -0,0 +1,132 @@
+import os
+from datetime import datetime
+
+import boto3
+import moto
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+import pytest
+
+from newswatch.common.models import Headline
+from newswatch.common.records import HeadlineRecord
+from newswatch.common.s3_io import (
+    MIN_PART_SIZE,
+    S3MultipartWriter,
+    S3RangeReader,
+    get_objects_from_s3,
+    put_objects_to_s3,
+    read_parquet_table_from_s3,
+    write_parquet_table_to_s3,
+)
+
+BUCKET = "test-bucket"
+
+
+@pytest.fixture
+def s3_client():
+    with moto.mock_aws():
+        s3_client = boto3.client("s3", region_name="us-east-1")
+        s3_client.create_bucket(Bucket=BUCKET)
+        yield s3_client
+
+
+@pytest.mark.parametrize("cls", [Headline, HeadlineRecord])
+def test_put_and_get_objects(s3_client, test_site_headlines_collection: list[Headline], cls):
+    response = put_objects_to_s3(bucket=BUCKET, key="headlines.parquet", objects=test_site_headlines_collection)
+    assert response["ResponseMetadata"]["HTTPStatusCode"] == 200
+
+    objects = get_objects_from_s3(bucket=BUCKET, key="headlines.parquet", cls=cls)
+    assert [(obj.site_name, obj.headline) for obj in objects] == [
+        (headline.site_name, headline.headline) for headline in test_site_headlines_collection
+    ]
+
+
+def test_s3_range_reader(s3_client):
+    data = bytes(range(256)) * 100
+    s3_client.put_object(Bucket=BUCKET, Key="data", Body=data)
+
+    reader = S3RangeReader(bucket=BUCKET, key="data", tail_prefetch_bytes=1000)
+    assert reader.size == len(data)
+    assert not reader.is_fully_fetched
+    assert reader.read(10) == data[:10]
+    reader.seek(-20, os.SEEK_END)
+    assert reader.read() == data[-20:]
+    reader.seek(5000)
+    assert reader.read(100) == data[5000:5100]
+    assert reader.bytes_fetched == 1000 + 10 + 100
+
+    assert S3RangeReader(bucket=BUCKET, key="data").is_fully_fetched
+
+
+def test_read_only_the_requested_columns(s3_client):
+    table = pa.table({"word": ["cat", "dog"] * 5000, "padding": [os.urandom(64).hex() for _ in range(10000)]})
+    write_parquet_table_to_s3(bucket=BUCKET, key="words.parquet", table=table)
+    size = s3_client.head_object(Bucket=BUCKET, Key="words.parquet")["ContentLength"]
+
+    reader = S3RangeReader(bucket=BUCKET, key="words.parquet", tail_prefetch_bytes=64 * 1024)
+    words = pq.ParquetFile(pa.PythonFile(reader, mode="r")).read(columns=["word"])
+    assert words.column("word").to_pylist() == table.column("word").to_pylist()
+    assert reader.bytes_fetched < size / 2
+
+    assert read_parquet_table_from_s3(bucket=BUCKET, key="words.parquet", columns=["word"]).column_names == ["word"]
+
+
+def test_s3_multipart_writer(s3_client):
+    data = os.urandom(2 * MIN_PART_SIZE + 1000)
+
+    with S3MultipartWriter(bucket=BUCKET, key="large", part_size=MIN_PART_SIZE) as writer:
+        for offset in range(0, len(data), 1024 * 1024):
+            writer.write(data[offset : offset + 1024 * 1024])
+        assert len(writer.buffer) < MIN_PART_SIZE
+
+    assert [part["PartNumber"] for part in writer.parts] == [1, 2, 3]
+    assert s3_client.get_object(Bucket=BUCKET, Key="large")["Body"].read() == data
+
+
+def test_s3_multipart_writer_small_object(s3_client):
+    with S3MultipartWriter(bucket=BUCKET, key="small") as writer:
+        writer.write(b"small")
+
+    assert writer.upload_id is None
+    assert s3_client.get_object(Bucket=BUCKET, Key="small")["Body"].read() == b"small"
+
+
+def test_s3_multipart_writer_aborts_on_error(s3_client):
+    with pytest.raises(RuntimeError):
+        with S3MultipartWriter(bucket=BUCKET, key="failed", part_size=MIN_PART_SIZE) as writer:
+            writer.write(os.urandom(MIN_PART_SIZE + 1))
+            raise RuntimeError("failed while writing")
+
+    assert writer.upload_id is not None
+    assert "Uploads" not in s3_client.list_multipart_uploads(Bucket=BUCKET)
+    assert "Contents" not in s3_client.list_objects_v2(Bucket=BUCKET)
+
+
+def test_s3_multipart_writer_part_size():
+    with pytest.raises(ValueError):
+        S3MultipartWriter(bucket=BUCKET, key="key", part_size=1024, s3_client=object())
+
+
+def test_write_parquet_table_to_s3_round_trip(s3_client, test_timestamp: datetime):
+    table = pa.table({"word": ["cat"], "frequency": [1], "timestamp": [test_timestamp]})
+    write_parquet_table_to_s3(bucket=BUCKET, key="table.parquet", table=table)
+    assert read_parquet_table_from_s3(bucket=BUCKET, key="table.parquet").equals(table)
+
+
+@pytest.mark.parametrize("cls", [Headline, HeadlineRecord])
+def test_get_objects_with_columns_and_filters(s3_client, test_site_headlines_collection, test_timestamp, cls):
+    put_objects_to_s3(bucket=BUCKET, key="headlines.parquet", objects=test_site_headlines_collection)
+
+    objects = get_objects_from_s3(
+        bucket=BUCKET,
+        key="headlines.parquet",
+        cls=cls,
+        columns=["site_name", "headline"],
+        filters=pc.field("site_name") == "def",
+        defaults={"timestamp": test_timestamp},
+    )
+
+    assert [(obj.site_name, obj.headline, obj.timestamp) for obj in objects] == [
+        ("def", headline, test_timestamp) for headline in ["abc", "xyz", "123"]
+    ]
@@ -0,0 +1,60 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from newswatch.common.models import Site
+from newswatch.common.shards import (
+    build_partial_s3_key,
+    get_site_costs,
+    get_site_shard,
+    split_sites_by_cost,
+    split_sites_by_hash,
+)
+from newswatch.common.site_health import SiteHealth, SiteHealthState
+
+
+@pytest.mark.parametrize("shard_count", [1, 2, 5])
+def test_split_sites_by_hash(test_sites: list[Site], shard_count: int):
+    shards = split_sites_by_hash(test_sites, shard_count)
+
+    assert len(shards) == shard_count
+    assert sorted(site.name for shard in shards for site in shard) == [site.name for site in test_sites]
+    for shard_index, shard in enumerate(shards):
+        assert all(get_site_shard(site.name, shard_count) == shard_index for site in shard)
+
+
+def test_get_site_costs(test_sites: list[Site]):
+    site_health = SiteHealthState(
+        {
+            "site1": SiteHealth(latencies_ms=[100.0, 300.0, 200.0]),
+            "site2": SiteHealth(latencies_ms=[1000.0]),
+            "site3": SiteHealth(latencies_ms=[]),
+        }
+    )
+    costs = get_site_costs(test_sites[:4], site_health)
+    assert costs == {"site1": 200.0, "site2": 1000.0, "site3": 600.0, "site4": 600.0}
+    assert get_site_costs(test_sites[:2], SiteHealthState()) == {"site1": 1.0, "site2": 1.0}
+
+
+def test_split_sites_by_cost(test_sites: list[Site]):
+    costs = {"site1": 900, "site2": 500, "site3": 400, "site4": 300, "site5": 200, "site6": 100}
+    shards = split_sites_by_cost(test_sites, 2, costs)
+
+    assert [[site.name for site in shard] for shard in shards] == [
+        ["site1", "site4"],
+        ["site2", "site3", "site5", "site6"],
+    ]
+    assert [sum(costs[site.name] for site in shard) for shard in shards] == [1200, 1200]
+
+
+def test_split_sites_by_cost_with_more_shards_than_sites(test_sites: list[Site]):
+    shards = split_sites_by_cost(test_sites[:2], 3, {"site1": 1.0, "site2": 1.0})
+    assert [len(shard) for shard in shards] == [1, 1, 0]
+
+
+def test_build_partial_s3_key():
+    timestamp = datetime(1999, 1, 5, 22, 30, tzinfo=timezone.utc)
+    assert (
+        build_partial_s3_key(prefix="partials/headlines", timestamp=timestamp, shard_index=1, shard_count=4)
+        == "partials/headlines/year=1999/month=01/day=05/hour=22/shard=1-of-4.parquet"
+    )
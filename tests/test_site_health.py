@@ -0,0 +1,79 @@
+import boto3
+import moto
+import pytest
+
+from newswatch.common.site_health import (
+    MIN_TIMEOUT_SEC,
+    SiteHealth,
+    SiteHealthState,
+    get_backoff_sec,
+    load_site_health,
+    save_site_health,
+)
+
+
+@pytest.mark.parametrize(
+    "latencies_ms, expected_timeout_sec",
+    [
+        ([], 10.0),
+        ([500.0] * 4, 10.0),
+        ([500.0] * 10, MIN_TIMEOUT_SEC),
+        ([1000.0] * 9 + [2000.0], 6.0),
+        ([5000.0] * 10, 10.0),
+    ],
+)
+def test_get_timeout_sec(latencies_ms, expected_timeout_sec):
+    site_health = SiteHealth(latencies_ms=latencies_ms)
+    assert site_health.get_timeout_sec(max_timeout_sec=10.0, multiplier=3.0) == expected_timeout_sec
+
+
+def test_circuit_breaker():
+    site_health = SiteHealth()
+    for _ in range(2):
+        site_health.record_failure(now=0, failure_threshold=3, cooldown_sec=100)
+    assert not site_health.is_open(now=0)
+
+    site_health.record_failure(now=0, failure_threshold=3, cooldown_sec=100)
+    assert site_health.is_open(now=50)
+    assert not site_health.is_half_open(now=50)
+    assert site_health.is_half_open(now=100)
+
+    # A failed probe opens the circuit again
+    site_health.record_failure(now=100, failure_threshold=3, cooldown_sec=100)
+    assert site_health.is_open(now=150)
+
+    site_health.record_success(latency_ms=123.45)
+    assert not site_health.is_open(now=150)
+    assert site_health.consecutive_failures == 0
+    assert site_health.latencies_ms == [123.5]
+
+
+def test_latency_sample_is_bounded():
+    site_health = SiteHealth()
+    for latency_ms in range(100):
+        site_health.record_success(latency_ms=latency_ms)
+    assert site_health.latencies_ms == [float(latency_ms) for latency_ms in range(50, 100)]
+
+
+@pytest.mark.parametrize("attempt, expected_max_sec", [(0, 1.0), (2, 4.0), (10, 8.0)])
+def test_get_backoff_sec(attempt, expected_max_sec):
+    for _ in range(20):
+        assert 0 <= get_backoff_sec(attempt, base_sec=1.0, max_sec=8.0) <= expected_max_sec
+
+
+@moto.mock_aws
+def test_load_and_save_site_health():
+    bucket = "test-bucket"
+    key = "state/site-health.json"
+    boto3.client("s3", region_name="us-east-1").create_bucket(Bucket=bucket)
+
+    state = load_site_health(bucket=bucket, key=key)
+    assert state.sites == {}
+
+    state.get("site1").record_success(latency_ms=100)
+    state.get("site2").record_failure(now=0, failure_threshold=1, cooldown_sec=60)
+    save_site_health(bucket=bucket, key=key, state=state)
+
+    loaded = load_site_health(bucket=bucket, key=key)
+    assert loaded.sites == state.sites
+    assert isinstance(loaded, SiteHealthState)
@@ -0,0 +1,79 @@
+import os
+import shutil
+
+import pytest
+from bs4 import BeautifulSoup
+
+from newswatch.common.models import Filter
+from newswatch.common.sites import (
+    FilterMatcher,
+    compile_filter,
+    compile_sites,
+    get_compiled_sites_path,
+    load_compiled_sites,
+    parse_sites_yaml,
+)
+from newswatch.extract import extract_headline_strings, get_site_registry
+
+valid_yaml_path = "tests/fixtures/sites-with-filters_yaml/valid.yaml"
+
+
+@pytest.fixture
+def yaml_path(tmp_path) -> str:
+    path = str(tmp_path / "sites.yaml")
+    shutil.copy(valid_yaml_path, path)
+    return path
+
+
+@pytest.mark.parametrize(
+    "bsoup_filter, expected_matcher",
+    [
+        (Filter(tag="h2", attrs=None), FilterMatcher(name="h2", attrs=None)),
+        (Filter(tag="a", attrs={"href": "hey"}), FilterMatcher(name="a", attrs={"href": "hey"})),
+        (Filter(tag=None, attrs={"keyonly": None}), FilterMatcher(name=None, attrs={"keyonly": True})),
+    ],
+)
+def test_compile_filter(bsoup_filter, expected_matcher):
+    assert compile_filter(bsoup_filter) == expected_matcher
+
+
+def test_prebuilt_matchers_find_the_same_headlines():
+    bs = BeautifulSoup('<h2>One</h2><a data-x="y">Two</a><a>Three</a>', "html.parser")
+    filters = [Filter(tag="h2", attrs=None), Filter(tag="a", attrs={"data-x": None})]
+    matchers = [compile_filter(f) for f in filters]
+    assert extract_headline_strings(bs, filters) == extract_headline_strings(bs, filters, matchers) == ["One", "Two"]
+
+
+def test_compile_and_load_compiled_sites(yaml_path):
+    assert load_compiled_sites(yaml_path) is None
+
+    compiled_sites_path = compile_sites(yaml_path)
+    assert compiled_sites_path == get_compiled_sites_path(yaml_path) == yaml_path.replace(".yaml", ".compiled.json")
+
+    compiled_sites = load_compiled_sites(yaml_path)
+    parsed_sites = parse_sites_yaml(yaml_path)
+    assert [site.name for site in compiled_sites] == [site.name for site in parsed_sites]
+    assert [str(site.url) for site in compiled_sites] == [str(site.url) for site in parsed_sites]
+    assert [[compile_filter(f) for f in site.filters] for site in compiled_sites] == [
+        [compile_filter(f) for f in site.filters] for site in parsed_sites
+    ]
+
+
+def test_load_compiled_sites_outdated(yaml_path):
+    compile_sites(yaml_path)
+    with open(yaml_path, "a") as file:
+        file.write("\n")
+    assert load_compiled_sites(yaml_path) is None
+
+
+def test_get_site_registry_reloads_only_when_changed(yaml_path, monkeypatch):
+    monkeypatch.setattr("newswatch.extract._site_registry", None)
+
+    registry = get_site_registry(yaml_path)
+    assert get_site_registry(yaml_path) is registry
+    assert set(registry.matchers) == {site.name for site in registry.sites}
+
+    with open(yaml_path, "a") as file:
+        file.write("\n")
+    os.utime(yaml_path, ns=(0, 0))
+    assert get_site_registry(yaml_path) is not registry
@@ -0,0 +1,180 @@
+import random
+from collections import Counter
+
+import pytest
+
+from newswatch.common.sketches import CountMinSketch, HeavyHitters, SpaceSaving
+
+
+def test_count_min_sketch_estimates_within_error_bound():
+    rng = random.Random(0)
+    items = [f"phrase {rng.randint(0, 5_000)}" for _ in range(20_000)]
+    sketch = CountMinSketch(width=512, depth=4)
+    for item in items:
+        sketch.add(item)
+
+    true_counts = Counter(items)
+    assert sketch.total == len(items)
+    overestimates = [sketch.estimate(item) - count for item, count in true_counts.items()]
+    assert min(overestimates) >= 0
+    # The bound holds for each item with a probability of 1 - e^-4
+    assert sum(overestimate > sketch.error_bound for overestimate in overestimates) / len(overestimates) < 0.05
+
+
+def test_count_min_sketch_is_stable_across_instances():
+    first, second = CountMinSketch(width=64, depth=3), CountMinSketch(width=64, depth=3)
+    assert first.get_indexes("prime minister") == second.get_indexes("prime minister")
+    assert first.add("prime minister", 3) == 3
+    assert first.estimate("interest rate") <= 3
+
+
+@pytest.mark.parametrize("width,depth", [(0, 4), (16, 0)])
+def test_count_min_sketch_invalid_size(width, depth):
+    with pytest.raises(ValueError):
+        CountMinSketch(width=width, depth=depth)
+
+
+def test_space_saving_counts_exactly_up_to_the_capacity():
+    rng = random.Random(2)
+    items = [f"phrase {rng.randint(0, 99)}" for _ in range(5_000)]
+    space_saving = SpaceSaving(capacity=100)
+    for item in items:
+        space_saving.add(item)
+
+    assert space_saving.is_exact
+    assert space_saving.counts == space_saving.guaranteed_counts() == Counter(items)
+    assert space_saving.total == len(items)
+
+
+def test_space_saving_bounds_the_counts_beyond_the_capacity():
+    rng = random.Random(3)
+    items = [f"phrase {int(rng.paretovariate(0.6))}" for _ in range(20_000)]
+    space_saving = SpaceSaving(capacity=200)
+    for item in items:
+        space_saving.add(item)
+
+    true_counts = Counter(items)
+    assert not space_saving.is_exact
+    assert len(space_saving) == 200
+    assert len(space_saving.heap) <= 400
+    for item, count in space_saving.counts.items():
+        assert count - space_saving.errors.get(item, 0) <= true_counts[item] <= count
+    assert all(true_counts[item] >= count for item, count in space_saving.guaranteed_counts().items())
+    # Every item more frequent than total / capacity is kept
+    assert {item for item, count in true_counts.items() if count > len(items) / 200} <= set(space_saving.counts)
+
+
+def test_space_saving_invalid_capacity():
+    with pytest.raises(ValueError):
+        SpaceSaving(capacity=0)
+
+
+def test_heavy_hitters_keeps_most_frequent_items():
+    heavy_hitters = HeavyHitters(capacity=3)
+    counts = {"prime minister": 50, "interest rate": 30, "world cup": 20, "rare phrase": 1, "other phrase": 2}
+    rng = random.Random(1)
+    stream = [item for item, count in counts.items() for _ in range(count)]
+    rng.shuffle(stream)
+    for item in stream:
+        heavy_hitters.add(item)
+
+    assert len(heavy_hitters) == 3
+    assert heavy_hitters.total == sum(counts.values())
+    assert heavy_hitters.most_common() == [("prime minister", 50), ("interest rate", 30), ("world cup", 20)]
+    assert heavy_hitters.most_common(1) == [("prime minister", 50)]
+
+
+def test_heavy_hitters_bounds_the_heap():
+    heavy_hitters = HeavyHitters(capacity=10)
+    for repeat in range(100):
+        for item in range(20):
+            heavy_hitters.add(f"item {item}", count=item + 1)
+    assert len(heavy_hitters) == 10
+    assert len(heavy_hitters.heap) <= 20
+    assert [item for item, _ in heavy_hitters.most_common(3)] == ["item 19", "item 18", "item 17"]
+
+
+def test_heavy_hitters_merge():
+    first, second = HeavyHitters(capacity=2), HeavyHitters(capacity=2)
+    for item, count in [("election", 10), ("budget", 5), ("storm", 1)]:
+        first.add(item, count)
+    for item, count in [("storm", 20), ("budget", 3)]:
+        second.add(item, count)
+
+    first.merge(second)
+
+    assert first.total == 39
+    assert first.most_common() == [("storm", 21), ("election", 10)]
+    assert first.estimate("budget") == 8
+
+
+def test_heavy_hitters_merge_all_consumes_the_sketches_lazily():
+    def iterate_sketches(consumed: list[int]):
+        for index in range(10):
+            consumed.append(index)
+            sketch = HeavyHitters(capacity=1)
+            sketch.add(f"item{index}", index + 1)
+            sketch.add("common", 5)
+            yield sketch
+
+    consumed: list[int] = []
+    merged = HeavyHitters(capacity=1)
+    sketches = iterate_sketches(consumed)
+    merged.merge_all(sketches)
+
+    assert consumed == list(range(10))
+    # The candidates are pruned to the highest estimates when they exceed 4 times the capacity
+    assert merged.most_common() == [("common", 50)]
+    assert merged.total == 55 + 50
+
+
+def test_heavy_hitters_merge_different_sizes():
+    with pytest.raises(ValueError, match="Cannot merge"):
+        HeavyHitters(sketch=CountMinSketch(width=64)).merge(HeavyHitters(sketch=CountMinSketch(width=128)))
+
+
+def test_heavy_hitters_to_and_from_bytes():
+    heavy_hitters = HeavyHitters(capacity=5, sketch=CountMinSketch(width=256, depth=3))
+    for item, count in [("election", 10), ("budget", 5), ("élection", 2)]:
+        heavy_hitters.add(item, count)
+    heavy_hitters.parts = {"hour=12", "hour=13"}
+
+    data = heavy_hitters.to_bytes()
+    restored = HeavyHitters.from_bytes(data)
+
+    assert restored.most_common() == heavy_hitters.most_common()
+    assert restored.parts == {"hour=12", "hour=13"}
+    assert (restored.capacity, restored.total) == (5, 17)
+    assert restored.sketch.counters == heavy_hitters.sketch.counters
+    restored.add("storm", 11)
+    assert restored.most_common(1) == [("storm", 11)]
+    assert data == heavy_hitters.to_bytes()
+
+
+def test_heavy_hitters_merge_parts():
+    heavy_hitters, other = HeavyHitters(), HeavyHitters()
+    heavy_hitters.parts, other.parts = {"hour=12"}, {"hour=13"}
+
+    heavy_hitters.merge(other)
+
+    assert heavy_hitters.parts == {"hour=12", "hour=13"}
+
+
+def test_heavy_hitters_from_version_1_bytes():
+    import gzip
+    import json
+
+    from newswatch.common.sketches import _SKETCH_HEADER, _SKETCH_MAGIC
+
+    counts = json.dumps({"election": 10}).encode("utf-8")
+    header = _SKETCH_HEADER.pack(_SKETCH_MAGIC, 1, 2, 1, 5, 10, len(counts))
+    restored = HeavyHitters.from_bytes(gzip.compress(header + counts + bytes(16)))
+
+    assert (restored.most_common(), restored.parts) == ([("election", 10)], set())
+
+
+def test_heavy_hitters_from_invalid_bytes():
+    import gzip
+
+    with pytest.raises(ValueError, match="Unsupported sketch format"):
+        HeavyHitters.from_bytes(gzip.compress(b"\0" * 64))
@@ -0,0 +1,154 @@
+import os
+from datetime import datetime
+
+import boto3
+import moto
+import pytest
+
+from newswatch.common.models import Headline
+from newswatch.common.s3_io import get_objects_from_s3, put_objects_to_s3
+from newswatch.common.site_health import load_site_health
+from newswatch.common.storage import (
+    LocalStorage,
+    MemoryStorage,
+    NoSuchKeyError,
+    PreconditionFailedError,
+    S3Storage,
+    create_storage,
+    get_storage,
+)
+from newswatch.common.utils import build_s3_key, get_from_s3, get_s3_object_age_days, put_to_s3
+
+BUCKET = "test-bucket"
+
+
+@pytest.fixture(params=["local", "memory"])
+def storage(request, tmp_path):
+    return LocalStorage(root=str(tmp_path)) if request.param == "local" else MemoryStorage()
+
+
+def test_put_get_and_delete(storage):
+    assert storage.put(BUCKET, "a/b.txt", b"data")["ResponseMetadata"]["HTTPStatusCode"] == 200
+    assert storage.get(BUCKET, "a/b.txt") == b"data"
+    assert storage.get_last_modified(BUCKET, "a/b.txt") is not None
+
+    storage.put(BUCKET, "a/b.txt", b"new data")
+    assert storage.get(BUCKET, "a/b.txt") == b"new data"
+
+    storage.delete(BUCKET, ["a/b.txt", "missing"])
+    with pytest.raises(NoSuchKeyError):
+        storage.get(BUCKET, "a/b.txt")
+    assert storage.get_last_modified(BUCKET, "a/b.txt") is None
+
+
+def test_put_if_version(storage):
+    storage.put_if_version(BUCKET, "state.json", b"first", version=None)
+    with pytest.raises(PreconditionFailedError):
+        storage.put_if_version(BUCKET, "state.json", b"other", version=None)
+
+    data, version = storage.get_versioned(BUCKET, "state.json")
+    assert data == b"first"
+    storage.put_if_version(BUCKET, "state.json", b"second", version=version)
+    with pytest.raises(PreconditionFailedError):
+        storage.put_if_version(BUCKET, "state.json", b"stale", version=version)
+
+    assert storage.get(BUCKET, "state.json") == b"second"
+    assert storage.list_keys(BUCKET, "") == ["state.json"]
+
+
+@moto.mock_aws
+def test_s3_storage_put_if_version():
+    boto3.client("s3", region_name="us-east-1").create_bucket(Bucket=BUCKET)
+    storage = S3Storage()
+    storage.put_if_version(BUCKET, "state.json", b"first", version=None)
+    _, version = storage.get_versioned(BUCKET, "state.json")
+    storage.put(BUCKET, "state.json", b"concurrent")
+
+    with pytest.raises(PreconditionFailedError):
+        storage.put_if_version(BUCKET, "state.json", b"stale", version=version)
+    with pytest.raises(NoSuchKeyError):
+        storage.get_versioned(BUCKET, "missing.json")
+
+
+def test_upload_and_download(storage, tmp_path):
+    source, destination = tmp_path / "source.zip", tmp_path / "destination.zip"
+    source.write_bytes(b"corpus")
+
+    storage.upload(BUCKET, "nltk/corpora/wordnet.zip", str(source))
+    storage.download(BUCKET, "nltk/corpora/wordnet.zip", str(destination))
+
+    assert destination.read_bytes() == b"corpus"
+
+
+def test_list_keys(storage):
+    for key in ["sketches/year=2024/month=01.sketch", "sketches/year=2024/month=01/day=02.sketch", "other/key"]:
+        storage.put(BUCKET, key, b"data")
+
+    assert storage.list_keys(BUCKET, "sketches/year=2024/month=01") == [
+        "sketches/year=2024/month=01.sketch",
+        "sketches/year=2024/month=01/day=02.sketch",
+    ]
+    assert storage.list_keys(BUCKET, "missing/") == []
+    assert storage.list_keys("other-bucket", "") == []
+
+
+@moto.mock_aws
+def test_s3_storage_list_keys():
+    boto3.client("s3", region_name="us-east-1").create_bucket(Bucket=BUCKET)
+    storage = S3Storage()
+    storage.put(BUCKET, "sketches/a.sketch", b"data")
+    storage.put(BUCKET, "other/b.sketch", b"data")
+
+    assert storage.list_keys(BUCKET, "sketches/") == ["sketches/a.sketch"]
+
+
+def test_local_storage_keeps_the_key_layout(tmp_path):
+    LocalStorage(root=str(tmp_path)).put(BUCKET, "headlines/year=2024/month=01/day=01/hour=12.parquet", b"data")
+
+    assert (tmp_path / BUCKET / "headlines" / "year=2024" / "month=01" / "day=01" / "hour=12.parquet").exists()
+    assert os.listdir(tmp_path / BUCKET / "headlines" / "year=2024" / "month=01" / "day=01") == ["hour=12.parquet"]
+
+
+def test_s3_storage_raises_no_such_key():
+    with moto.mock_aws():
+        boto3.client("s3", region_name="us-east-1").create_bucket(Bucket=BUCKET)
+        storage = S3Storage()
+        storage.put(BUCKET, "key", b"data")
+
+        assert storage.get(BUCKET, "key") == b"data"
+        with pytest.raises(NoSuchKeyError):
+            storage.get(BUCKET, "missing")
+        assert storage.get_last_modified(BUCKET, "missing") is None
+
+
+def test_get_storage(monkeypatch, tmp_path):
+    monkeypatch.delenv("STORAGE_BACKEND", raising=False)
+    assert isinstance(get_storage(), S3Storage)
+
+    monkeypatch.setenv("STORAGE_BACKEND", "memory")
+    memory_storage = get_storage()
+    assert isinstance(memory_storage, MemoryStorage)
+    assert get_storage() is memory_storage
+
+    monkeypatch.setenv("STORAGE_BACKEND", "local")
+    monkeypatch.setenv("STORAGE_LOCAL_ROOT", str(tmp_path))
+    assert isinstance(get_storage(), LocalStorage) and get_storage().root == str(tmp_path)
+
+    with pytest.raises(ValueError, match="STORAGE_BACKEND"):
+        create_storage("gcs")
+
+
+@pytest.mark.parametrize("backend", ["local", "memory"])
+def test_helpers_use_the_configured_backend(monkeypatch, tmp_path, test_site_headlines_collection, backend):
+    monkeypatch.setenv("STORAGE_BACKEND", backend)
+    monkeypatch.setenv("STORAGE_LOCAL_ROOT", str(tmp_path))
+    key = build_s3_key(prefix="headlines", timestamp=datetime(2024, 1, 1, 12), extension="parquet")
+
+    put_objects_to_s3(bucket=BUCKET, key=key, objects=test_site_headlines_collection)
+    assert get_objects_from_s3(bucket=BUCKET, key=key, cls=Headline) == test_site_headlines_collection
+
+    put_to_s3(bucket_name=BUCKET, key="state/token-cache.bin", data=b"cache")
+    assert get_from_s3(bucket_name=BUCKET, key="state/token-cache.bin") == b"cache"
+    assert get_s3_object_age_days(bucket=BUCKET, key="state/token-cache.bin") == 0
+    assert get_s3_object_age_days(bucket=BUCKET, key="missing") is None
+    assert load_site_health(bucket=BUCKET, key="state/site-health.json").sites == {}
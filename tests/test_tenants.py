@@ -0,0 +1,190 @@
+import io
+import json
+from datetime import datetime
+from unittest.mock import patch
+
+import boto3
+import moto
+import pyarrow.parquet as pq
+import pytest
+from pydantic import ValidationError
+
+from newswatch.common.models import Headline, Tenant, WordFrequency
+from newswatch.common.tenants import (
+    find_tenant,
+    get_filtered_transform_s3_prefix,
+    get_phrase_transform_s3_prefix,
+    get_tenants,
+    resolve_tenant,
+)
+from newswatch.common.utils import convert_objects_to_parquet_bytes
+from newswatch.load import load
+from newswatch.transform import transform
+
+TENANTS = [
+    {
+        "name": "uk",
+        "bucket": "newswatch-uk",
+        "extract_s3_prefix": "headlines",
+        "transform_s3_prefix": "word-frequencies",
+        "filtered_transform_s3_prefix": "filtered-word-frequencies",
+        "bigquery_table_id": "project.dataset.uk",
+    },
+    {
+        "name": "us",
+        "extract_s3_prefix": "headlines-us",
+        "transform_s3_prefix": "word-frequencies-us",
+        "bigquery_table_id": "project.dataset.us",
+    },
+]
+
+
+@pytest.fixture
+def tenants_env(monkeypatch):
+    monkeypatch.setenv("TENANTS", json.dumps(TENANTS))
+
+
+@pytest.mark.parametrize(
+    "bucket, key, stage, expected_tenant",
+    [
+        ("newswatch-uk", "headlines/year=2023/month=06/day=13/hour=21.parquet", "transform", "uk"),
+        ("newswatch-uk", "headlines-us/year=2023/month=06/day=13/hour=21.parquet", "transform", "us"),
+        ("newswatch-us", "headlines-us/year=2023/month=06/day=13/hour=21.parquet", "transform", "us"),
+        ("newswatch-us", "headlines/year=2023/month=06/day=13/hour=21.parquet", "transform", None),
+        ("newswatch-uk", "word-frequencies/year=2023/month=06/day=13/hour=21.parquet", "load", "uk"),
+        ("newswatch-uk", "filtered-word-frequencies/year=2023/month=06/day=13/hour=21.parquet", "load", "uk"),
+        ("newswatch-us", "word-frequencies-us/year=2023/month=06/day=13/hour=21.parquet", "load", "us"),
+        ("newswatch-uk", "us/filtered-word-frequencies/year=2023/month=06/day=13/hour=21.parquet", "load", "us"),
+        ("newswatch-uk", "word-frequencies/year=2023/month=06/day=13/hour=21.parquet", "transform", None),
+    ],
+)
+def test_find_tenant(tenants_env, bucket, key, stage, expected_tenant):
+    tenant = find_tenant(get_tenants(), bucket, key, stage)
+    assert (tenant.name if tenant else None) == expected_tenant
+
+
+def test_resolve_tenant(monkeypatch, tenants_env):
+    with pytest.raises(ValueError):
+        resolve_tenant("newswatch-uk", "other/year=2023/month=06/day=13/hour=21.parquet", "transform")
+
+    monkeypatch.delenv("TENANTS")
+    assert resolve_tenant("newswatch-uk", "other/year=2023/month=06/day=13/hour=21.parquet", "transform") is None
+
+
+def test_get_tenants_invalid(monkeypatch):
+    monkeypatch.setenv("TENANTS", json.dumps([{"name": "uk"}]))
+    with pytest.raises(ValidationError):
+        get_tenants()
+
+
+@pytest.mark.parametrize(
+    "other_tenant",
+    [
+        # The same name as the first tenant
+        {**TENANTS[1], "name": "uk"},
+        # The same transform prefix in the bucket of the first tenant
+        {**TENANTS[1], "transform_s3_prefix": "word-frequencies"},
+        # The same filtered prefix in the bucket of the first tenant
+        {**TENANTS[1], "filtered_transform_s3_prefix": "filtered-word-frequencies"},
+        # The phrase frequencies of the second tenant written as the filtered word frequencies of the first
+        {**TENANTS[1], "phrase_transform_s3_prefix": "filtered-word-frequencies"},
+    ],
+)
+def test_get_tenants_colliding_locations(monkeypatch, other_tenant):
+    monkeypatch.setenv("TENANTS", json.dumps([TENANTS[0], other_tenant]))
+    with pytest.raises(ValueError):
+        get_tenants()
+
+
+def test_get_tenant_locations(monkeypatch):
+    monkeypatch.setenv("TRANSFORM_FILTERED_S3_PREFIX", "filtered-word-frequencies")
+    monkeypatch.delenv("TRANSFORM_NGRAMS_S3_PREFIX", raising=False)
+    uk, us = (Tenant(**tenant) for tenant in TENANTS)
+
+    assert get_filtered_transform_s3_prefix(uk) == "filtered-word-frequencies"
+    assert get_filtered_transform_s3_prefix(us) == "us/filtered-word-frequencies"
+    assert get_filtered_transform_s3_prefix(None) == "filtered-word-frequencies"
+    assert get_phrase_transform_s3_prefix(us) == "us/phrase-frequencies"
+    assert get_phrase_transform_s3_prefix(None) == "phrase-frequencies"
+
+
+def test_get_tenants_same_locations_in_other_buckets(monkeypatch):
+    monkeypatch.setenv("TENANTS", json.dumps([TENANTS[0], {**TENANTS[0], "name": "us", "bucket": "newswatch-us"}]))
+    assert [tenant.name for tenant in get_tenants()] == ["uk", "us"]
+
+
+@moto.mock_aws
+@patch("newswatch.transform.get_wordnet_corpus")
+def test_transform_routes_to_tenant_prefix(_mock_corpus, monkeypatch, tenants_env, test_timestamp: datetime):
+    monkeypatch.setenv("TRANSFORM_S3_PREFIX", "not-used")
+    monkeypatch.setenv("TRANSFORM_PREFILTER", "none")
+    monkeypatch.delenv("TOKEN_CACHE_S3_KEY", raising=False)
+    bucket = "newswatch-uk"
+    s3_client = boto3.client("s3", region_name="us-east-1")
+    s3_client.create_bucket(Bucket=bucket)
+    headlines = [Headline(site_name="site", timestamp=test_timestamp, headline="cat and dog")]
+    s3_client.put_object(
+        Bucket=bucket,
+        Key="headlines-us/year=2023/month=06/day=13/hour=21.parquet",
+        Body=convert_objects_to_parquet_bytes(headlines),
+    )
+
+    transform(bucket, "headlines-us/year=2023/month=06/day=13/hour=21.parquet")
+
+    keys = [obj["Key"] for obj in s3_client.list_objects_v2(Bucket=bucket, Prefix="word-frequencies")["Contents"]]
+    assert keys == ["word-frequencies-us/year=2023/month=06/day=13/hour=21.parquet"]
+
+
+@moto.mock_aws
+@patch("newswatch.transform.get_wordnet_corpus")
+def test_transform_separate_prefilter_of_tenants_sharing_a_bucket(
+    _mock_corpus, monkeypatch, tenants_env, test_timestamp: datetime
+):
+    monkeypatch.setenv("TRANSFORM_PREFILTER", "separate")
+    monkeypatch.setenv("TRANSFORM_FILTERED_S3_PREFIX", "filtered-word-frequencies")
+    monkeypatch.setenv("MIN_WORD_LENGTH", "3")
+    monkeypatch.setenv("MIN_FREQUENCY", "0")
+    monkeypatch.setattr("newswatch.transform.excluded_words_txt_path", "")
+    monkeypatch.delenv("TOKEN_CACHE_S3_KEY", raising=False)
+    bucket = "newswatch-uk"
+    s3_client = boto3.client("s3", region_name="us-east-1")
+    s3_client.create_bucket(Bucket=bucket)
+    for extract_s3_prefix, headline in [("headlines", "robin and owl"), ("headlines-us", "eagle and hawk")]:
+        s3_client.put_object(
+            Bucket=bucket,
+            Key=f"{extract_s3_prefix}/year=2023/month=06/day=13/hour=21.parquet",
+            Body=convert_objects_to_parquet_bytes(
+                [Headline(site_name="site", timestamp=test_timestamp, headline=headline)]
+            ),
+        )
+
+    transform(bucket, "headlines/year=2023/month=06/day=13/hour=21.parquet")
+    transform(bucket, "headlines-us/year=2023/month=06/day=13/hour=21.parquet")
+
+    words_by_tenant = {}
+    for obj in s3_client.list_objects_v2(Bucket=bucket)["Contents"]:
+        if "filtered-word-frequencies" in obj["Key"]:
+            tenant = find_tenant(get_tenants(), bucket, obj["Key"], "load")
+            parquet_bytes = s3_client.get_object(Bucket=bucket, Key=obj["Key"])["Body"].read()
+            words_by_tenant[tenant.name] = sorted(pq.read_table(io.BytesIO(parquet_bytes)).column("word").to_pylist())
+    assert words_by_tenant == {"uk": ["and", "owl", "robin"], "us": ["and", "eagle", "hawk"]}
+
+
+@moto.mock_aws
+@patch("newswatch.load.delete_timestamp_from_bigquery")
+@patch("newswatch.load.insert_data_into_bigquery_table")
+def test_load_routes_to_tenant_table(mock_insert, _mock_delete, monkeypatch, tenants_env, test_timestamp: datetime):
+    monkeypatch.setenv("BIGQUERY_TABLE_ID", "not-used")
+    monkeypatch.setattr("newswatch.load.excluded_words_txt_path", "")
+    bucket = "newswatch-uk"
+    s3_client = boto3.client("s3", region_name="us-east-1")
+    s3_client.create_bucket(Bucket=bucket)
+    s3_client.put_object(
+        Bucket=bucket,
+        Key="filtered-word-frequencies/year=2023/month=06/day=13/hour=21.parquet",
+        Body=convert_objects_to_parquet_bytes([WordFrequency(word="cat", frequency=50000, timestamp=test_timestamp)]),
+    )
+
+    load(bucket, "filtered-word-frequencies/year=2023/month=06/day=13/hour=21.parquet")
+
+    assert mock_insert.call_args.kwargs["table_id"] == "project.dataset.uk"
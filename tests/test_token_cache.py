@@ -0,0 +1,64 @@
+import gzip
+import json
+
+from newswatch.common.token_cache import TokenCountCache
+
+
+def test_get_or_compute():
+    cache = TokenCountCache()
+    assert cache.get_or_compute("a", lambda: ["cat"]) == ["cat"]
+    assert cache.get_or_compute("a", lambda: ["dog"]) == ["cat"]
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.hit_rate == 0.5
+    assert cache.estimated_saved_ms == cache.miss_time_ms
+
+
+def test_get_does_not_count_hits_or_misses():
+    cache = TokenCountCache()
+    cache.put("a", ["cat"])
+    assert (cache.get("a"), cache.get("b")) == (["cat"], None)
+    assert (cache.hits, cache.misses) == (0, 0)
+
+
+def test_lru_eviction():
+    cache = TokenCountCache(max_entries=2)
+    cache.put("a", ["cat"])
+    cache.put("b", ["dog"])
+    cache.get_or_compute("a", list)
+    cache.put("c", ["mouse"])
+    assert list(cache.entries) == ["a", "c"]
+
+
+def test_reset_stats():
+    cache = TokenCountCache()
+    cache.get_or_compute("a", list)
+    cache.reset_stats()
+    assert (cache.hits, cache.misses, cache.hit_rate, cache.estimated_saved_ms) == (0, 0, 0.0, 0.0)
+    assert len(cache) == 1
+
+
+def test_bytes_round_trip_keeps_lru_order():
+    cache = TokenCountCache()
+    cache.put("a", ["cat", "cat"])
+    cache.put("b", ["dog"])
+    cache.get_or_compute("a", list)
+
+    loaded = TokenCountCache.from_bytes(cache.to_bytes(), max_entries=1)
+    assert loaded.entries == {"a": ["cat", "cat"]}
+    assert not loaded.changed
+
+
+def test_from_bytes_unsupported_format_starts_empty():
+    cache = TokenCountCache()
+    cache.put("a", ["cat", "cat"])
+    data = json.loads(gzip.decompress(cache.to_bytes()))
+    data["format_version"] = 99
+    assert len(TokenCountCache.from_bytes(gzip.compress(json.dumps(data).encode()))) == 0
+
+
+def test_from_bytes_with_another_lemmatiser_starts_empty():
+    cache = TokenCountCache()
+    cache.put("a", ["word"])
+
+    assert len(TokenCountCache.from_bytes(cache.to_bytes())) == 1
+    assert len(TokenCountCache.from_bytes(cache.to_bytes(), lemmatiser="lookup")) == 0
@@ -1,18 +1,34 @@
+import io
+import random
 from collections import Counter
 from unittest.mock import ANY, patch
 
+import boto3
+import moto
+import pyarrow.parquet as pq
 import pytest
 
 from newswatch.common.models import Headline, WordFrequency
+from newswatch.common.ngrams import iterate_ngrams
+from newswatch.common.token_cache import TokenCountCache
+from newswatch.common.utils import convert_objects_to_parquet_bytes
 from newswatch.transform import (
     calculate_word_frequencies,
     calculate_word_frequencies_by_site,
+    count_words_in_headlines,
     count_words_in_text,
     filter_sites,
+    get_prefilter_mode,
+    get_token_count_cache,
     get_wordnet_corpus,
     group_headlines_by_site,
+    lemmatise_words_in_text,
     merge_site_word_frequencies,
+    prefilter_word_frequencies,
+    put_token_count_cache,
     sum_frequencies,
+    transform,
+    transform_phrases,
 )
 
 
@@ -70,6 +86,58 @@ def test_count_words_in_text(text: str, expected_word_counts: dict) -> None:
     assert count_words_in_text(text) == expected_word_counts, f"Counting words failed for text: {text}"
 
 
+def test_count_words_in_headlines(test_timestamp):
+    headline_strings = ["Cats chase dogs", "Dogs chase cats!", "More cats", "Cats chase dogs"]
+    headlines = [Headline(site_name="site", timestamp=test_timestamp, headline=h) for h in headline_strings]
+    token_count_cache = TokenCountCache()
+
+    with patch("newswatch.transform.lemmatise_words_in_text", wraps=lemmatise_words_in_text) as mock_lemmatise:
+        word_counts = count_words_in_headlines(headlines, token_count_cache)
+    assert word_counts == Counter(count_words_in_text(" ".join(headline_strings)))
+    assert mock_lemmatise.call_count == 3
+    assert (token_count_cache.hits, token_count_cache.misses) == (1, 3)
+
+    with patch("newswatch.transform.lemmatise_words_in_text", wraps=lemmatise_words_in_text) as mock_lemmatise:
+        assert count_words_in_headlines(headlines, token_count_cache) == word_counts
+    assert mock_lemmatise.call_count == 0
+
+
+def test_calculate_word_frequencies_by_site_matches_combined_text(test_timestamp):
+    headline_strings = ["The cats chased the dogs", "Dogs, cats and mice", "Mice!"]
+    headlines = [Headline(site_name="site", timestamp=test_timestamp, headline=h) for h in headline_strings]
+    combined_frequencies = calculate_word_frequencies(" ".join(headline_strings))
+    token_count_cache = TokenCountCache()
+
+    for _ in range(2):
+        result = calculate_word_frequencies_by_site(
+            {"site": headlines}, test_timestamp, token_count_cache=token_count_cache
+        )
+        assert {wf.word: wf.frequency for wf in result["site"]} == {
+            word: int(freq) for word, freq in combined_frequencies.items()
+        }
+    assert token_count_cache.hits == 3
+
+
+@patch("newswatch.transform.get_from_s3")
+def test_get_and_put_token_count_cache_file(mock_get_from_s3, monkeypatch, tmp_path):
+    cache_path = tmp_path / "token-count-cache.json.gz"
+    monkeypatch.delenv("TOKEN_CACHE_S3_KEY", raising=False)
+    monkeypatch.setenv("TOKEN_CACHE_PATH", str(cache_path))
+    monkeypatch.setattr("newswatch.transform._token_count_cache", None)
+
+    token_count_cache = get_token_count_cache("test-bucket")
+    assert len(token_count_cache) == 0
+    token_count_cache.get_or_compute("fingerprint", lambda: ["cat"])
+    put_token_count_cache("test-bucket", token_count_cache)
+    assert cache_path.exists()
+    assert not token_count_cache.changed
+
+    # A cold start loads the cache from the file
+    monkeypatch.setattr("newswatch.transform._token_count_cache", None)
+    assert get_token_count_cache("test-bucket").entries == {"fingerprint": ["cat"]}
+    mock_get_from_s3.assert_not_called()
+
+
 def test_group_headlines_by_site(test_site_headlines_collection):
     grouped = group_headlines_by_site(test_site_headlines_collection)
     assert set(grouped.keys()) == {"abc", "def"}
@@ -167,3 +235,189 @@ def test_merge_site_word_frequencies(test_timestamp):
     assert merged_thresh_dict["apple"] == 150
     assert merged_thresh_dict["orange"] == 75
     assert "banana" not in merged_thresh_dict
+
+
+@pytest.mark.parametrize(
+    "env_value, expected_mode",
+    [(None, "none"), ("none", "none"), ("INLINE", "inline"), ("separate", "separate")],
+)
+def test_get_prefilter_mode(monkeypatch, env_value, expected_mode):
+    if env_value is None:
+        monkeypatch.delenv("TRANSFORM_PREFILTER", raising=False)
+    else:
+        monkeypatch.setenv("TRANSFORM_PREFILTER", env_value)
+    assert get_prefilter_mode() == expected_mode
+
+
+def test_get_prefilter_mode_invalid(monkeypatch):
+    monkeypatch.setenv("TRANSFORM_PREFILTER", "sometimes")
+    with pytest.raises(ValueError):
+        get_prefilter_mode()
+
+
+def test_prefilter_word_frequencies(monkeypatch, tmp_path, test_timestamp):
+    excluded_words_txt = tmp_path / "excluded-words.txt"
+    excluded_words_txt.write_text("orange\n")
+    monkeypatch.setattr("newswatch.transform.excluded_words_txt_path", str(excluded_words_txt))
+    monkeypatch.setenv("MIN_WORD_LENGTH", "3")
+    monkeypatch.setenv("MIN_FREQUENCY", "100")
+
+    word_frequencies = [
+        WordFrequency(word="apple", frequency=150, timestamp=test_timestamp),
+        WordFrequency(word="orange", frequency=150, timestamp=test_timestamp),
+        WordFrequency(word="banana", frequency=50, timestamp=test_timestamp),
+        WordFrequency(word="ox", frequency=150, timestamp=test_timestamp),
+    ]
+
+    assert [wf.word for wf in prefilter_word_frequencies(word_frequencies)] == ["apple"]
+
+
+@moto.mock_aws
+@patch("newswatch.transform.get_wordnet_corpus")
+def test_transform_with_separate_prefilter(_mock_corpus, monkeypatch, tmp_path, test_timestamp):
+    excluded_words_txt = tmp_path / "excluded-words.txt"
+    excluded_words_txt.write_text("the\n")
+    monkeypatch.setattr("newswatch.transform.excluded_words_txt_path", str(excluded_words_txt))
+    monkeypatch.setenv("TRANSFORM_S3_PREFIX", "word-frequencies")
+    monkeypatch.setenv("TRANSFORM_PREFILTER", "separate")
+    monkeypatch.setenv("TRANSFORM_FILTERED_S3_PREFIX", "filtered-word-frequencies")
+    monkeypatch.setenv("MIN_WORD_LENGTH", "3")
+    monkeypatch.setenv("MIN_FREQUENCY", "20000")
+
+    bucket = "test-bucket"
+    s3_client = boto3.client("s3", region_name="us-east-1")
+    s3_client.create_bucket(Bucket=bucket)
+    headlines = [
+        Headline(site_name="site", timestamp=test_timestamp, headline="The cat and the dog chased the cat"),
+    ]
+    s3_client.put_object(
+        Bucket=bucket,
+        Key="headlines/year=2023/month=06/day=13/hour=21.parquet",
+        Body=convert_objects_to_parquet_bytes(headlines),
+    )
+
+    transform(bucket, "headlines/year=2023/month=06/day=13/hour=21.parquet")
+
+    def _read_words(key: str) -> set[str]:
+        parquet_bytes = s3_client.get_object(Bucket=bucket, Key=key)["Body"].read()
+        return {row["word"] for row in pq.read_table(io.BytesIO(parquet_bytes)).to_pylist()}
+
+    assert _read_words("word-frequencies/year=2023/month=06/day=13/hour=21.parquet") == {
+        "the",
+        "cat",
+        "and",
+        "dog",
+        "chased",
+    }
+    assert _read_words("filtered-word-frequencies/year=2023/month=06/day=13/hour=21.parquet") == {"cat"}
+
+
+def test_transform_phrases(monkeypatch, tmp_path, test_timestamp):
+    excluded_words_txt = tmp_path / "excluded-words.txt"
+    excluded_words_txt.write_text("the\nof\n")
+    monkeypatch.setattr("newswatch.transform.excluded_words_txt_path", str(excluded_words_txt))
+    monkeypatch.setenv("TRANSFORM_WORD_COUNT_THRESHOLD", "3")
+    monkeypatch.delenv("TRANSFORM_NGRAMS_MAX_ENTRIES", raising=False)
+    headlines = [
+        Headline(site_name="site1", timestamp=test_timestamp, headline="Prime minister raises interest rates"),
+        Headline(site_name="site1", timestamp=test_timestamp, headline="Interest rates rise"),
+        Headline(site_name="site2", timestamp=test_timestamp, headline="The prime minister of the day"),
+        # Too few distinct words, so the site is not averaged like in merge_site_word_frequencies
+        Headline(site_name="site3", timestamp=test_timestamp, headline="Interest rates"),
+    ]
+
+    phrase_frequencies = {wf.word: wf.frequency for wf in transform_phrases(headlines, test_timestamp, [2])}
+
+    # site1 has 6 bigrams and site2 has 1 bigram, averaged over the 2 sites
+    assert phrase_frequencies == {
+        "prime minister": (100_000 // 6 + 100_000) // 2,
+        "interest rate": (2 * 100_000 // 6) // 2,
+        "minister raise": (100_000 // 6) // 2,
+        "raise interest": (100_000 // 6) // 2,
+        "rate rise": (100_000 // 6) // 2,
+    }
+
+
+def test_transform_phrases_keeps_the_most_frequent_per_site(monkeypatch, test_timestamp):
+    monkeypatch.setattr("newswatch.transform.excluded_words_txt_path", "")
+    monkeypatch.setenv("TRANSFORM_WORD_COUNT_THRESHOLD", "0")
+    monkeypatch.setenv("TRANSFORM_NGRAMS_MAX_ENTRIES", "2")
+    headlines = [
+        Headline(site_name="site", timestamp=test_timestamp, headline="World cup final"),
+        Headline(site_name="site", timestamp=test_timestamp, headline="World cup draw"),
+        Headline(site_name="site", timestamp=test_timestamp, headline="World cup"),
+    ]
+
+    phrase_frequencies = transform_phrases(headlines, test_timestamp, [2])
+
+    # The frequency is relative to all 5 bigrams of the site, not only the ones kept
+    assert [(wf.word, wf.frequency) for wf in phrase_frequencies] == [("world cup", 60_000), ("cup draw", 20_000)]
+    phrase_frequencies = transform_phrases(headlines[:1], test_timestamp, [3, 4])
+    assert [(wf.word, wf.frequency) for wf in phrase_frequencies] == [("world cup final", 100_000)]
+
+
+def test_transform_phrases_writes_exact_frequencies(monkeypatch, test_timestamp):
+    monkeypatch.setattr("newswatch.transform.excluded_words_txt_path", "")
+    monkeypatch.setenv("TRANSFORM_WORD_COUNT_THRESHOLD", "0")
+    monkeypatch.delenv("TRANSFORM_NGRAMS_MAX_ENTRIES", raising=False)
+    rng = random.Random(0)
+    words = [f"word{i}" for i in range(300)]
+    texts = [" ".join(rng.choices(words, k=8)) for _ in range(1000)]
+    headlines = [Headline(site_name="site", timestamp=test_timestamp, headline=text) for text in texts]
+
+    phrase_frequencies = transform_phrases(headlines, test_timestamp, [2])
+
+    # About 7,000 distinct bigrams, fewer than the 10,000 kept, so none of them may be overestimated
+    exact_counts = Counter(
+        phrase for text in texts for phrase in iterate_ngrams(lemmatise_words_in_text(text), [2], set())
+    )
+    total = sum(exact_counts.values())
+    assert {wf.word: wf.frequency for wf in phrase_frequencies} == {
+        phrase: int(count * 100_000 / total) for phrase, count in exact_counts.items()
+    }
+
+
+def test_transform_phrases_reuses_the_words_of_the_word_pass(monkeypatch, test_timestamp):
+    monkeypatch.setattr("newswatch.transform.excluded_words_txt_path", "")
+    monkeypatch.setenv("TRANSFORM_WORD_COUNT_THRESHOLD", "0")
+    headlines = [Headline(site_name="site", timestamp=test_timestamp, headline="Interest rates rise")]
+    token_count_cache = TokenCountCache()
+    count_words_in_headlines(headlines, token_count_cache)
+
+    with patch("newswatch.transform.lemmatise_words_in_text", wraps=lemmatise_words_in_text) as mock_lemmatise:
+        phrase_frequencies = transform_phrases(headlines, test_timestamp, [2], token_count_cache)
+    assert mock_lemmatise.call_count == 0
+    assert (token_count_cache.hits, token_count_cache.misses) == (0, 1)
+    assert {wf.word for wf in phrase_frequencies} == {"interest rate", "rate rise"}
+
+
+@moto.mock_aws
+@patch("newswatch.transform.get_wordnet_corpus")
+def test_transform_writes_phrase_frequencies(_mock_corpus, monkeypatch, test_timestamp):
+    monkeypatch.setattr("newswatch.transform.excluded_words_txt_path", "")
+    monkeypatch.setenv("TRANSFORM_S3_PREFIX", "word-frequencies")
+    monkeypatch.setenv("TRANSFORM_PREFILTER", "none")
+    monkeypatch.setenv("TRANSFORM_WORD_COUNT_THRESHOLD", "0")
+    monkeypatch.setenv("TRANSFORM_NGRAMS", "2")
+    monkeypatch.setenv("TRANSFORM_NGRAMS_S3_PREFIX", "phrase-frequencies")
+
+    bucket = "test-bucket"
+    s3_client = boto3.client("s3", region_name="us-east-1")
+    s3_client.create_bucket(Bucket=bucket)
+    headline_key = "headlines/year=2023/month=06/day=13/hour=21.parquet"
+    s3_client.put_object(
+        Bucket=bucket,
+        Key=headline_key,
+        Body=convert_objects_to_parquet_bytes(
+            [Headline(site_name="site", timestamp=test_timestamp, headline="Interest rates rise")],
+        ),
+    )
+
+    transform(bucket, headline_key)
+
+    parquet_bytes = s3_client.get_object(
+        Bucket=bucket, Key="phrase-frequencies/year=2023/month=06/day=13/hour=21.parquet"
+    )["Body"].read()
+    rows = pq.read_table(io.BytesIO(parquet_bytes)).to_pylist()
+    assert {row["word"]: row["frequency"] for row in rows} == {"interest rate": 50_000, "rate rise": 50_000}
+    s3_client.head_object(Bucket=bucket, Key="word-frequencies/year=2023/month=06/day=13/hour=21.parquet")
@@ -22,8 +22,10 @@ from newswatch.common.utils import (
     get_logger,
     get_s3_object_age_days,
     put_to_s3,
+    update_s3_object,
     upload_to_s3,
 )
+from common.storage import PreconditionFailedError
 
 
 @pytest.mark.parametrize(
@@ -210,3 +212,31 @@ def test_upload_to_s3(s3_setup, test_key, test_data, test_file):
 
     assert response["ResponseMetadata"]["HTTPStatusCode"] == 200
     assert s3_client.get_object(Bucket=test_bucket, Key=test_key)["Body"].read().decode("utf-8") == test_data
+
+
+def test_update_s3_object(s3_setup, test_key):
+    s3_client, test_bucket = s3_setup
+    seen = []
+
+    def append(data):
+        seen.append(data)
+        if len(seen) == 1:
+            # Another invocation writes the object while this one is updating it
+            s3_client.put_object(Bucket=test_bucket, Key=test_key, Body=b"a,c")
+        return (data + b"," if data else b"") + b"b"
+
+    assert update_s3_object(bucket_name=test_bucket, key=test_key, update=lambda data: b"a") == b"a"
+    assert update_s3_object(bucket_name=test_bucket, key=test_key, update=append) == b"a,c,b"
+    assert seen == [b"a", b"a,c"]
+    assert s3_client.get_object(Bucket=test_bucket, Key=test_key)["Body"].read() == b"a,c,b"
+
+
+def test_update_s3_object_gives_up(s3_setup, test_key):
+    s3_client, test_bucket = s3_setup
+
+    def conflict(data):
+        s3_client.put_object(Bucket=test_bucket, Key=test_key, Body=(data or b"") + b"other")
+        return b"data"
+
+    with pytest.raises(PreconditionFailedError):
+        update_s3_object(bucket_name=test_bucket, key=test_key, update=conflict, max_attempts=2)
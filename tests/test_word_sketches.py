@@ -0,0 +1,229 @@
+from datetime import datetime
+
+import pytest
+
+from newswatch.common.models import Tenant
+from newswatch.common.records import WordFrequencyRecord
+from newswatch.common import word_sketches
+from newswatch.common.utils import put_to_s3
+from newswatch.common.word_sketches import (
+    build_word_sketch,
+    build_word_sketch_s3_key,
+    get_word_sketch_keys,
+    put_word_sketches,
+    query_word_sketches,
+)
+from newswatch.load import load_word_frequencies, update_word_sketches
+
+BUCKET = "test-bucket"
+PREFIX = "word-sketches"
+
+
+def build_word_frequencies(timestamp: datetime, frequencies: dict[str, int]) -> list[WordFrequencyRecord]:
+    return [
+        WordFrequencyRecord(word=word, frequency=frequency, timestamp=timestamp)
+        for word, frequency in frequencies.items()
+    ]
+
+
+@pytest.mark.parametrize(
+    "granularity,expected_key",
+    [
+        ("hour", "word-sketches/year=2024/month=01/day=05/hour=12.sketch"),
+        ("day", "word-sketches/year=2024/month=01/day=05.sketch"),
+        ("month", "word-sketches/year=2024/month=01.sketch"),
+    ],
+)
+def test_build_word_sketch_s3_key(granularity, expected_key):
+    assert build_word_sketch_s3_key(PREFIX, datetime(2024, 1, 5, 12, 30), granularity) == expected_key
+
+
+@pytest.mark.parametrize(
+    "start,end,expected_partitions",
+    [
+        (datetime(2024, 1, 5, 12), datetime(2024, 1, 5, 14), ["day=05/hour=12", "day=05/hour=13"]),
+        (datetime(2024, 1, 5), datetime(2024, 1, 7), ["day=05", "day=06"]),
+        (datetime(2024, 1, 1), datetime(2024, 2, 1), ["month=01"]),
+        (
+            datetime(2023, 12, 31, 23),
+            datetime(2024, 2, 2, 1),
+            ["2023/month=12/day=31/hour=23", "month=01", "month=02/day=01", "month=02/day=02/hour=00"],
+        ),
+        (datetime(2024, 1, 5), datetime(2024, 1, 5), []),
+    ],
+)
+def test_get_word_sketch_keys(start, end, expected_partitions):
+    keys = get_word_sketch_keys(PREFIX, start, end)
+
+    assert len(keys) == len(expected_partitions)
+    assert all(key.removesuffix(".sketch").endswith(partition) for key, partition in zip(keys, expected_partitions))
+
+
+def test_build_word_sketch():
+    word_sketch = build_word_sketch(build_word_frequencies(datetime(2024, 1, 5), {"election": 300, "budget": 100}))
+
+    assert word_sketch.most_common() == [("election", 300), ("budget", 100)]
+    assert word_sketch.total == 400
+
+
+def test_put_and_query_word_sketches(monkeypatch, tmp_path):
+    monkeypatch.setenv("STORAGE_BACKEND", "local")
+    monkeypatch.setenv("STORAGE_LOCAL_ROOT", str(tmp_path))
+    hours = {
+        datetime(2024, 1, 5, 12): {"election": 300, "budget": 100},
+        datetime(2024, 1, 5, 13): {"election": 200, "storm": 250},
+        datetime(2024, 1, 6, 0): {"storm": 500},
+        datetime(2024, 2, 1, 0): {"budget": 1000},
+    }
+    for timestamp, frequencies in hours.items():
+        put_word_sketches(BUCKET, PREFIX, timestamp, build_word_frequencies(timestamp, frequencies))
+    # Loading an hour again replaces it in the day and the month
+    put_word_sketches(
+        BUCKET,
+        PREFIX,
+        datetime(2024, 1, 5, 12),
+        build_word_frequencies(datetime(2024, 1, 5, 12), hours[datetime(2024, 1, 5, 12)]),
+    )
+
+    january, missing_keys = query_word_sketches(BUCKET, datetime(2024, 1, 1), datetime(2024, 2, 1), prefix=PREFIX)
+    assert missing_keys == []
+    assert january.most_common() == [("storm", 750), ("election", 500), ("budget", 100)]
+
+    january_5th, _ = query_word_sketches(BUCKET, datetime(2024, 1, 5), datetime(2024, 1, 6), prefix=PREFIX)
+    assert january_5th.most_common(1) == [("election", 500)]
+
+    # January as one month sketch, February 1st as one day sketch and the hours of the 2nd
+    both_months, missing_keys = query_word_sketches(
+        BUCKET, datetime(2024, 1, 1), datetime(2024, 2, 2, 2), prefix=PREFIX
+    )
+    assert both_months.most_common(2) == [("budget", 1100), ("storm", 750)]
+    assert both_months.estimate("election") == 500
+    assert len(missing_keys) == 2
+
+    assert query_word_sketches(BUCKET, datetime(2023, 1, 1), datetime(2023, 2, 1), prefix=PREFIX) == (
+        None,
+        [f"{PREFIX}/year=2023/month=01.sketch"],
+    )
+
+
+def test_put_word_sketches_adds_the_hour_without_reading_the_others(monkeypatch, tmp_path):
+    monkeypatch.setenv("STORAGE_BACKEND", "local")
+    monkeypatch.setenv("STORAGE_LOCAL_ROOT", str(tmp_path))
+    for hour, frequencies in enumerate([{"election": 300}, {"budget": 100}]):
+        timestamp = datetime(2024, 1, 5, hour)
+        put_word_sketches(BUCKET, PREFIX, timestamp, build_word_frequencies(timestamp, frequencies))
+
+    def get_from_s3(bucket_name, key):
+        raise AssertionError(f"{key} was read")
+
+    with monkeypatch.context() as context:
+        context.setattr(word_sketches, "get_from_s3", get_from_s3)
+        timestamp = datetime(2024, 1, 5, 2)
+        put_word_sketches(BUCKET, PREFIX, timestamp, build_word_frequencies(timestamp, {"storm": 200}))
+
+    day, _ = query_word_sketches(BUCKET, datetime(2024, 1, 5), datetime(2024, 1, 6), prefix=PREFIX)
+    month, _ = query_word_sketches(BUCKET, datetime(2024, 1, 1), datetime(2024, 2, 1), prefix=PREFIX)
+    assert day.most_common() == month.most_common() == [("election", 300), ("storm", 200), ("budget", 100)]
+    assert len(month.parts) == 3
+
+
+def test_put_word_sketches_rebuilds_a_period_missing_an_hour(monkeypatch, tmp_path):
+    monkeypatch.setenv("STORAGE_BACKEND", "local")
+    monkeypatch.setenv("STORAGE_LOCAL_ROOT", str(tmp_path))
+    timestamp = datetime(2024, 1, 5, 12)
+    put_word_sketches(BUCKET, PREFIX, timestamp, build_word_frequencies(timestamp, {"election": 300}))
+    # A load failed after writing the sketch of its hour
+    failed_hour_key = build_word_sketch_s3_key(PREFIX, datetime(2024, 1, 5, 13), "hour")
+    failed_hour_sketch = build_word_sketch(build_word_frequencies(datetime(2024, 1, 5, 13), {"budget": 100}))
+    failed_hour_sketch.parts = {failed_hour_key}
+    put_to_s3(BUCKET, failed_hour_key, failed_hour_sketch.to_bytes())
+
+    timestamp = datetime(2024, 1, 5, 14)
+    put_word_sketches(BUCKET, PREFIX, timestamp, build_word_frequencies(timestamp, {"storm": 200}))
+
+    month, _ = query_word_sketches(BUCKET, datetime(2024, 1, 1), datetime(2024, 2, 1), prefix=PREFIX)
+    assert month.most_common() == [("election", 300), ("storm", 200), ("budget", 100)]
+
+
+def test_put_word_sketches_keeps_the_hour_of_a_concurrent_load(monkeypatch, tmp_path):
+    monkeypatch.setenv("STORAGE_BACKEND", "local")
+    monkeypatch.setenv("STORAGE_LOCAL_ROOT", str(tmp_path))
+    hours = {
+        datetime(2024, 1, 5, 11): {"budget": 100},
+        datetime(2024, 1, 5, 12): {"election": 300},
+        datetime(2024, 1, 5, 13): {"storm": 200},
+    }
+    first, second, concurrent = hours
+    put_word_sketches(BUCKET, PREFIX, first, build_word_frequencies(first, hours[first]))
+    list_s3_keys = word_sketches.list_s3_keys
+    concurrent_loads = []
+
+    def list_s3_keys_during_a_concurrent_load(bucket, prefix):
+        keys = list_s3_keys(bucket=bucket, prefix=prefix)
+        if not concurrent_loads:
+            # Another load adds its hour to the day and the month while this one is adding its own
+            concurrent_loads.append(concurrent)
+            put_word_sketches(BUCKET, PREFIX, concurrent, build_word_frequencies(concurrent, hours[concurrent]))
+        return keys
+
+    monkeypatch.setattr(word_sketches, "list_s3_keys", list_s3_keys_during_a_concurrent_load)
+    put_word_sketches(BUCKET, PREFIX, second, build_word_frequencies(second, hours[second]))
+
+    for end in (datetime(2024, 1, 6), datetime(2024, 2, 1)):
+        word_sketch, _ = query_word_sketches(BUCKET, datetime(2024, 1, 1), end, prefix=PREFIX)
+        assert word_sketch.most_common() == [("election", 300), ("storm", 200), ("budget", 100)]
+
+
+def test_update_word_sketches_with_the_loaded_words(monkeypatch, tmp_path):
+    monkeypatch.setenv("STORAGE_BACKEND", "local")
+    monkeypatch.setenv("STORAGE_LOCAL_ROOT", str(tmp_path))
+    monkeypatch.setenv("MIN_WORD_LENGTH", "3")
+    monkeypatch.setenv("MIN_FREQUENCY", "20")
+    monkeypatch.setenv("BIGQUERY_DELETE_BEFORE_WRITE", "false")
+    monkeypatch.setattr("newswatch.load.insert_data_into_bigquery_table", lambda table_id, data: None)
+    timestamp = datetime(2024, 1, 5, 12)
+    word_frequencies = build_word_frequencies(timestamp, {"the": 5000, "election": 300, "ox": 300, "budget": 10})
+    loaded_word_frequencies = load_word_frequencies(word_frequencies, timestamp, excluded_words={"the"})
+
+    monkeypatch.delenv("WORD_SKETCHES_S3_PREFIX", raising=False)
+    update_word_sketches(BUCKET, timestamp, loaded_word_frequencies)
+    assert not (tmp_path / BUCKET).exists()
+
+    monkeypatch.setenv("WORD_SKETCHES_S3_PREFIX", PREFIX)
+    update_word_sketches(BUCKET, timestamp, loaded_word_frequencies)
+    word_sketch, _ = query_word_sketches(BUCKET, timestamp, datetime(2024, 1, 5, 13), prefix=PREFIX)
+    assert word_sketch.most_common() == [("election", 300)]
+
+
+def test_update_word_sketches_of_tenants_sharing_a_bucket(monkeypatch, tmp_path):
+    monkeypatch.setenv("STORAGE_BACKEND", "local")
+    monkeypatch.setenv("STORAGE_LOCAL_ROOT", str(tmp_path))
+    monkeypatch.setenv("WORD_SKETCHES_S3_PREFIX", PREFIX)
+    timestamp = datetime(2024, 1, 5, 12)
+    tenants = {
+        name: Tenant(
+            name=name,
+            extract_s3_prefix=f"headlines-{name}",
+            transform_s3_prefix=f"word-frequencies-{name}",
+            bigquery_table_id=f"project.dataset.{name}",
+        )
+        for name in ("uk", "us")
+    }
+
+    update_word_sketches(BUCKET, timestamp, build_word_frequencies(timestamp, {"election": 300}), tenants["uk"])
+    update_word_sketches(BUCKET, timestamp, build_word_frequencies(timestamp, {"primary": 200}), tenants["us"])
+
+    for name, expected_words in [("uk", [("election", 300)]), ("us", [("primary", 200)])]:
+        for end in (datetime(2024, 1, 5, 13), datetime(2024, 2, 1)):
+            word_sketch, _ = query_word_sketches(BUCKET, datetime(2024, 1, 1), end, prefix=f"{name}/{PREFIX}")
+            assert word_sketch.most_common() == expected_words
+
+
+def test_update_word_sketches_logs_failures(monkeypatch, caplog):
+    monkeypatch.setenv("STORAGE_BACKEND", "unknown")
+    monkeypatch.setenv("WORD_SKETCHES_S3_PREFIX", PREFIX)
+    timestamp = datetime(2024, 1, 5, 12)
+
+    update_word_sketches(BUCKET, timestamp, build_word_frequencies(timestamp, {"election": 300}))
+
+    assert "Failed to update the word sketches" in caplog.text